@@ -1,10 +1,27 @@
 import os
+import sys
+import zlib
+import argparse
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
 from dateutil import parser
-from collections import defaultdict
+from collections import Counter, defaultdict
+from functools import lru_cache
 import re
+import logging
+
+# Try to use orjson for faster response decoding if available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+log = logging.getLogger(__name__)
 
 # ========== CONFIG ==========
 HUBSPOT_TOKEN = os.getenv('HUBSPOT_TOKEN', 'your-hubspot-token-here')
@@ -13,40 +30,136 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Shared session so every HubSpot call reuses pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=32,
+    max_retries=Retry(total=3, backoff_factor=0.3, status_forcelist=[429, 500, 502, 503, 504])
+))
+
 NEETPREP_DOMAIN = "@neetprep.com"
 NEW_CONTACT_HOURS = 24  # Contacts newer than this are "new"
+BATCH_API_SIZE = 100  # Max inputs per /batch/read and /batch/update call
+GROUP_WORKERS = 5  # Phone groups processed concurrently (paced by RATE_LIMITER)
+RATE_LIMIT_CALLS = 100  # HubSpot private app quota: 100 requests...
+RATE_LIMIT_PERIOD = 10  # ...per 10 seconds
+
+PHONE_STRIP_TABLE = str.maketrans("", "", " -")
+SYSTEM_EMAIL_RE = re.compile(r'^\d+@neetprep\.com\Z', re.IGNORECASE)
+CREATE_DATE_CACHE = {}  # contact id -> parsed createdate
+
+# Properties the recent-contacts scan actually reads (grouping + classification)
+RECENT_CONTACT_PROPERTIES = [
+    "email", "phone", "hs_additional_emails", "createdate", "firstname", "lastname"
+]
+
+CONTACT_PROPERTIES = [
+    "email", "phone", "hs_additional_emails", "createdate", 
+    "firstname", "lastname", "company", "lifecyclestage",
+    "duplicate_contact_notes", "notes_last_contacted", "lastcontactdate"  # Updated property name
+]
+
+# ========== Rate Limiting ==========
+
+class RateLimiter:
+    """Thread-safe token bucket allowing max_calls requests per period seconds"""
+    
+    def __init__(self, max_calls, period):
+        self.capacity = max_calls
+        self.tokens = float(max_calls)
+        self.rate = max_calls / period
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+    
+    def acquire(self):
+        """Block until a request token is available"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+RATE_LIMITER = RateLimiter(RATE_LIMIT_CALLS, RATE_LIMIT_PERIOD)
+
+def hubspot_request(method, url, **kwargs):
+    """Send a rate-limited request to HubSpot through the shared session"""
+    RATE_LIMITER.acquire()
+    return SESSION.request(method, url, **kwargs)
+
+def decode_json(response):
+    """Decode a HubSpot JSON response, using orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
 
 # ========== Helper Functions ==========
 
+@lru_cache(maxsize=8192)
 def normalize_phone(phone):
     """Normalize phone number by removing country codes and spaces"""
     if not phone:
         return None
-    phone_str = str(phone).replace("+91", "").replace(" ", "").replace("-", "").strip()
+    phone_str = str(phone).strip().translate(PHONE_STRIP_TABLE)
+    # Only the Indian country code is dropped; any other "+" prefix fails the digit check below
+    if phone_str.startswith("+91"):
+        phone_str = phone_str[3:]
+    elif len(phone_str) == 12 and phone_str.startswith("91"):
+        phone_str = phone_str[2:]
     return phone_str if phone_str.isdigit() and len(phone_str) >= 10 else None
 
+@lru_cache(maxsize=4096)
 def is_system_generated_email(email):
     """Check if email is system generated (number@neetprep.com format)"""
     if not email:
         return False
-    pattern = r'^\d+@neetprep\.com$'
-    return bool(re.match(pattern, email.lower()))
+    return bool(SYSTEM_EMAIL_RE.match(email))
 
-def get_creation_date(contact):
-    """Get contact creation date"""
-    create_date_str = contact["properties"].get("createdate")
-    if create_date_str:
+def parse_hubspot_date(date_str):
+    """Parse a HubSpot ISO-8601 timestamp, falling back to dateutil for other formats"""
+    if not date_str:
+        return datetime.min.replace(tzinfo=timezone.utc)
+    try:
+        return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+    except ValueError:
         try:
-            return parser.parse(create_date_str)
-        except:
+            return parser.parse(date_str)
+        except (ValueError, OverflowError):
             return datetime.min.replace(tzinfo=timezone.utc)
-    return datetime.min.replace(tzinfo=timezone.utc)
 
-def is_new_contact(contact, hours=NEW_CONTACT_HOURS):
-    """Check if contact was created within specified hours"""
-    creation_date = get_creation_date(contact)
-    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
-    return creation_date > cutoff
+def get_creation_date(contact):
+    """Get contact creation date (parsed once per contact)"""
+    contact_id = contact.get("id")
+    if contact_id in CREATE_DATE_CACHE:
+        return CREATE_DATE_CACHE[contact_id]
+    
+    creation_date = parse_hubspot_date(contact["properties"].get("createdate"))
+    if contact_id is not None:
+        CREATE_DATE_CACHE[contact_id] = creation_date
+    return creation_date
+
+def parse_additional_emails(additional_emails_str):
+    """Split hs_additional_emails into (ordered email list, lookup set)"""
+    if not additional_emails_str:
+        return [], set()
+    ordered = [email for email in (e.strip() for e in additional_emails_str.split(";")) if email]
+    return ordered, set(ordered)
+
+def compute_cutoff(hours=NEW_CONTACT_HOURS):
+    """Get the creation time after which a contact counts as new"""
+    return datetime.now(timezone.utc) - timedelta(hours=hours)
+
+def is_new_contact(contact, hours=NEW_CONTACT_HOURS, cutoff=None):
+    """Check if contact was created within specified hours (or after a precomputed cutoff)"""
+    if cutoff is None:
+        cutoff = compute_cutoff(hours)
+    return get_creation_date(contact) > cutoff
 
 def get_contacts_by_phone(phone):
     """Get all contacts with same phone number"""
@@ -59,60 +172,176 @@ def get_contacts_by_phone(phone):
                 "value": phone
             }]
         }],
-        "properties": [
-            "email", "phone", "hs_additional_emails", "createdate", 
-            "firstname", "lastname", "company", "lifecyclestage",
-            "duplicate_contact_notes", "notes_last_contacted", "lastcontactdate"  # Updated property name
-        ],
+        "properties": CONTACT_PROPERTIES,
         "limit": 100
     }
     
     try:
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=15)
+        response = hubspot_request("POST", url, json=payload, timeout=15)
         response.raise_for_status()
-        data = response.json()
+        data = decode_json(response)
         return data.get("results", [])
     except requests.exceptions.RequestException as e:
-        print(f"❌ Error fetching contacts by phone: {e}")
+        log.error(f"❌ Error fetching contacts by phone: {e}")
         return []
 
-def add_duplicate_contact_note(contact_id, note):
-    """Add note to custom duplicate_contact_notes property"""
-    url = f"https://api.hubapi.com/crm/v3/objects/contacts/{contact_id}"
+class NoteBuffer:
+    """
+    Collect duplicate notes (and an optional additional-emails value) for one
+    contact and write them with a single GET + PATCH when the block exits.
+    When a pending list is given the buffer is queued there instead, to be
+    written later by flush_batch_updates().
+    """
     
-    # Get current notes from custom property
-    try:
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        current_data = response.json()
-        current_notes = current_data.get("properties", {}).get("duplicate_contact_notes", "")  # Updated property name
-        
-        # Create timestamped note
+    def __init__(self, contact_id, pending=None):
+        self.contact_id = contact_id
+        self.pending = pending
+        self.notes = []
+        self.additional_emails = None
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self.pending is None:
+            self.flush()
+        elif self.notes or self.additional_emails is not None:
+            self.pending.append(self)
+        return False
+    
+    def add(self, note):
+        """Queue a timestamped note"""
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S IST")
-        new_note = f"[{timestamp}] {note}"
+        self.notes.append((timestamp, note))
+    
+    def set_additional_emails(self, additional_emails_list):
+        """Queue a replacement value for the additional emails field"""
+        self.additional_emails = list(additional_emails_list)
+    
+    def build_properties(self, current_notes):
+        """Build the property update for the queued notes and emails"""
+        properties = {}
         
-        # Append to existing notes
-        if current_notes:
-            updated_notes = f"{current_notes}\n{new_note}"
-        else:
-            updated_notes = new_note
+        if self.notes:
+            # Append all queued notes to existing notes
+            new_notes = "\n".join(f"[{timestamp}] {note}" for timestamp, note in self.notes)
+            properties["duplicate_contact_notes"] = f"{current_notes}\n{new_notes}" if current_notes else new_notes
+            properties["notes_last_contacted"] = f"Last duplicate merge: {self.notes[-1][0]}"  # Also update general notes
         
-        # Update contact with new notes
-        payload = {
-            "properties": {
-                "duplicate_contact_notes": updated_notes,  # Updated property name
-                "notes_last_contacted": f"Last duplicate merge: {timestamp}"  # Also update general notes
-            }
-        }
+        if self.additional_emails is not None:
+            # Join emails with semicolon as HubSpot expects
+            properties["hs_additional_emails"] = ";".join(self.additional_emails)
         
-        response = requests.patch(url, headers=HEADERS, json=payload, timeout=10)
-        response.raise_for_status()
-        print(f"📝 Added note to contact {contact_id}: {note}")
-        return True
+        return properties
+    
+    def report(self):
+        """Log what was written and clear the buffer"""
+        for _, note in self.notes:
+            log.debug(f"📝 Added note to contact {self.contact_id}: {note}")
+        if self.additional_emails is not None:
+            log.info(f"📧 Updated additional emails for contact {self.contact_id}")
         
-    except requests.exceptions.RequestException as e:
-        print(f"❌ Error adding duplicate contact note: {e}")
-        return False
+        self.notes = []
+        self.additional_emails = None
+    
+    def flush(self):
+        """Write queued notes and additional emails in one update"""
+        if not self.notes and self.additional_emails is None:
+            return True
+        
+        url = f"https://api.hubapi.com/crm/v3/objects/contacts/{self.contact_id}"
+        current_notes = ""
+        
+        try:
+            if self.notes:
+                # Get current notes from custom property
+                response = hubspot_request("GET", url, params={"properties": "duplicate_contact_notes"}, timeout=10)
+                response.raise_for_status()
+                current_data = decode_json(response)
+                current_notes = current_data.get("properties", {}).get("duplicate_contact_notes", "")  # Updated property name
+            
+            payload = {"properties": self.build_properties(current_notes)}
+            response = hubspot_request("PATCH", url, json=payload, timeout=10)
+            response.raise_for_status()
+            self.report()
+            return True
+            
+        except requests.exceptions.RequestException as e:
+            log.error(f"❌ Error updating duplicate notes for contact {self.contact_id}: {e}")
+            return False
+
+def flush_batch_updates(pending):
+    """
+    Write queued NoteBuffers using the batch endpoints: one /batch/read for
+    current notes and one /batch/update per 100 contacts
+    """
+    if not pending:
+        return 0
+    
+    read_url = "https://api.hubapi.com/crm/v3/objects/contacts/batch/read"
+    update_url = "https://api.hubapi.com/crm/v3/objects/contacts/batch/update"
+    updated = 0
+    
+    # Phone groups are disjoint and each queues at most one buffer per contact,
+    # so every queued buffer is a distinct contact
+    queued = pending[:]
+    
+    log.info(f"📤 Writing queued updates for {len(queued)} contacts...")
+    
+    for start in range(0, len(queued), BATCH_API_SIZE):
+        batch = queued[start:start + BATCH_API_SIZE]
+        
+        try:
+            # Get current notes for every contact that has notes queued
+            current_notes = {}
+            note_ids = [str(buffer.contact_id) for buffer in batch if buffer.notes]
+            if note_ids:
+                payload = {
+                    "properties": ["duplicate_contact_notes"],
+                    "inputs": [{"id": contact_id} for contact_id in note_ids]
+                }
+                response = hubspot_request("POST", read_url, json=payload, timeout=15)
+                response.raise_for_status()
+                for result in decode_json(response).get("results", []):
+                    current_notes[result["id"]] = result.get("properties", {}).get("duplicate_contact_notes") or ""
+            
+            # A partial (207) read can leave contacts out; writing those with "" would wipe their
+            # existing notes, so they go through the single-contact GET + PATCH instead
+            missing = [buffer for buffer in batch if buffer.notes and str(buffer.contact_id) not in current_notes]
+            batch = [buffer for buffer in batch if buffer not in missing]
+            for buffer in missing:
+                log.warning(f"⚠️ Notes for contact {buffer.contact_id} missing from batch read, updating it individually")
+                if buffer.flush():
+                    updated += 1
+            
+            if not batch:
+                continue
+            
+            payload = {
+                "inputs": [
+                    {"id": str(buffer.contact_id), "properties": buffer.build_properties(current_notes.get(str(buffer.contact_id), ""))}
+                    for buffer in batch
+                ]
+            }
+            response = hubspot_request("POST", update_url, json=payload, timeout=15)
+            response.raise_for_status()
+            
+            for buffer in batch:
+                buffer.report()
+            updated += len(batch)
+            
+        except requests.exceptions.RequestException as e:
+            log.error(f"❌ Error writing batch updates: {e}")
+    
+    # Only drop what was written; groups still running may have queued more
+    del pending[:len(queued)]
+    return updated
+
+def add_duplicate_contact_note(contact_id, note):
+    """Add note to custom duplicate_contact_notes property"""
+    buffer = NoteBuffer(contact_id)
+    buffer.add(note)
+    return buffer.flush()
 
 def update_additional_emails(contact_id, additional_emails_list):
     """Update additional emails field"""
@@ -128,12 +357,12 @@ def update_additional_emails(contact_id, additional_emails_list):
     }
     
     try:
-        response = requests.patch(url, headers=HEADERS, json=payload, timeout=10)
+        response = hubspot_request("PATCH", url, json=payload, timeout=10)
         response.raise_for_status()
-        print(f"📧 Updated additional emails for contact {contact_id}")
+        log.info(f"📧 Updated additional emails for contact {contact_id}")
         return True
     except requests.exceptions.RequestException as e:
-        print(f"❌ Error updating additional emails: {e}")
+        log.error(f"❌ Error updating additional emails: {e}")
         return False
 
 def merge_contacts(primary_id, secondary_id):
@@ -145,17 +374,17 @@ def merge_contacts(primary_id, secondary_id):
     }
     
     try:
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=10)
+        response = hubspot_request("POST", url, json=payload, timeout=10)
         response.raise_for_status()
-        print(f"🔄 Successfully merged contact {secondary_id} into {primary_id}")
+        log.info(f"🔄 Successfully merged contact {secondary_id} into {primary_id}")
         return True
     except requests.exceptions.RequestException as e:
-        print(f"❌ Merge failed: {e}")
+        log.error(f"❌ Merge failed: {e}")
         return False
 
 # ========== Processing Functions ==========
 
-def process_new_contact_duplicates(phone, contacts):
+def process_new_contact_duplicates(phone, contacts, pending_updates=None, cutoff=None):
     """
     LOGIC FOR NEW CONTACTS:
     1. Identify new contacts (< 24 hours) vs old contacts
@@ -165,22 +394,24 @@ def process_new_contact_duplicates(phone, contacts):
        - Add merge note to system contact
        - Merge new contact into system contact
     """
-    print(f"\n🆕 Processing NEW contact duplicates for phone: {phone}")
-    print("=" * 70)
+    log.info(f"\n🆕 Processing NEW contact duplicates for phone: {phone}")
+    log.info("=" * 70)
     
     # Separate new vs old contacts
     new_contacts = []
     old_contacts = []
+    if cutoff is None:
+        cutoff = compute_cutoff()
     
     for contact in contacts:
-        if is_new_contact(contact):
+        if is_new_contact(contact, cutoff=cutoff):
             new_contacts.append(contact)
         else:
             old_contacts.append(contact)
     
-    print(f"📊 Analysis:")
-    print(f"   🆕 New contacts (< {NEW_CONTACT_HOURS}h): {len(new_contacts)}")
-    print(f"   🗂️ Old contacts (> {NEW_CONTACT_HOURS}h): {len(old_contacts)}")
+    log.info(f"📊 Analysis:")
+    log.info(f"   🆕 New contacts (< {NEW_CONTACT_HOURS}h): {len(new_contacts)}")
+    log.info(f"   🗂️ Old contacts (> {NEW_CONTACT_HOURS}h): {len(old_contacts)}")
     
     # Find system email contact (should be in old contacts)
     system_contact = None
@@ -191,58 +422,63 @@ def process_new_contact_duplicates(phone, contacts):
             break
     
     if not system_contact:
-        print("⚠️ No system email contact found in old contacts")
+        log.warning("⚠️ No system email contact found in old contacts")
         return {"status": "no_system_contact"}
     
     system_email = system_contact["properties"].get("email", "")
-    print(f"🎯 System contact found:")
-    print(f"   ID: {system_contact['id']}")
-    print(f"   Email: {system_email}")
+    log.info(f"🎯 System contact found:")
+    log.info(f"   ID: {system_contact['id']}")
+    log.info(f"   Email: {system_email}")
     
     # Process each new contact with personal email
     merged_count = 0
     processed_emails = []
     
+    # Additional emails accumulate across new contacts and are written once
+    additional_emails, known_emails = parse_additional_emails(system_contact["properties"].get("hs_additional_emails", ""))
+    
+    personal_contacts = []
     for new_contact in new_contacts:
         if new_contact["id"] == system_contact["id"]:
             continue
-            
         new_email = new_contact["properties"].get("email", "")
         if new_email and not is_system_generated_email(new_email):
-            
-            print(f"\n🔄 Processing new contact:")
-            print(f"   ID: {new_contact['id']}")
-            print(f"   Personal Email: {new_email}")
+            personal_contacts.append((new_contact, new_email))
+    
+    with NoteBuffer(system_contact["id"], pending_updates) as notes:
+        for new_contact, new_email in personal_contacts:
+            log.info(f"\n🔄 Processing new contact:")
+            log.info(f"   ID: {new_contact['id']}")
+            log.info(f"   Personal Email: {new_email}")
             
             # Step 1: Add personal email to system contact's additional emails
-            current_additional = system_contact["properties"].get("hs_additional_emails", "")
-            additional_emails = [e.strip() for e in current_additional.split(";") if e.strip()] if current_additional else []
-            
-            if new_email not in additional_emails:
+            if new_email not in known_emails:
+                known_emails.add(new_email)
                 additional_emails.append(new_email)
-                if update_additional_emails(system_contact["id"], additional_emails):
-                    print(f"   ✅ Added {new_email} to additional emails")
-                else:
-                    print(f"   ⚠️ Failed to add to additional emails")
+                notes.set_additional_emails(additional_emails)
+                log.info(f"   ✅ Queued {new_email} for additional emails")
             
             # Step 2: Add merge note to system contact
             note = f"MERGED: Personal email contact {new_contact['id']} with email {new_email} merged into system contact. Personal email preserved in additional emails."
-            add_duplicate_contact_note(system_contact["id"], note)
-            
-            # Step 3: Merge new contact into system contact
+            notes.add(note)
+        
+        # Write the emails and notes before merging: a merge can add emails to the system contact,
+        # and a later PATCH of the list built above would overwrite them
+        notes.flush()
+        
+        # Step 3: Merge each new contact into system contact
+        for new_contact, new_email in personal_contacts:
             if merge_contacts(system_contact["id"], new_contact["id"]):
                 merged_count += 1
                 processed_emails.append(new_email)
-                print(f"   ✅ Successfully merged contact {new_contact['id']}")
+                log.info(f"   ✅ Successfully merged contact {new_contact['id']}")
             else:
-                print(f"   ❌ Failed to merge contact {new_contact['id']}")
-            
-            time.sleep(2)  # Rate limiting
-    
-    # Final note summarizing all merges
-    if processed_emails:
-        summary_note = f"NEW CONTACT MERGE SUMMARY: Merged {merged_count} new personal email contacts. Emails preserved: {', '.join(processed_emails)}"
-        add_duplicate_contact_note(system_contact["id"], summary_note)
+                log.error(f"   ❌ Failed to merge contact {new_contact['id']}")
+        
+        # Final note summarizing all merges
+        if processed_emails:
+            summary_note = f"NEW CONTACT MERGE SUMMARY: Merged {merged_count} new personal email contacts. Emails preserved: {', '.join(processed_emails)}"
+            notes.add(summary_note)
     
     return {
         "status": "success", 
@@ -251,7 +487,7 @@ def process_new_contact_duplicates(phone, contacts):
         "processed_emails": processed_emails
     }
 
-def process_old_contact_duplicates(phone, contacts):
+def process_old_contact_duplicates(phone, contacts, pending_updates=None, creation_dates=None):
     """
     LOGIC FOR OLD CONTACTS:
     1. Sort contacts by creation date (oldest first)
@@ -260,22 +496,33 @@ def process_old_contact_duplicates(phone, contacts):
     4. Handle scenarios:
        - 2 contacts (1 system + 1 personal): Add remark that system is duplicate of personal
        - 3+ contacts (1 system + multiple personal): Merge all, prioritize latest personal email
+    
+    creation_dates maps contact id -> parsed creation date; it is built here
+    when the caller has not already parsed the dates.
     """
-    print(f"\n🗂️ Processing OLD contact duplicates for phone: {phone}")
-    print("=" * 70)
+    log.info(f"\n🗂️ Processing OLD contact duplicates for phone: {phone}")
+    log.info("=" * 70)
     
-    # Sort contacts by creation date (oldest first)
-    contacts_sorted = sorted(contacts, key=get_creation_date)
+    if creation_dates is None:
+        creation_dates = {contact["id"]: get_creation_date(contact) for contact in contacts}
     
-    print(f"📊 Contact Analysis (oldest to newest):")
-    for i, contact in enumerate(contacts_sorted, 1):
-        email = contact["properties"].get("email", "N/A")
-        create_date = get_creation_date(contact).strftime("%Y-%m-%d %H:%M")
-        email_type = "🏫 SYSTEM" if is_system_generated_email(email) else "👤 PERSONAL"
-        name = f"{contact['properties'].get('firstname', '')} {contact['properties'].get('lastname', '')}".strip() or "No Name"
-        
-        print(f"   {i}. {email_type} | ID: {contact['id']}")
-        print(f"      Name: {name} | Email: {email} | Created: {create_date}")
+    def created(contact):
+        return creation_dates[contact["id"]]
+    
+    # Sort contacts by creation date (oldest first)
+    contacts_sorted = sorted(contacts, key=created)
+    
+    # Per-contact detail is debug output; skip formatting it entirely otherwise
+    if log.isEnabledFor(logging.DEBUG):
+        log.debug(f"📊 Contact Analysis (oldest to newest):")
+        for i, contact in enumerate(contacts_sorted, 1):
+            email = contact["properties"].get("email", "N/A")
+            create_date = created(contact).strftime("%Y-%m-%d %H:%M")
+            email_type = "🏫 SYSTEM" if is_system_generated_email(email) else "👤 PERSONAL"
+            name = f"{contact['properties'].get('firstname', '')} {contact['properties'].get('lastname', '')}".strip() or "No Name"
+            
+            log.debug(f"   {i}. {email_type} | ID: {contact['id']}")
+            log.debug(f"      Name: {name} | Email: {email} | Created: {create_date}")
     
     # Find system email contact and personal contacts
     system_contact = None
@@ -289,15 +536,15 @@ def process_old_contact_duplicates(phone, contacts):
             personal_contacts.append(contact)
     
     if not system_contact:
-        print("⚠️ No system email contact found - cannot determine primary")
+        log.warning("⚠️ No system email contact found - cannot determine primary")
         return {"status": "no_system_contact"}
     
     system_email = system_contact["properties"].get("email", "")
-    print(f"\n🎯 System contact (primary): {system_contact['id']} ({system_email})")
-    print(f"👥 Personal email contacts to process: {len(personal_contacts)}")
+    log.info(f"\n🎯 System contact (primary): {system_contact['id']} ({system_email})")
+    log.info(f"👥 Personal email contacts to process: {len(personal_contacts)}")
     
     if len(personal_contacts) == 0:
-        print("ℹ️ No personal email contacts to merge")
+        log.info("ℹ️ No personal email contacts to merge")
         return {"status": "no_personal_contacts"}
     
     elif len(personal_contacts) == 1:
@@ -305,44 +552,47 @@ def process_old_contact_duplicates(phone, contacts):
         personal_contact = personal_contacts[0]
         personal_email = personal_contact["properties"].get("email", "")
         
-        print(f"\n📧 SCENARIO 1: Single personal contact")
-        print(f"   Personal Email: {personal_email}")
-        print(f"   Personal Contact ID: {personal_contact['id']}")
-        
-        # Add remark that system email is duplicate of personal email
-        remark = f"DUPLICATE REMARK: System email {system_email} is duplicate of personal email {personal_email}. Original personal email preserved in additional emails."
-        add_duplicate_contact_note(system_contact["id"], remark)
+        log.info(f"\n📧 SCENARIO 1: Single personal contact")
+        log.info(f"   Personal Email: {personal_email}")
+        log.info(f"   Personal Contact ID: {personal_contact['id']}")
         
-        # Add personal email to additional emails
-        current_additional = system_contact["properties"].get("hs_additional_emails", "")
-        additional_emails = [e.strip() for e in current_additional.split(";") if e.strip()] if current_additional else []
-        
-        if personal_email not in additional_emails:
-            additional_emails.append(personal_email)
-            update_additional_emails(system_contact["id"], additional_emails)
-        
-        # Merge personal contact into system contact
-        if merge_contacts(system_contact["id"], personal_contact["id"]):
-            merge_note = f"MERGED: Personal email contact {personal_contact['id']} with email {personal_email} merged into system contact."
-            add_duplicate_contact_note(system_contact["id"], merge_note)
-            print(f"✅ Successfully merged personal contact into system contact")
-            return {"status": "success", "merged_count": 1, "scenario": "single_personal"}
-        else:
-            return {"status": "merge_failed"}
+        with NoteBuffer(system_contact["id"], pending_updates) as notes:
+            # Add remark that system email is duplicate of personal email
+            remark = f"DUPLICATE REMARK: System email {system_email} is duplicate of personal email {personal_email}. Original personal email preserved in additional emails."
+            notes.add(remark)
+            
+            # Add personal email to additional emails
+            additional_emails, known_emails = parse_additional_emails(system_contact["properties"].get("hs_additional_emails", ""))
+            
+            if personal_email not in known_emails:
+                additional_emails.append(personal_email)
+                notes.set_additional_emails(additional_emails)
+            
+            # Remark and emails land before the merge, so the PATCH can't overwrite emails the merge adds
+            notes.flush()
+            
+            # Merge personal contact into system contact
+            if merge_contacts(system_contact["id"], personal_contact["id"]):
+                merge_note = f"MERGED: Personal email contact {personal_contact['id']} with email {personal_email} merged into system contact."
+                notes.add(merge_note)
+                log.info(f"✅ Successfully merged personal contact into system contact")
+                return {"status": "success", "merged_count": 1, "scenario": "single_personal"}
+            else:
+                return {"status": "merge_failed"}
     
     elif len(personal_contacts) >= 2:
         # SCENARIO 2: 3+ contacts (1 system + multiple personal)
-        print(f"\n🔄 SCENARIO 2: Multiple personal contacts ({len(personal_contacts)} contacts)")
+        log.info(f"\n🔄 SCENARIO 2: Multiple personal contacts ({len(personal_contacts)} contacts)")
         
         # Get latest personal contact (most recent creation date)
-        latest_personal = max(personal_contacts, key=get_creation_date)
+        latest_personal = max(personal_contacts, key=created)
         other_personals = [c for c in personal_contacts if c["id"] != latest_personal["id"]]
         
         latest_email = latest_personal["properties"].get("email", "")
-        latest_date = get_creation_date(latest_personal).strftime("%Y-%m-%d %H:%M")
+        latest_date = created(latest_personal).strftime("%Y-%m-%d %H:%M")
         
-        print(f"   📧 Latest personal email: {latest_email} (Created: {latest_date})")
-        print(f"   📧 Other personal emails: {len(other_personals)}")
+        log.info(f"   📧 Latest personal email: {latest_email} (Created: {latest_date})")
+        log.info(f"   📧 Other personal emails: {len(other_personals)}")
         
         # Collect all personal emails for additional emails
         personal_emails = []
@@ -351,46 +601,48 @@ def process_old_contact_duplicates(phone, contacts):
             if email:
                 personal_emails.append(email)
         
-        print(f"   📧 All personal emails to preserve: {', '.join(personal_emails)}")
-        
-        # Update system contact with all personal emails as additional
-        update_additional_emails(system_contact["id"], personal_emails)
+        log.info(f"   📧 All personal emails to preserve: {', '.join(personal_emails)}")
         
-        # Add comprehensive note
-        emails_list = ", ".join(personal_emails)
-        comprehensive_note = f"MULTIPLE DUPLICATE MERGE: Merged {len(personal_contacts)} personal email contacts. Latest email: {latest_email}. All emails: {emails_list}. Latest email prioritized."
-        add_duplicate_contact_note(system_contact["id"], comprehensive_note)
-        
-        # Add individual notes for each personal contact
-        for i, contact in enumerate(personal_contacts, 1):
-            email = contact["properties"].get("email", "")
-            is_latest = contact["id"] == latest_personal["id"]
-            priority = "LATEST" if is_latest else f"OLDER #{i}"
+        with NoteBuffer(system_contact["id"], pending_updates) as notes:
+            # Update system contact with all personal emails as additional
+            notes.set_additional_emails(personal_emails)
+            
+            # Add comprehensive note
+            emails_list = ", ".join(personal_emails)
+            comprehensive_note = f"MULTIPLE DUPLICATE MERGE: Merged {len(personal_contacts)} personal email contacts. Latest email: {latest_email}. All emails: {emails_list}. Latest email prioritized."
+            notes.add(comprehensive_note)
+            
+            # Add individual notes for each personal contact
+            for i, contact in enumerate(personal_contacts, 1):
+                email = contact["properties"].get("email", "")
+                is_latest = contact["id"] == latest_personal["id"]
+                priority = "LATEST" if is_latest else f"OLDER #{i}"
+                
+                individual_note = f"PERSONAL EMAIL {priority}: {email} from contact {contact['id']} - {'Latest email kept as priority' if is_latest else 'Older email merged'}"
+                notes.add(individual_note)
+            
+            # Emails and notes land before the merges, so the PATCH can't overwrite emails the merges add
+            notes.flush()
             
-            individual_note = f"PERSONAL EMAIL {priority}: {email} from contact {contact['id']} - {'Latest email kept as priority' if is_latest else 'Older email merged'}"
-            add_duplicate_contact_note(system_contact["id"], individual_note)
-        
-        # Merge all personal contacts into system contact (latest first, then others)
-        merged_count = 0
-        
-        # First merge latest personal contact
-        print(f"\n   🔄 Merging latest personal contact {latest_personal['id']}...")
-        if merge_contacts(system_contact["id"], latest_personal["id"]):
-            merged_count += 1
-            time.sleep(2)
-        
-        # Then merge other personal contacts
-        for contact in other_personals:
-            print(f"   🔄 Merging personal contact {contact['id']}...")
-            if merge_contacts(system_contact["id"], contact["id"]):
+            # Merge all personal contacts into system contact (latest first, then others)
+            merged_count = 0
+            
+            # First merge latest personal contact
+            log.info(f"\n   🔄 Merging latest personal contact {latest_personal['id']}...")
+            if merge_contacts(system_contact["id"], latest_personal["id"]):
                 merged_count += 1
-            else:
-                print(f"   ❌ Failed to merge {contact['id']}")
-            time.sleep(2)
-        
-        # Final summary note
-        final_note = f"MERGE COMPLETE: Successfully merged {merged_count}/{len(personal_contacts)} personal contacts. System email {system_email} remains primary. All personal emails preserved."
-        add_duplicate_contact_note(system_contact["id"], final_note)
+            
+            # Then merge other personal contacts
+            for contact in other_personals:
+                log.info(f"   🔄 Merging personal contact {contact['id']}...")
+                if merge_contacts(system_contact["id"], contact["id"]):
+                    merged_count += 1
+                else:
+                    log.error(f"   ❌ Failed to merge {contact['id']}")
+            
+            # Final summary note
+            final_note = f"MERGE COMPLETE: Successfully merged {merged_count}/{len(personal_contacts)} personal contacts. System email {system_email} remains primary. All personal emails preserved."
+            notes.add(final_note)
         
         return {
             "status": "success", 
@@ -400,14 +652,14 @@ def process_old_contact_duplicates(phone, contacts):
             "latest_email": latest_email
         }
 
-def test_specific_phone_number(phone_number):
+def test_specific_phone_number(phone_number, confirm=True):
     """
     TESTING LOGIC:
     1. Normalize and validate phone number
     2. Fetch all contacts with this phone number
     3. Display detailed information about each contact
     4. Analyze the scenario (new vs old contacts)
-    5. Ask for user confirmation before processing
+    5. Ask for user confirmation before processing (skipped when confirm=False, i.e. --yes)
     6. Execute appropriate processing logic
     7. Display detailed results
     """
@@ -445,15 +697,20 @@ def test_specific_phone_number(phone_number):
     system_contacts = []
     personal_contacts = []
     
+    # Parse every creation date once; reused for display and processing
+    creation_dates = {contact["id"]: get_creation_date(contact) for contact in contacts}
+    now = datetime.now(timezone.utc)
+    new_cutoff = compute_cutoff()
+    
     for i, contact in enumerate(contacts, 1):
         props = contact["properties"]
         email = props.get("email", "N/A")
         name = f"{props.get('firstname', '')} {props.get('lastname', '')}".strip() or "No Name"
-        create_date = get_creation_date(contact)
+        create_date = creation_dates[contact["id"]]
         create_date_str = create_date.strftime("%Y-%m-%d %H:%M:%S")
         
         # Categorize contact
-        is_new = is_new_contact(contact)
+        is_new = create_date > new_cutoff
         is_system = is_system_generated_email(email)
         
         if is_new:
@@ -475,7 +732,7 @@ def test_specific_phone_number(phone_number):
         print(f"   🆔 Contact ID: {contact['id']}")
         print(f"   👤 Name: {name}")
         print(f"   📅 Created: {create_date_str}")
-        print(f"   ⏰ Age: {(datetime.now(timezone.utc) - create_date).days} days old")
+        print(f"   ⏰ Age: {(now - create_date).days} days old")
         
         # Show existing additional emails
         additional_emails = props.get("hs_additional_emails", "")
@@ -550,7 +807,13 @@ def test_specific_phone_number(phone_number):
     print("✅ Merge duplicate contacts")
     print("❌ This action cannot be undone!")
     
-    confirmation = input("\n🤔 Type 'PROCEED' to continue, anything else to cancel: ").strip().upper()
+    if not confirm:
+        confirmation = 'PROCEED'
+    elif sys.stdin.isatty():
+        confirmation = input("\n🤔 Type 'PROCEED' to continue, anything else to cancel: ").strip().upper()
+    else:
+        print("\n💡 No terminal to confirm on; pass --yes to run unattended")
+        confirmation = ''
     
     if confirmation != 'PROCEED':
         print("❌ Processing cancelled by user")
@@ -565,7 +828,7 @@ def test_specific_phone_number(phone_number):
     if has_new_contacts:
         result = process_new_contact_duplicates(normalized_phone, contacts)
     else:
-        result = process_old_contact_duplicates(normalized_phone, contacts)
+        result = process_old_contact_duplicates(normalized_phone, contacts, creation_dates=creation_dates)
     
     # Step 8: Display detailed results
     print(f"\n📊 PROCESSING RESULTS")
@@ -600,30 +863,34 @@ def test_specific_phone_number(phone_number):
 
 # ========== Comprehensive Processor ==========
 
-def get_all_contacts_recent(hours_back=48):
-    """Get all contacts from last N hours"""
-    cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours_back)
+def get_all_contacts_recent(hours_back=48, start=None, end=None):
+    """Get all contacts from last N hours, or created in [start, end) when given"""
+    cutoff_time = start or datetime.now(timezone.utc) - timedelta(hours=hours_back)
+    filters = [{
+        "propertyName": "createdate",
+        "operator": "GTE",
+        "value": cutoff_time.isoformat()
+    }]
+    if end:
+        filters.append({
+            "propertyName": "createdate",
+            "operator": "LT",
+            "value": end.isoformat()
+        })
     
     url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
     all_contacts = []
     after = None
     
-    print(f"🔍 Fetching contacts from last {hours_back} hours...")
+    if start:
+        log.info(f"🔍 Fetching contacts created from {start.isoformat()} to {end.isoformat() if end else 'now'}...")
+    else:
+        log.info(f"🔍 Fetching contacts from last {hours_back} hours...")
     
     while True:
         payload = {
-            "filterGroups": [{
-                "filters": [{
-                    "propertyName": "createdate",
-                    "operator": "GTE",
-                    "value": cutoff_time.isoformat()
-                }]
-            }],
-            "properties": [
-                "email", "phone", "hs_additional_emails", "createdate", 
-                "firstname", "lastname", "company", "lifecyclestage",
-                "duplicate_contact_notes"  # Updated property name
-            ],
+            "filterGroups": [{"filters": filters}],
+            "properties": RECENT_CONTACT_PROPERTIES,
             "limit": 100,
             "sorts": [{"propertyName": "createdate", "direction": "DESCENDING"}]
         }
@@ -632,54 +899,65 @@ def get_all_contacts_recent(hours_back=48):
             payload["after"] = after
         
         try:
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=15)
+            response = hubspot_request("POST", url, json=payload, timeout=15)
             response.raise_for_status()
-            data = response.json()
+            data = decode_json(response)
             results = data.get("results", [])
-            all_contacts.extend(results)
+            # Keep only id + properties; drop createdAt/updatedAt/archived
+            all_contacts.extend({"id": r["id"], "properties": r.get("properties", {})} for r in results)
             
             if "paging" in data and "next" in data["paging"]:
                 after = data["paging"]["next"]["after"]
             else:
                 break
-                
-            time.sleep(0.1)
             
         except requests.exceptions.RequestException as e:
-            print(f"❌ Error fetching contacts: {e}")
+            log.error(f"❌ Error fetching contacts: {e}")
             break
     
-    print(f"✅ Found {len(all_contacts)} contacts")
+    log.info(f"✅ Found {len(all_contacts)} contacts")
     return all_contacts
 
-def comprehensive_duplicate_processor():
-    """Process all recent contacts for duplicates"""
+def in_shard(phone, shards, shard_index):
+    """Stable phone -> shard assignment, so every run of shard I sees the same phones"""
+    return shards <= 1 or zlib.crc32(phone.encode()) % shards == shard_index
+
+def comprehensive_duplicate_processor(hours_back=48, start=None, end=None, shards=1, shard_index=0):
+    """Process all recent contacts for duplicates.
+    With shards > 1 only phones assigned to shard_index are processed, so N workers
+    can split one run without two of them touching the same phone group."""
     
     print("🚀 COMPREHENSIVE DUPLICATE CONTACT PROCESSOR")
     print("🎯 Handles both new and old contacts with smart merge logic")
     print("📝 Notes stored in 'duplicate_contact_notes' property")
     print("=" * 80)
     
+    if shards > 1:
+        print(f"🧩 Shard {shard_index + 1} of {shards}")
+    
     # Get contacts from last 48 hours (to catch both new and some old)
-    all_contacts = get_all_contacts_recent(hours_back=48)
+    all_contacts = get_all_contacts_recent(hours_back=hours_back, start=start, end=end)
     
     if not all_contacts:
         print("📭 No contacts found to process")
         return
     
-    # Group contacts by phone number
-    phone_groups = defaultdict(list)
+    # Count contacts per phone number first so singleton phones never get a group
+    phone_counts = Counter(
+        phone for phone in (normalize_phone(contact["properties"].get("phone")) for contact in all_contacts)
+        if phone and in_shard(phone, shards, shard_index)
+    )
+    
+    # Group only phone numbers with potential duplicates
+    duplicate_phone_groups = defaultdict(list)
     
     for contact in all_contacts:
         phone = normalize_phone(contact["properties"].get("phone"))
-        if phone:
-            phone_groups[phone].append(contact)
-    
-    # Find phone numbers with potential duplicates
-    duplicate_phone_groups = {phone: contacts for phone, contacts in phone_groups.items() if len(contacts) > 1}
+        if phone and phone_counts[phone] > 1:
+            duplicate_phone_groups[phone].append(contact)
     
     print(f"\n📊 ANALYSIS:")
-    print(f"📱 Total unique phone numbers: {len(phone_groups)}")
+    print(f"📱 Total unique phone numbers: {len(phone_counts)}")
     print(f"🔄 Phone numbers with duplicates: {len(duplicate_phone_groups)}")
     
     if not duplicate_phone_groups:
@@ -697,39 +975,67 @@ def comprehensive_duplicate_processor():
         "manual_review_needed": []
     }
     
-    # Process each phone group
-    for phone, duplicate_contacts in duplicate_phone_groups.items():
-        print(f"\n" + "="*80)
-        
-        results["processed_groups"] += 1
+    # Notes written after a group's merges are queued and sent through the batch endpoints
+    # as each group finishes
+    pending_updates = []
+    
+    # One new-contact cutoff for the whole run
+    cutoff = compute_cutoff()
+    
+    def process_group(phone, duplicate_contacts):
+        """Process one phone group; returns (is_new_group, result)"""
+        log.info(f"\n" + "="*80)
         
         # Determine if this group has new contacts
-        has_new_contacts = any(is_new_contact(c) for c in duplicate_contacts)
-        
-        if has_new_contacts:
+        if any(is_new_contact(c, cutoff=cutoff) for c in duplicate_contacts):
             # Process as new contact group
-            results["new_contact_groups"] += 1
-            result = process_new_contact_duplicates(phone, duplicate_contacts)
-        else:
-            # Process as old contact group
-            results["old_contact_groups"] += 1
-            result = process_old_contact_duplicates(phone, duplicate_contacts)
-        
-        # Track results
-        if result["status"] == "success":
-            results["successful_merges"] += 1
-            results["total_contacts_merged"] += result.get("merged_count", 0)
-        elif result["status"] in ["merge_failed", "failed"]:
-            results["failed_merges"] += 1
-        elif result["status"] in ["no_system_contact", "multiple_system_contacts"]:
-            results["manual_review_needed"].append({
-                "phone": phone,
-                "reason": result["status"],
-                "contact_ids": [c["id"] for c in duplicate_contacts]
-            })
-        
-        # Rate limiting between groups
-        time.sleep(3)
+            return True, process_new_contact_duplicates(phone, duplicate_contacts, pending_updates, cutoff)
+        # Process as old contact group
+        return False, process_old_contact_duplicates(phone, duplicate_contacts, pending_updates)
+    
+    # Phone groups touch disjoint contacts, so they run concurrently; the
+    # shared rate limiter keeps the combined request rate within quota
+    try:
+        with ThreadPoolExecutor(max_workers=GROUP_WORKERS) as executor:
+            futures = {
+                executor.submit(process_group, phone, duplicate_contacts): phone
+                for phone, duplicate_contacts in duplicate_phone_groups.items()
+            }
+        
+            for future in as_completed(futures):
+                phone = futures[future]
+                duplicate_contacts = duplicate_phone_groups[phone]
+                results["processed_groups"] += 1
+            
+                try:
+                    is_new_group, result = future.result()
+                except Exception as e:
+                    log.error(f"❌ Error processing phone {phone}: {e}")
+                    is_new_group, result = False, {"status": "failed", "error": str(e)}
+            
+                if is_new_group:
+                    results["new_contact_groups"] += 1
+                else:
+                    results["old_contact_groups"] += 1
+            
+                # Track results
+                if result["status"] == "success":
+                    results["successful_merges"] += 1
+                    results["total_contacts_merged"] += result.get("merged_count", 0)
+                elif result["status"] in ["merge_failed", "failed"]:
+                    results["failed_merges"] += 1
+                elif result["status"] in ["no_system_contact", "multiple_system_contacts"]:
+                    results["manual_review_needed"].append({
+                        "phone": phone,
+                        "reason": result["status"],
+                        "contact_ids": [c["id"] for c in duplicate_contacts]
+                    })
+            
+                # The merged-away contacts can't be re-read later, so don't hold their notes until the end of the run
+                flush_batch_updates(pending_updates)
+    finally:
+        # Also write whatever is queued when the run is interrupted
+        flush_batch_updates(pending_updates)
     
     # Final comprehensive summary
     print(f"\n" + "="*80)
@@ -760,8 +1066,63 @@ def comprehensive_duplicate_processor():
 
 # ========== Main Function ==========
 
-def main():
+def configure_logging():
+    """Send INFO and above to stdout as bare messages (LOG_LEVEL overrides the level)"""
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s", stream=sys.stdout)
+
+def parse_args(argv=None):
+    """Command line options for headless runs"""
+    arg_parser = argparse.ArgumentParser(description="Resolve duplicate NEETprep contacts in HubSpot")
+    arg_parser.add_argument("--mode", choices=["all", "phone", "date-range"],
+                        help="all: contacts from the last --hours; phone: a single --phone; "
+                             "date-range: contacts created on --date and the following --days - 1 days. "
+                             "Without --mode the interactive menu is shown.")
+    arg_parser.add_argument("--phone", help="Phone number to process in phone mode")
+    arg_parser.add_argument("--date", help="First creation date (YYYY-MM-DD, UTC) in date-range mode")
+    arg_parser.add_argument("--days", type=int, default=1, help="Number of days in date-range mode (default: 1)")
+    arg_parser.add_argument("--hours", type=int, default=48, help="Look-back window in all mode (default: 48)")
+    arg_parser.add_argument("--shards", type=int, default=1, help="Split phone groups across this many workers")
+    arg_parser.add_argument("--shard-index", type=int, default=0, help="Which shard this worker processes (0-based)")
+    arg_parser.add_argument("--yes", action="store_true", help="Skip the PROCEED confirmation in phone mode (for cron/CI)")
+    args = arg_parser.parse_args(argv)
+    
+    if args.mode == "phone" and not args.phone:
+        arg_parser.error("--mode phone requires --phone")
+    if args.mode == "date-range":
+        if not args.date:
+            arg_parser.error("--mode date-range requires --date")
+        try:
+            args.start = datetime.strptime(args.date, "%Y-%m-%d").replace(tzinfo=timezone.utc)
+        except ValueError:
+            arg_parser.error("--date must be in YYYY-MM-DD format")
+        if args.days < 1:
+            arg_parser.error("--days must be at least 1")
+        args.end = args.start + timedelta(days=args.days)
+    if args.shards < 1 or not 0 <= args.shard_index < args.shards:
+        arg_parser.error("--shard-index must be between 0 and --shards - 1")
+    return args
+
+def main(argv=None):
+    """Run headless from command line options, or fall back to the interactive menu"""
+    args = parse_args(argv)
+    if args.mode is None:
+        main_interactive()
+        return
+    
+    configure_logging()
+    if args.mode == "phone":
+        test_specific_phone_number(args.phone, confirm=not args.yes)
+    elif args.mode == "date-range":
+        comprehensive_duplicate_processor(start=args.start, end=args.end,
+                                          shards=args.shards, shard_index=args.shard_index)
+    else:
+        comprehensive_duplicate_processor(hours_back=args.hours,
+                                          shards=args.shards, shard_index=args.shard_index)
+
+def main_interactive():
     """Main execution function with options"""
+    configure_logging()
+    
     print("🚀 NEETPREP COMPREHENSIVE DUPLICATE RESOLVER")
     print("📝 Custom Property: duplicate_contact_notes")
     print("🎯 System emails priority with smart personal email preservation")
@@ -0,0 +1,46 @@
+"""
+Persistent record of completed merges so re-runs skip pairs that already succeeded
+"""
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+# SQLite file holding completed merges (override with MERGE_CACHE_PATH)
+CACHE_PATH = os.getenv('MERGE_CACHE_PATH', str(Path(__file__).parent / 'merge_cache.db'))
+
+_lock = threading.Lock()
+_conn = None
+
+def _connection():
+    """Open the cache database on first use and make sure the table exists"""
+    global _conn
+    if _conn is None:
+        _conn = sqlite3.connect(CACHE_PATH, check_same_thread=False)
+        _conn.execute(
+            "CREATE TABLE IF NOT EXISTS merges ("
+            "primary_id TEXT NOT NULL, merged_id TEXT NOT NULL, ts REAL NOT NULL)"
+        )
+        _conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS merges_pair ON merges (primary_id, merged_id)")
+        _conn.commit()
+    return _conn
+
+def is_merged(primary_id, merged_id):
+    """Check whether merged_id was already merged into primary_id"""
+    with _lock:
+        row = _connection().execute(
+            "SELECT 1 FROM merges WHERE primary_id = ? AND merged_id = ?",
+            (str(primary_id), str(merged_id))
+        ).fetchone()
+    return row is not None
+
+def record_merge(primary_id, merged_id):
+    """Remember a successful merge"""
+    with _lock:
+        conn = _connection()
+        conn.execute(
+            "INSERT OR IGNORE INTO merges (primary_id, merged_id, ts) VALUES (?, ?, ?)",
+            (str(primary_id), str(merged_id), time.time())
+        )
+        conn.commit()
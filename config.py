@@ -2,8 +2,21 @@
 Configuration management for Duplicate Contact Management System
 """
 import os
+import sqlite3
+import threading
+import time
 from pathlib import Path
 
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Try to use orjson for faster response decoding if available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 # Try to load python-dotenv if available
 try:
     from dotenv import load_dotenv
@@ -40,8 +53,143 @@ HEADERS = {
 TIMEZONE = os.getenv('TIMEZONE', 'UTC')
 DATE_FORMAT = os.getenv('DATE_FORMAT', '%Y-%m-%d')
 RATE_LIMIT = int(os.getenv('RATE_LIMIT', '10'))  # requests per second
+MAX_RETRIES = int(os.getenv('MAX_RETRIES', '5'))  # retries on HTTP 429
+# Optional SQLite file that lets concurrent runs on one host share a single rate budget
+SHARED_RATE_LIMIT_PATH = os.getenv('SHARED_RATE_LIMIT_PATH')
+
+# Shared keep-alive session; 429s are retried by hubspot_request, not the adapter
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=RATE_LIMIT,
+    pool_maxsize=RATE_LIMIT * 2,
+    max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[502, 503, 504])
+))
+
+# ========== Rate Limiting ==========
+
+class TokenBucket:
+    """Thread-safe token bucket holding up to `capacity` tokens, refilled at `rate` tokens/sec"""
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if now < self.paused_until:
+                    wait = self.paused_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                else:
+                    wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+    def cooldown(self, seconds):
+        """Hold back every caller for `seconds` after HubSpot returns 429"""
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+class SharedTokenBucket:
+    """Token bucket kept in a SQLite file so separate processes draw from one budget"""
+
+    def __init__(self, path, capacity, rate):
+        self.path = path
+        self.capacity = capacity
+        self.rate = rate
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS bucket ("
+                    "id INTEGER PRIMARY KEY CHECK (id = 1), tokens REAL NOT NULL, "
+                    "updated REAL NOT NULL, paused_until REAL NOT NULL)"
+                )
+                conn.execute("INSERT OR IGNORE INTO bucket VALUES (1, ?, ?, 0)", (float(capacity), time.time()))
+        finally:
+            conn.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    def _update(self, apply):
+        """Run apply(tokens, updated, paused_until, now) under an exclusive lock and store its result"""
+        conn = self._connect()
+        try:
+            conn.isolation_level = None
+            conn.execute("BEGIN IMMEDIATE")
+            tokens, updated, paused_until = conn.execute(
+                "SELECT tokens, updated, paused_until FROM bucket WHERE id = 1"
+            ).fetchone()
+            now = time.time()
+            tokens, paused_until, result = apply(tokens, updated, paused_until, now)
+            conn.execute(
+                "UPDATE bucket SET tokens = ?, updated = ?, paused_until = ? WHERE id = 1",
+                (tokens, now, paused_until)
+            )
+            conn.execute("COMMIT")
+            return result
+        finally:
+            conn.close()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        def take(tokens, updated, paused_until, now):
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+            if now < paused_until:
+                return tokens, paused_until, paused_until - now
+            if tokens >= 1:
+                return tokens - 1, paused_until, 0
+            return tokens, paused_until, (1 - tokens) / self.rate
+
+        while True:
+            wait = self._update(take)
+            if not wait:
+                return
+            time.sleep(wait)
+
+    def cooldown(self, seconds):
+        """Hold back every process for `seconds` after HubSpot returns 429"""
+        def pause(tokens, updated, paused_until, now):
+            tokens = min(self.capacity, tokens + max(0.0, now - updated) * self.rate)
+            return tokens, max(paused_until, now + seconds), None
+
+        self._update(pause)
+
+if SHARED_RATE_LIMIT_PATH:
+    BUCKET = SharedTokenBucket(SHARED_RATE_LIMIT_PATH, RATE_LIMIT, RATE_LIMIT)
+else:
+    BUCKET = TokenBucket(RATE_LIMIT, RATE_LIMIT)
+
+def hubspot_request(method, url, **kwargs):
+    """Send a rate-limited HubSpot request, backing off on 429 (honours Retry-After)"""
+    for attempt in range(MAX_RETRIES + 1):
+        BUCKET.acquire()
+        response = SESSION.request(method, url, **kwargs)
+        if response.status_code != 429 or attempt == MAX_RETRIES:
+            return response
+        retry_after = response.headers.get("Retry-After")
+        delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+        print(f"⏳ Rate limited by HubSpot, retrying in {delay}s...")
+        BUCKET.cooldown(delay)
+
+def decode_json(response):
+    """Decode a HubSpot JSON response, using orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
 
 print(f"🔧 Configuration loaded:")
 print(f"   Token: {'✅ Set' if HUBSPOT_TOKEN else '❌ Missing'}")
 print(f"   Timezone: {TIMEZONE}")
-print(f"   Rate Limit: {RATE_LIMIT} req/sec")
\ No newline at end of file
+print(f"   Rate Limit: {RATE_LIMIT} req/sec{' (shared)' if SHARED_RATE_LIMIT_PATH else ''}")
\ No newline at end of file
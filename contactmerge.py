@@ -1,13 +1,28 @@
 import os
+import sys
+import queue
+import logging
 import requests
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
 from dateutil import parser
-from collections import defaultdict
+from functools import lru_cache
+from logging.handlers import QueueHandler, QueueListener
+
+from cache import is_merged, record_merge
+
+# Try to use ciso8601 for faster timestamp parsing if available
+try:
+    import ciso8601
+except ImportError:
+    ciso8601 = None
+
+log = logging.getLogger(__name__)
 
 # Load configuration
 try:
-    from config import HEADERS, HUBSPOT_TOKEN
+    from config import HEADERS, HUBSPOT_TOKEN, RATE_LIMIT, hubspot_request, decode_json
     print("✅ Using centralized configuration")
 except ImportError:
     # Fallback to direct environment variable
@@ -16,9 +31,22 @@ except ImportError:
         "Authorization": f"Bearer {HUBSPOT_TOKEN}",
         "Content-Type": "application/json"
     }
+    RATE_LIMIT = int(os.getenv('RATE_LIMIT', '10'))
     if HUBSPOT_TOKEN == 'your-hubspot-token-here':
         print("❌ Please set HUBSPOT_TOKEN environment variable or run setup.py")
 
+    SESSION = requests.Session()
+    SESSION.headers.update(HEADERS)
+
+    def hubspot_request(method, url, **kwargs):
+        """Send a HubSpot request paced to RATE_LIMIT"""
+        time.sleep(1 / RATE_LIMIT)
+        return SESSION.request(method, url, **kwargs)
+
+    def decode_json(response):
+        """Decode a HubSpot JSON response"""
+        return response.json()
+
 # ========== DATE CONFIGURATION ==========
 # Just change this date to process any day you want
 TARGET_DATE = datetime(2025, 8, 14, tzinfo=timezone.utc)  # Change this date as needed
@@ -31,33 +59,72 @@ TARGET_DATE = datetime(2025, 8, 14, tzinfo=timezone.utc)  # Change this date as
 # Calculate the next day for filtering
 NEXT_DATE = TARGET_DATE + timedelta(days=1)
 
+# Log batch merge progress every this many pairs
+MERGE_PROGRESS_INTERVAL = 50
+
+# Characters dropped from phone numbers before comparison
+PHONE_STRIP_TABLE = str.maketrans("", "", " -")
+
+# notes_last_contacted is in practice never older than lastcontactdate or
+# hs_analytics_last_timestamp, so when it is set it is used as the last contact
+# date directly and the remaining fields are only consulted as fallbacks
+PRIMARY_CONTACT_DATE_FIELD = "notes_last_contacted"
+FALLBACK_CONTACT_DATE_FIELDS = ("lastcontactdate", "hs_analytics_last_timestamp")
+
+# Maximum IDs per /contacts/batch/read call
+BATCH_READ_SIZE = 100
+
+# Discovery only needs the grouping keys; everything else is batch-read for duplicates
+SEARCH_PROPERTIES = ("email", "phone")
+CONTACT_PROPERTIES = (
+    "email", "phone", "hs_additional_emails", "createdate",
+    "firstname", "lastname", "company", "lifecyclestage",
+    "lastcontactdate", "notes_last_contacted", "hs_analytics_last_timestamp"
+)
+
 # ========== Helper Functions ==========
 
 def normalize_phone(phone):
     """Normalize phone number by removing country codes and spaces"""
     if not phone:
         return None
-    phone_str = str(phone).replace("+91", "").replace(" ", "").replace("-", "").strip()
-    return phone_str if phone_str.isdigit() and len(phone_str) >= 10 else None
+    phone_str = str(phone).strip().translate(PHONE_STRIP_TABLE)
+    # Only the Indian country code is dropped; any other "+" prefix fails the digit check below
+    if phone_str.startswith("+91"):
+        phone_str = phone_str[3:]
+    elif len(phone_str) == 12 and phone_str.startswith("91"):
+        phone_str = phone_str[2:]
+    return phone_str if phone_str.isascii() and phone_str.isdigit() and len(phone_str) >= 10 else None
+
+@lru_cache(maxsize=1 << 16)
+def parse_hubspot_date(date_str):
+    """Parse a HubSpot ISO-8601 timestamp, falling back to dateutil for other formats"""
+    try:
+        if ciso8601 is not None:
+            return ciso8601.parse_datetime(date_str)
+        return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+    except ValueError:
+        return parser.parse(date_str)
 
 def get_last_contact_date(contact):
     """Get the most recent contact date from various possible fields"""
     props = contact["properties"]
     
-    date_fields = [
-        "lastcontactdate",
-        "notes_last_contacted", 
-        "hs_analytics_last_timestamp"
-    ]
+    primary_date = props.get(PRIMARY_CONTACT_DATE_FIELD)
+    if primary_date:
+        try:
+            return primary_date, parse_hubspot_date(primary_date)
+        except (ValueError, OverflowError):
+            pass
     
     latest_date = None
     latest_date_parsed = None
     
-    for field in date_fields:
+    for field in FALLBACK_CONTACT_DATE_FIELDS:
         date_value = props.get(field)
         if date_value:
             try:
-                parsed_date = parser.parse(date_value)
+                parsed_date = parse_hubspot_date(date_value)
                 if latest_date_parsed is None or parsed_date > latest_date_parsed:
                     latest_date = date_value
                     latest_date_parsed = parsed_date
@@ -68,73 +135,101 @@ def get_last_contact_date(contact):
         latest_date = props.get("createdate")
         if latest_date:
             try:
-                latest_date_parsed = parser.parse(latest_date)
+                latest_date_parsed = parse_hubspot_date(latest_date)
             except:
                 latest_date_parsed = datetime.min.replace(tzinfo=timezone.utc)
     
     return latest_date, latest_date_parsed
 
+def last_contact_sort_key(contact):
+    """Parsed last contact date for ordering, oldest possible when unknown"""
+    return get_last_contact_date(contact)[1] or datetime.min.replace(tzinfo=timezone.utc)
+
 def fetch_contacts_for_date():
-    """Fetch all contacts created on the target date"""
+    """Yield contacts created on the target date, one search page at a time"""
     url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-    all_contacts = []
     after = None
     fetched = 0
 
-    print(f"🔍 Fetching contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}...")
+    log.info(f"🔍 Fetching contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}...")
+
+    # Built once; only the paging cursor changes between pages
+    payload = {
+        "filterGroups": [{
+            "filters": [
+                {
+                    "propertyName": "createdate",
+                    "operator": "GTE",
+                    "value": TARGET_DATE.isoformat()
+                },
+                {
+                    "propertyName": "createdate",
+                    "operator": "LT", 
+                    "value": NEXT_DATE.isoformat()
+                }
+            ]
+        }],
+        "properties": SEARCH_PROPERTIES,
+        "limit": 100,
+        "sorts": ["createdate"]
+    }
 
     while True:
-        payload = {
-            "filterGroups": [{
-                "filters": [
-                    {
-                        "propertyName": "createdate",
-                        "operator": "GTE",
-                        "value": TARGET_DATE.isoformat()
-                    },
-                    {
-                        "propertyName": "createdate",
-                        "operator": "LT", 
-                        "value": NEXT_DATE.isoformat()
-                    }
-                ]
-            }],
-            "properties": [
-                "email", "phone", "hs_additional_emails", "createdate", 
-                "firstname", "lastname", "company", "lifecylestage",
-                "lastcontactdate", "notes_last_contacted", "hs_analytics_last_timestamp"
-            ],
-            "limit": 100,
-            "sorts": ["createdate"]
-        }
-        
         if after:
             payload["after"] = after
 
         try:
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=15)
+            response = hubspot_request("POST", url, json=payload, timeout=15)
             response.raise_for_status()
-            data = response.json()
+            data = decode_json(response)
             results = data.get("results", [])
-            all_contacts.extend(results)
+            yield from results
             fetched += len(results)
 
             if fetched > 0 and fetched % 100 == 0:
-                print(f"📊 Fetched {fetched} contacts so far...")
+                log.info(f"📊 Fetched {fetched} contacts so far...")
 
             if "paging" in data and "next" in data["paging"]:
                 after = data["paging"]["next"]["after"]
             else:
                 break
-
-            time.sleep(0.1)  # Rate limiting
             
         except requests.exceptions.RequestException as e:
-            print(f"❌ Error fetching contacts: {e}")
+            log.error(f"❌ Error fetching contacts: {e}")
             break
 
-    print(f"✅ Total contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}: {len(all_contacts)}")
-    return all_contacts
+    log.info(f"✅ Total contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}: {fetched}")
+
+def batch_read_contacts(contact_ids):
+    """Read CONTACT_PROPERTIES for the given IDs via batch read, keyed by contact ID"""
+    url = "https://api.hubapi.com/crm/v3/objects/contacts/batch/read"
+    contact_ids = list(contact_ids)
+    contacts_by_id = {}
+
+    for start in range(0, len(contact_ids), BATCH_READ_SIZE):
+        chunk = contact_ids[start:start + BATCH_READ_SIZE]
+        payload = {
+            "properties": CONTACT_PROPERTIES,
+            "inputs": [{"id": str(contact_id)} for contact_id in chunk]
+        }
+        try:
+            response = hubspot_request("POST", url, json=payload, timeout=15)
+            response.raise_for_status()
+            for contact in decode_json(response).get("results", []):
+                contacts_by_id[contact["id"]] = contact
+        except requests.exceptions.RequestException as e:
+            log.error(f"❌ Error reading contact details: {e}")
+
+    return contacts_by_id
+
+def hydrate_groups(groups, contacts_by_id):
+    """Swap each group's search records for full ones, dropping contacts the batch read didn't return"""
+    hydrated = {}
+    for key, group in groups.items():
+        group = [contacts_by_id[contact["id"]] for contact in group if contact["id"] in contacts_by_id]
+        if len(group) > 1:
+            hydrated[key] = group
+    return hydrated
 
 def merge_contacts(primary_id, to_merge_id):
     """Merge two contacts - merge to_merge_id into primary_id"""
@@ -145,123 +240,227 @@ def merge_contacts(primary_id, to_merge_id):
     }
     
     try:
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=10)
+        response = hubspot_request("POST", url, json=payload, timeout=10)
         response.raise_for_status()
-        return response.json()
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"❌ Merge failed: {e}")
+    record_merge(primary_id, to_merge_id)
+    return decode_json(response)
 
-def process_duplicate_group(identifier, contacts, identifier_type="phone"):
-    """Process a group of duplicate contacts using pairwise merge strategy"""
-    print(f"\n🔄 Processing {identifier_type}: {identifier} ({len(contacts)} contacts)")
-    print("=" * 60)
-    
-    # Sort contacts by last contact date (most recent first)
-    contacts_with_dates = []
-    for contact in contacts:
-        last_contact_str, last_contact_parsed = get_last_contact_date(contact)
-        contacts_with_dates.append({
-            'contact': contact,
-            'last_contact_str': last_contact_str,
-            'last_contact_parsed': last_contact_parsed or datetime.min.replace(tzinfo=timezone.utc)
-        })
+def wait_for_merge(merged_id, attempts=6, delay=0.5):
+    """Poll a contact that was just merged away until HubSpot stops serving it as its own record
+    (404, or a redirect to the surviving contact). Gives up after attempts * delay seconds,
+    the same 3s the fixed pause between merge steps used to take."""
+    url = f"https://api.hubapi.com/crm/v3/objects/contacts/{merged_id}"
+    for attempt in range(attempts):
+        try:
+            response = hubspot_request("GET", url, params={"properties": "hs_object_id"}, timeout=10)
+            if response.status_code == 404:
+                return True
+            if response.status_code == 200 and str(decode_json(response).get("id")) != str(merged_id):
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(delay)
+    return False
+
+def batch_merge(pairs):
+    """Merge (primary_id, to_merge_id) pairs concurrently, at most RATE_LIMIT in flight.
+    Returns a list of (pair, error) tuples, where error is None on success."""
+    outcomes = []
+    if not pairs:
+        return outcomes
+
+    # The pool caps merges in flight; the token bucket in hubspot_request caps the rate
+    with ThreadPoolExecutor(max_workers=RATE_LIMIT) as executor:
+        futures = {executor.submit(merge_contacts, *pair): pair for pair in pairs}
+        for done, future in enumerate(as_completed(futures), 1):
+            pair = futures[future]
+            try:
+                future.result()
+                outcomes.append((pair, None))
+            except Exception as e:
+                outcomes.append((pair, str(e)))
+            if done % MERGE_PROGRESS_INTERVAL == 0 or done == len(pairs):
+                log.info(f"📦 Merged {done}/{len(pairs)} pairs")
+
+    return outcomes
+
+def process_duplicate_group(identifier, contacts, identifier_type="phone", pending_merges=None):
+    """Process a group of duplicate contacts using pairwise merge strategy.
+    If pending_merges is given, 2-contact merges are queued there instead of run inline."""
+    log.info(f"\n🔄 Processing {identifier_type}: {identifier} ({len(contacts)} contacts)")
+    log.info("=" * 60)
     
-    contacts_with_dates.sort(key=lambda x: x['last_contact_parsed'], reverse=True)
+    # Order by last contact date (most recent first) only as far as each branch needs
+    if len(contacts) == 2:
+        primary = max(contacts, key=last_contact_sort_key)
+        ordered = [primary, contacts[1] if primary is contacts[0] else contacts[0]]
+    elif len(contacts) == 3:
+        ordered = sorted(contacts, key=last_contact_sort_key, reverse=True)
+    else:
+        ordered = contacts
     
     # Display contacts
-    for i, item in enumerate(contacts_with_dates, 1):
-        contact = item['contact']
+    for i, contact in enumerate(ordered, 1):
         props = contact['properties']
         name = f"{props.get('firstname', '')} {props.get('lastname', '')}".strip() or "No Name"
-        print(f"  {i}. ID: {contact['id']} | Name: {name} | Email: {props.get('email', 'N/A')}")
+        log.info(f"  {i}. ID: {contact['id']} | Name: {name} | Email: {props.get('email', 'N/A')}")
     
     if len(contacts) == 2:
         # Simple case: merge 2 contacts
-        primary_contact = contacts_with_dates[0]['contact']
-        merge_contact = contacts_with_dates[1]['contact']
+        primary_contact, merge_contact = ordered
+        
+        if is_merged(primary_contact['id'], merge_contact['id']):
+            log.info(f"⏭️ {merge_contact['id']} was already merged into {primary_contact['id']} in a previous run")
+            return {"status": "skipped", "final_contact": primary_contact['id']}
+        
+        if pending_merges is not None:
+            log.info(f"📥 Queued merge of {merge_contact['id']} into {primary_contact['id']}")
+            pending_merges.append((primary_contact['id'], merge_contact['id']))
+            return {"status": "queued", "final_contact": primary_contact['id'], "merged_count": 1}
         
         try:
-            print(f"🚀 Merging {merge_contact['id']} into {primary_contact['id']}...")
+            log.info(f"🚀 Merging {merge_contact['id']} into {primary_contact['id']}...")
             result = merge_contacts(primary_contact['id'], merge_contact['id'])
-            print(f"✅ Successfully merged! Final contact: {primary_contact['id']}")
+            log.info(f"✅ Successfully merged! Final contact: {primary_contact['id']}")
             return {"status": "success", "final_contact": primary_contact['id'], "merged_count": 1}
         except Exception as e:
-            print(f"❌ Merge failed: {e}")
+            log.error(f"❌ Merge failed: {e}")
             return {"status": "failed", "error": str(e)}
             
     elif len(contacts) == 3:
         # For 3 contacts: use two-step merge strategy
-        most_recent = contacts_with_dates[0]['contact']
-        second_recent = contacts_with_dates[1]['contact'] 
-        oldest = contacts_with_dates[2]['contact']
+        most_recent, second_recent, oldest = ordered
         
-        print(f"🔄 3-contact merge strategy:")
-        print(f"  Step 1: {second_recent['id']} → {oldest['id']}")
-        print(f"  Step 2: {oldest['id']} → {most_recent['id']}")
+        log.info(f"🔄 3-contact merge strategy:")
+        log.info(f"  Step 1: {second_recent['id']} → {oldest['id']}")
+        log.info(f"  Step 2: {oldest['id']} → {most_recent['id']}")
         
         try:
             # Step 1: Merge 2nd recent into oldest
-            print(f"🔄 Step 1: Merging {second_recent['id']} into {oldest['id']}...")
-            result1 = merge_contacts(oldest['id'], second_recent['id'])
-            print(f"✅ Step 1 complete!")
-            
-            time.sleep(3)  # Wait between merges
+            if is_merged(oldest['id'], second_recent['id']):
+                log.info("⏭️ Step 1 already done in a previous run")
+            else:
+                log.info(f"🔄 Step 1: Merging {second_recent['id']} into {oldest['id']}...")
+                result1 = merge_contacts(oldest['id'], second_recent['id'])
+                log.info(f"✅ Step 1 complete!")
+                
+                # Make sure the first merge has landed before merging its result
+                if not wait_for_merge(second_recent['id']):
+                    log.warning(f"⚠️ Contact {second_recent['id']} still not merged away, attempting step 2 anyway")
             
             # Step 2: Merge result into most recent
-            print(f"🔄 Step 2: Merging {oldest['id']} into {most_recent['id']}...")
-            result2 = merge_contacts(most_recent['id'], oldest['id'])
-            print(f"✅ Step 2 complete! Final contact: {most_recent['id']}")
+            if is_merged(most_recent['id'], oldest['id']):
+                log.info("⏭️ Step 2 already done in a previous run")
+            else:
+                log.info(f"🔄 Step 2: Merging {oldest['id']} into {most_recent['id']}...")
+                result2 = merge_contacts(most_recent['id'], oldest['id'])
+                log.info(f"✅ Step 2 complete! Final contact: {most_recent['id']}")
             
             return {"status": "success", "final_contact": most_recent['id'], "merged_count": 2}
             
         except Exception as e:
-            print(f"❌ 3-contact merge failed: {e}")
-            print("💡 Manual merge required in HubSpot UI")
+            log.error(f"❌ 3-contact merge failed: {e}")
+            log.info("💡 Manual merge required in HubSpot UI")
             return {"status": "failed", "error": str(e), "manual_required": True}
             
     else:
         # For 4+ contacts - too complex for API
-        print(f"⚠️ Complex case ({len(contacts)} contacts) - Manual merge required")
-        print("💡 Use HubSpot UI duplicate management for this group")
-        contact_ids = [item['contact']['id'] for item in contacts_with_dates]
+        log.info(f"⚠️ Complex case ({len(contacts)} contacts) - Manual merge required")
+        log.info("💡 Use HubSpot UI duplicate management for this group")
+        contact_ids = [contact['id'] for contact in contacts]
         return {"status": "manual_required", "contact_ids": contact_ids, "count": len(contacts)}
 
-def process_duplicates():
-    """Main function to process duplicate contacts for the specified date"""
+def run_merge_phase(duplicates, identifier_type, results):
+    """Process duplicate groups concurrently, then submit the queued 2-contact merges"""
+    pending_merges = []
     
-    print("🚀 PROCESSING DUPLICATE CONTACTS")
-    print(f"📅 Target Date: {TARGET_DATE.strftime('%Y-%m-%d')}")
-    print("🎯 Using HubSpot-compliant pairwise merge strategy")
-    print("=" * 80)
+    with ThreadPoolExecutor(max_workers=RATE_LIMIT) as executor:
+        futures = {
+            executor.submit(process_duplicate_group, identifier, duplicate_contacts, identifier_type, pending_merges): identifier
+            for identifier, duplicate_contacts in duplicates.items()
+        }
+        # Results are tallied here on the calling thread as groups finish
+        for future in as_completed(futures):
+            identifier = futures[future]
+            try:
+                result = future.result()
+            except Exception as e:
+                log.error(f"❌ Error processing {identifier_type} {identifier}: {e}")
+                result = {"status": "failed", "error": str(e)}
+            
+            if result["status"] == "success":
+                results[f"{identifier_type}_success"] += 1
+                results["total_merges"] += result.get("merged_count", 0)
+            elif result["status"] == "failed":
+                results[f"{identifier_type}_failed"] += 1
+            elif result["status"] == "skipped":
+                results["skipped"] += 1
+            elif result["status"] == "manual_required":
+                results[f"{identifier_type}_manual"] += 1
+                results["manual_cases"].append({"type": identifier_type, "identifier": identifier, "contacts": result["contact_ids"]})
     
-    # Fetch contacts for the target date
-    contacts = fetch_contacts_for_date()
+    for (primary_id, to_merge_id), error in batch_merge(pending_merges):
+        if error:
+            log.error(f"❌ Merge of {to_merge_id} into {primary_id} failed: {error}")
+            results[f"{identifier_type}_failed"] += 1
+        else:
+            results[f"{identifier_type}_success"] += 1
+            results["total_merges"] += 1
+
+def process_duplicates():
+    """Main function to process duplicate contacts for the specified date"""
     
-    if not contacts:
-        print(f"📭 No contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}.")
-        return
+    log.info("🚀 PROCESSING DUPLICATE CONTACTS")
+    log.info(f"📅 Target Date: {TARGET_DATE.strftime('%Y-%m-%d')}")
+    log.info("🎯 Using HubSpot-compliant pairwise merge strategy")
+    log.info("=" * 80)
     
-    # Group contacts by phone and email
-    phone_groups = defaultdict(list)
-    email_groups = defaultdict(list)
+    # Group contacts by phone and email as pages arrive
+    phone_groups = {}
+    email_groups = {}
+    total_contacts = 0
+    seen_ids = set()
     
-    for contact in contacts:
+    for contact in fetch_contacts_for_date():
+        # Search pages can overlap; never group a contact with itself
+        if contact["id"] in seen_ids:
+            continue
+        seen_ids.add(contact["id"])
+        total_contacts += 1
         props = contact["properties"]
-        email = props.get("email", "").lower().strip() if props.get("email") else None
+        raw_email = props.get("email")
+        email = raw_email.strip().lower() if raw_email else None
         phone = normalize_phone(props.get("phone"))
         
         if phone:
-            phone_groups[phone].append(contact)
+            phone_groups.setdefault(phone, []).append(contact)
         if email:
-            email_groups[email].append(contact)
+            email_groups.setdefault(email, []).append(contact)
+    
+    if not total_contacts:
+        log.info(f"📭 No contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}.")
+        return
     
     # Find duplicates
     phone_duplicates = {phone: contacts for phone, contacts in phone_groups.items() if len(contacts) > 1}
     email_duplicates = {email: contacts for email, contacts in email_groups.items() if len(contacts) > 1}
     
-    print(f"\n📊 DUPLICATE ANALYSIS:")
-    print(f"📱 Phone duplicates found: {len(phone_duplicates)}")
-    print(f"📧 Email duplicates found: {len(email_duplicates)}")
+    log.info(f"\n📊 DUPLICATE ANALYSIS:")
+    log.info(f"📱 Phone duplicates found: {len(phone_duplicates)}")
+    log.info(f"📧 Email duplicates found: {len(email_duplicates)}")
+    
+    # Load full properties only for contacts that are part of a duplicate group
+    duplicate_ids = {contact["id"] for group in (*phone_duplicates.values(), *email_duplicates.values()) for contact in group}
+    if duplicate_ids:
+        full_contacts = batch_read_contacts(duplicate_ids)
+        # Without their dates the primary would be picked blindly, so unread contacts sit this run out
+        unread = len(duplicate_ids - full_contacts.keys())
+        if unread:
+            log.warning(f"⚠️ Could not read details for {unread} duplicate contact(s); leaving them out of this run")
+        phone_duplicates = hydrate_groups(phone_duplicates, full_contacts)
+        email_duplicates = hydrate_groups(email_duplicates, full_contacts)
     
     # Process results tracking
     results = {
@@ -272,88 +471,80 @@ def process_duplicates():
         "email_failed": 0,
         "email_manual": 0,
         "total_merges": 0,
+        "skipped": 0,
         "manual_cases": []
     }
     
     # Process phone duplicates
     if phone_duplicates:
-        print(f"\n📱 PROCESSING PHONE DUPLICATES:")
-        print("=" * 50)
+        log.info(f"\n📱 PROCESSING PHONE DUPLICATES:")
+        log.info("=" * 50)
         
-        for phone, duplicate_contacts in phone_duplicates.items():
-            result = process_duplicate_group(phone, duplicate_contacts, "phone")
-            
-            if result["status"] == "success":
-                results["phone_success"] += 1
-                results["total_merges"] += result["merged_count"]
-            elif result["status"] == "failed":
-                results["phone_failed"] += 1
-            elif result["status"] == "manual_required":
-                results["phone_manual"] += 1
-                results["manual_cases"].append({"type": "phone", "identifier": phone, "contacts": result["contact_ids"]})
-            
-            time.sleep(2)  # Rate limiting between groups
+        run_merge_phase(phone_duplicates, "phone", results)
     
     # Process email duplicates
     if email_duplicates:
-        print(f"\n📧 PROCESSING EMAIL DUPLICATES:")
-        print("=" * 50)
+        log.info(f"\n📧 PROCESSING EMAIL DUPLICATES:")
+        log.info("=" * 50)
         
-        for email, duplicate_contacts in email_duplicates.items():
-            result = process_duplicate_group(email, duplicate_contacts, "email")
-            
-            if result["status"] == "success":
-                results["email_success"] += 1
-                results["total_merges"] += result.get("merged_count", 0)
-            elif result["status"] == "failed":
-                results["email_failed"] += 1
-            elif result["status"] == "manual_required":
-                results["email_manual"] += 1
-                results["manual_cases"].append({"type": "email", "identifier": email, "contacts": result["contact_ids"]})
-            
-            time.sleep(2)  # Rate limiting between groups
+        run_merge_phase(email_duplicates, "email", results)
     
     # Final Summary
-    print(f"\n📊 FINAL PROCESSING SUMMARY:")
-    print("=" * 60)
-    print(f"📅 Date Processed: {TARGET_DATE.strftime('%Y-%m-%d')}")
-    print(f"📧 Total Contacts: {len(contacts)}")
-    print(f"🔄 Total Successful Merges: {results['total_merges']}")
-    print(f"✅ Phone Merges Successful: {results['phone_success']}")
-    print(f"✅ Email Merges Successful: {results['email_success']}")
-    print(f"❌ Phone Merges Failed: {results['phone_failed']}")
-    print(f"❌ Email Merges Failed: {results['email_failed']}")
-    print(f"⚠️ Phone Groups Needing Manual Merge: {results['phone_manual']}")
-    print(f"⚠️ Email Groups Needing Manual Merge: {results['email_manual']}")
+    log.info(f"\n📊 FINAL PROCESSING SUMMARY:")
+    log.info("=" * 60)
+    log.info(f"📅 Date Processed: {TARGET_DATE.strftime('%Y-%m-%d')}")
+    log.info(f"📧 Total Contacts: {total_contacts}")
+    log.info(f"🔄 Total Successful Merges: {results['total_merges']}")
+    log.info(f"✅ Phone Merges Successful: {results['phone_success']}")
+    log.info(f"✅ Email Merges Successful: {results['email_success']}")
+    # Only report at error level when something actually failed, so healthy runs don't trip alerts
+    log.log(logging.ERROR if results['phone_failed'] else logging.INFO, f"❌ Phone Merges Failed: {results['phone_failed']}")
+    log.log(logging.ERROR if results['email_failed'] else logging.INFO, f"❌ Email Merges Failed: {results['email_failed']}")
+    log.info(f"⚠️ Phone Groups Needing Manual Merge: {results['phone_manual']}")
+    log.info(f"⚠️ Email Groups Needing Manual Merge: {results['email_manual']}")
+    log.info(f"⏭️ Groups Already Merged in Earlier Runs: {results['skipped']}")
     
     if results["manual_cases"]:
-        print(f"\n📋 MANUAL MERGE REQUIRED:")
-        print("=" * 40)
+        log.info(f"\n📋 MANUAL MERGE REQUIRED:")
+        log.info("=" * 40)
         for case in results["manual_cases"]:
-            print(f"{case['type'].upper()}: {case['identifier']}")
-            print(f"  Contact IDs: {case['contacts']}")
+            log.info(f"{case['type'].upper()}: {case['identifier']}")
+            log.info(f"  Contact IDs: {case['contacts']}")
     
     total_processed = (results['phone_success'] + results['phone_failed'] + results['phone_manual'] + 
                       results['email_success'] + results['email_failed'] + results['email_manual'])
     
     if total_processed > 0:
         success_rate = ((results['phone_success'] + results['email_success']) / total_processed) * 100
-        print(f"\n🎯 Overall Success Rate: {success_rate:.1f}%")
+        log.info(f"\n🎯 Overall Success Rate: {success_rate:.1f}%")
     
-    print(f"\n🎉 Processing Complete!")
+    log.info(f"\n🎉 Processing Complete!")
 
 # ========== Main Logic ==========
 
+def setup_logging():
+    """Route log records through a queue so console writes happen off the worker threads"""
+    log_queue = queue.Queue()
+    listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s",
+                        handlers=[QueueHandler(log_queue)])
+    listener.start()
+    return listener
+
 def main():
-    print("🚀 DUPLICATE CONTACT PROCESSOR")
-    print(f"📅 Processing Date: {TARGET_DATE.strftime('%Y-%m-%d')}")
-    print("🎯 HubSpot-compliant pairwise merge strategy")
-    print("=" * 80)
+    listener = setup_logging()
+    
+    log.info("🚀 DUPLICATE CONTACT PROCESSOR")
+    log.info(f"📅 Processing Date: {TARGET_DATE.strftime('%Y-%m-%d')}")
+    log.info("🎯 HubSpot-compliant pairwise merge strategy")
+    log.info("=" * 80)
     
     try:
         process_duplicates()
     except Exception as e:
-        print(f"❌ An error occurred: {e}")
+        log.error(f"❌ An error occurred: {e}")
+    finally:
+        listener.stop()
 
 if __name__ == "__main__":
     main()
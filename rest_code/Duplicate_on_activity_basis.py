@@ -1,17 +1,40 @@
 import os
+import sys
+import queue
+import logging
 import requests
 import time
 from datetime import datetime, timezone, timedelta
-from dateutil import parser
-from collections import defaultdict
+from logging.handlers import QueueHandler, QueueListener
+
+log = logging.getLogger(__name__)
 
 
 # ========== CONFIG ==========
-HUBSPOT_TOKEN = os.getenv('HUBSPOT_TOKEN', 'your-hubspot-token-here')
-HEADERS = {
-    "Authorization": f"Bearer {HUBSPOT_TOKEN}",
-    "Content-Type": "application/json"
-}
+# Add parent directory to path for importing config
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+try:
+    from config import HEADERS, HUBSPOT_TOKEN, RATE_LIMIT, hubspot_request, decode_json
+except ImportError:
+    HUBSPOT_TOKEN = os.getenv('HUBSPOT_TOKEN', 'your-hubspot-token-here')
+    HEADERS = {
+        "Authorization": f"Bearer {HUBSPOT_TOKEN}",
+        "Content-Type": "application/json"
+    }
+    RATE_LIMIT = int(os.getenv('RATE_LIMIT', '10'))
+
+    SESSION = requests.Session()
+    SESSION.headers.update(HEADERS)
+
+    def hubspot_request(method, url, **kwargs):
+        """Send a HubSpot request paced to RATE_LIMIT"""
+        time.sleep(1 / RATE_LIMIT)
+        return SESSION.request(method, url, **kwargs)
+
+    def decode_json(response):
+        """Decode a HubSpot JSON response"""
+        return response.json()
 
 
 # Create IST timezone (UTC+5:30)
@@ -22,90 +45,110 @@ IST = timezone(timedelta(hours=5, minutes=30))
 TARGET_DATE = datetime(2025, 8, 14, tzinfo=IST)  # Now using IST timezone
 
 
+# Properties requested for every contact in the activity search
+ACTIVITY_PROPERTIES = ("email", "phone", "hs_additional_emails", "createdate", "notes_last_contacted", "firstname", "lastname")
+
+# Characters dropped from phone numbers before comparison
+PHONE_STRIP_TABLE = str.maketrans("", "", " -")
+
+
 # ========== Helper Functions ==========
 
 
-def fetch_contacts_by_last_activity_date(start_date, end_date, limit=15000):
-    """Fetch contacts with last activity between start_date and end_date"""
+def fetch_contacts_by_last_activity_date(start_date, end_date, limit=15000, last_seen_id=None):
+    """Yield contacts with last activity between start_date and end_date, page by page.
+
+    Pages are keyed on hs_object_id (sorted ascending, filtered on the last ID seen)
+    instead of the `after` cursor, which HubSpot rejects past 10,000 results.
+    Pass last_seen_id to resume an interrupted fetch.
+    """
     url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-    all_contacts = []
-    after = None
     fetched = 0
     page_count = 0
 
 
-    print(f"🔍 Fetching contacts with last activity between {start_date.strftime('%Y-%m-%d %H:%M:%S %Z')} and {end_date.strftime('%Y-%m-%d %H:%M:%S %Z')}...")
+    log.info(f"🔍 Fetching contacts with last activity between {start_date.strftime('%Y-%m-%d %H:%M:%S %Z')} and {end_date.strftime('%Y-%m-%d %H:%M:%S %Z')}...")
+
+
+    # Built once; only the hs_object_id cursor value changes between pages
+    cursor_filter = {
+        "propertyName": "hs_object_id",
+        "operator": "GT",
+        "value": "0"
+    }
+    payload = {
+        "filterGroups": [{
+            "filters": [
+                {
+                    "propertyName": "notes_last_contacted",  # Changed from createdate
+                    "operator": "GTE",
+                    "value": start_date.isoformat()
+                },
+                {
+                    "propertyName": "notes_last_contacted",  # Changed from createdate
+                    "operator": "LT",
+                    "value": end_date.isoformat()
+                },
+                cursor_filter
+            ]
+        }],
+        "properties": ACTIVITY_PROPERTIES,
+        "limit": 100,
+        "sorts": [{"propertyName": "hs_object_id", "direction": "ASCENDING"}]
+    }
 
 
     while fetched < limit:
         page_count += 1
-        payload = {
-            "filterGroups": [{
-                "filters": [
-                    {
-                        "propertyName": "notes_last_contacted",  # Changed from createdate
-                        "operator": "GTE",
-                        "value": start_date.isoformat()
-                    },
-                    {
-                        "propertyName": "notes_last_contacted",  # Changed from createdate
-                        "operator": "LT",
-                        "value": end_date.isoformat()
-                    }
-                ]
-            }],
-            "properties": ["email", "phone", "hs_additional_emails", "createdate", "notes_last_contacted", "firstname", "lastname"],  # Added notes_last_contacted
-            "limit": 100,
-            "sorts": ["notes_last_contacted"]  # Changed sorting
-        }
-        if after:
-            payload["after"] = after
+        cursor_filter["value"] = str(last_seen_id or 0)
 
 
         try:
-            print(f"📄 Fetching page {page_count}... (Total so far: {fetched})")
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=30)
+            log.info(f"📄 Fetching page {page_count}... (Total so far: {fetched})")
+            response = hubspot_request("POST", url, json=payload, timeout=30)
             response.raise_for_status()
         except requests.exceptions.ReadTimeout:
-            print("⏱️ Read timeout while fetching contacts. Continuing with what we have...")
+            log.warning("⏱️ Read timeout while fetching contacts. Continuing with what we have...")
             break
         except requests.exceptions.RequestException as e:
-            print(f"❌ Network error while fetching contacts: {e}")
+            log.error(f"❌ Network error while fetching contacts: {e}")
             break
 
 
-        data = response.json()
+        data = decode_json(response)
         results = data.get("results", [])
         
         if not results:
-            print("📭 No more results found.")
+            log.info("📭 No more results found.")
             break
             
-        all_contacts.extend(results)
+        yield from results[:limit - fetched]
         fetched += len(results)
         
-        print(f"✅ Page {page_count}: Retrieved {len(results)} contacts")
+        log.info(f"✅ Page {page_count}: Retrieved {len(results)} contacts")
 
 
-        # Check if there are more pages
-        if "paging" in data and "next" in data["paging"]:
-            after = data["paging"]["next"]["after"]
-            time.sleep(0.1)  # Small delay to avoid rate limiting
-        else:
-            print("📄 No more pages available.")
+        # Continue from the last ID on this page; a short page means we're done
+        last_seen_id = results[-1]["id"]
+        if len(results) < payload["limit"]:
+            log.info("📄 No more pages available.")
             break
 
 
-    print(f"🎯 Total contacts fetched: {len(all_contacts)}")
-    return all_contacts[:limit]
+    log.info(f"🎯 Total contacts fetched: {min(fetched, limit)}")
 
 
 def normalize_phone(phone):
     """Normalize phone number by removing country codes and spaces"""
     if not phone:
         return None
-    phone_str = str(phone).replace("+91", "").replace(" ", "").replace("-", "").strip()
-    return phone_str if phone_str.isdigit() and len(phone_str) >= 10 else None
+    phone_str = str(phone).strip().translate(PHONE_STRIP_TABLE)
+    # Only the Indian country code is dropped; any other "+" prefix fails the digit check below
+    if phone_str.startswith("+91"):
+        phone_str = phone_str[3:]
+    elif len(phone_str) == 12 and phone_str.startswith("91"):
+        phone_str = phone_str[2:]
+    return phone_str if phone_str.isascii() and phone_str.isdigit() and len(phone_str) >= 10 else None
 
 
 def find_duplicates_for_specific_date_by_activity(target_date):
@@ -116,99 +159,110 @@ def find_duplicates_for_specific_date_by_activity(target_date):
     # Set end time to beginning of next day (this will exclude the next day)
     end_of_day = start_of_day + timedelta(days=1)
     
-    print(f"🔍 Exact search range for LAST ACTIVITY:")
-    print(f"   Start: {start_of_day.isoformat()}")
-    print(f"   End:   {end_of_day.isoformat()}")
-    
-    contacts = fetch_contacts_by_last_activity_date(start_of_day, end_of_day)
-    
-    if not contacts:
-        print(f"📭 No contacts found with last activity on {target_date.strftime('%Y-%m-%d')}.")
-        return None, None
+    log.info(f"🔍 Exact search range for LAST ACTIVITY:")
+    log.info(f"   Start: {start_of_day.isoformat()}")
+    log.info(f"   End:   {end_of_day.isoformat()}")
     
-    print(f"📊 Found {len(contacts)} contacts with last activity on {target_date.strftime('%Y-%m-%d')} (from 00:00 to 23:59 IST).")
+    # Group contacts by email and phone as pages arrive
+    email_groups = {}
+    phone_groups = {}
+    total_contacts = 0
+    seen_ids = set()
     
-    # Group contacts by email and phone
-    email_groups = defaultdict(list)
-    phone_groups = defaultdict(list)
-    
-    for contact in contacts:
-        props = contact["properties"]
+    for contact in fetch_contacts_by_last_activity_date(start_of_day, end_of_day):
         contact_id = contact["id"]
-        email = props.get("email", "").lower().strip() if props.get("email") else None
+        # Search pages can overlap; never group a contact with itself
+        if contact_id in seen_ids:
+            continue
+        seen_ids.add(contact_id)
+        total_contacts += 1
+        props = contact["properties"]
+        raw_email = props.get("email")
+        email = raw_email.lower().strip() if raw_email else None
         phone = normalize_phone(props.get("phone"))
-        firstname = props.get("firstname", "")
-        lastname = props.get("lastname", "")
-        created = props.get("createdate")
-        last_activity = props.get("notes_last_contacted")  # Added last activity
-        
-        contact_info = {
-            "id": contact_id,
-            "email": email,
-            "phone": phone,
-            "firstname": firstname,
-            "lastname": lastname,
-            "createdate": created,
-            "last_activity": last_activity  # Added last activity
-        }
+        entry = (contact_id, email, phone, props)
         
         # Group by email
         if email:
-            email_groups[email].append(contact_info)
+            email_groups.setdefault(email, []).append(entry)
         
         # Group by phone
         if phone:
-            phone_groups[phone].append(contact_info)
+            phone_groups.setdefault(phone, []).append(entry)
+    
+    if not total_contacts:
+        log.info(f"📭 No contacts found with last activity on {target_date.strftime('%Y-%m-%d')}.")
+        return None, None
+    
+    log.info(f"📊 Found {total_contacts} contacts with last activity on {target_date.strftime('%Y-%m-%d')} (from 00:00 to 23:59 IST).")
+    
+    # Build display records only for contacts that turn out to be duplicated
+    contact_infos = {}
+    
+    def contact_info(entry):
+        contact_id, email, phone, props = entry
+        info = contact_infos.get(contact_id)
+        if info is None:
+            info = contact_infos[contact_id] = {
+                "id": contact_id,
+                "email": email,
+                "phone": phone,
+                "firstname": props.get("firstname", ""),
+                "lastname": props.get("lastname", ""),
+                "createdate": props.get("createdate"),
+                "last_activity": props.get("notes_last_contacted")  # Added last activity
+            }
+        return info
     
     # Find duplicates
-    email_duplicates = {email: contacts for email, contacts in email_groups.items() if len(contacts) > 1}
-    phone_duplicates = {phone: contacts for phone, contacts in phone_groups.items() if len(contacts) > 1}
+    email_duplicates = {email: [contact_info(e) for e in entries] for email, entries in email_groups.items() if len(entries) > 1}
+    phone_duplicates = {phone: [contact_info(e) for e in entries] for phone, entries in phone_groups.items() if len(entries) > 1}
     
-    print("\n" + "="*60)
-    print(f"📧 EMAIL DUPLICATES FOUND BY LAST ACTIVITY ON {target_date.strftime('%Y-%m-%d')} (00:00 - 23:59 IST):")
-    print("="*60)
+    log.info("\n" + "="*60)
+    log.info(f"📧 EMAIL DUPLICATES FOUND BY LAST ACTIVITY ON {target_date.strftime('%Y-%m-%d')} (00:00 - 23:59 IST):")
+    log.info("="*60)
     
     if email_duplicates:
         for email, duplicate_contacts in email_duplicates.items():
-            print(f"\n🔄 Email: {email}")
-            print("-" * 50)
+            log.info(f"\n🔄 Email: {email}")
+            log.info("-" * 50)
             for i, contact in enumerate(duplicate_contacts, 1):
-                print(f"  {i}. ID: {contact['id']}")
-                print(f"     Name: {contact['firstname']} {contact['lastname']}")
-                print(f"     Phone: {contact['phone']}")
-                print(f"     Created: {contact['createdate']}")
-                print(f"     Last Activity: {contact['last_activity']}")  # Added last activity display
+                log.info(f"  {i}. ID: {contact['id']}")
+                log.info(f"     Name: {contact['firstname']} {contact['lastname']}")
+                log.info(f"     Phone: {contact['phone']}")
+                log.info(f"     Created: {contact['createdate']}")
+                log.info(f"     Last Activity: {contact['last_activity']}")  # Added last activity display
     else:
-        print("✅ No email duplicates found.")
+        log.info("✅ No email duplicates found.")
     
-    print("\n" + "="*60)
-    print(f"📱 PHONE DUPLICATES FOUND BY LAST ACTIVITY ON {target_date.strftime('%Y-%m-%d')} (00:00 - 23:59 IST):")
-    print("="*60)
+    log.info("\n" + "="*60)
+    log.info(f"📱 PHONE DUPLICATES FOUND BY LAST ACTIVITY ON {target_date.strftime('%Y-%m-%d')} (00:00 - 23:59 IST):")
+    log.info("="*60)
     
     if phone_duplicates:
         for phone, duplicate_contacts in phone_duplicates.items():
-            print(f"\n🔄 Phone: {phone}")
-            print("-" * 50)
+            log.info(f"\n🔄 Phone: {phone}")
+            log.info("-" * 50)
             for i, contact in enumerate(duplicate_contacts, 1):
-                print(f"  {i}. ID: {contact['id']}")
-                print(f"     Name: {contact['firstname']} {contact['lastname']}")
-                print(f"     Email: {contact['email']}")
-                print(f"     Created: {contact['createdate']}")
-                print(f"     Last Activity: {contact['last_activity']}")  # Added last activity display
+                log.info(f"  {i}. ID: {contact['id']}")
+                log.info(f"     Name: {contact['firstname']} {contact['lastname']}")
+                log.info(f"     Email: {contact['email']}")
+                log.info(f"     Created: {contact['createdate']}")
+                log.info(f"     Last Activity: {contact['last_activity']}")  # Added last activity display
     else:
-        print("✅ No phone duplicates found.")
+        log.info("✅ No phone duplicates found.")
     
     # Summary
     total_email_duplicates = sum(len(contacts) for contacts in email_duplicates.values())
     total_phone_duplicates = sum(len(contacts) for contacts in phone_duplicates.values())
     
-    print("\n" + "="*60)
-    print("📈 SUMMARY:")
-    print("="*60)
-    print(f"📧 Email duplicate groups: {len(email_duplicates)}")
-    print(f"📧 Total contacts with duplicate emails: {total_email_duplicates}")
-    print(f"📱 Phone duplicate groups: {len(phone_duplicates)}")
-    print(f"📱 Total contacts with duplicate phones: {total_phone_duplicates}")
+    log.info("\n" + "="*60)
+    log.info("📈 SUMMARY:")
+    log.info("="*60)
+    log.info(f"📧 Email duplicate groups: {len(email_duplicates)}")
+    log.info(f"📧 Total contacts with duplicate emails: {total_email_duplicates}")
+    log.info(f"📱 Phone duplicate groups: {len(phone_duplicates)}")
+    log.info(f"📱 Total contacts with duplicate phones: {total_phone_duplicates}")
     
     return email_duplicates, phone_duplicates
 
@@ -221,23 +275,23 @@ def merge_contacts(primary_id, to_merge_id):
         "objectIdToMerge": to_merge_id
     }
     try:
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=10)
+        response = hubspot_request("POST", url, json=payload, timeout=10)
         response.raise_for_status()
-        return response.json()
+        return decode_json(response)
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"❌ Merge failed: {e}")
 
 
 def find_duplicates_for_date_range_by_activity(start_date, days_range=7):
     """Find duplicates by last activity for multiple dates (useful for checking past week)"""
-    print(f"\n🔍 Searching for duplicates by LAST ACTIVITY over {days_range} days starting from {start_date.strftime('%Y-%m-%d')}...")
+    log.info(f"\n🔍 Searching for duplicates by LAST ACTIVITY over {days_range} days starting from {start_date.strftime('%Y-%m-%d')}...")
     
     all_results = {}
     for days_back in range(days_range):
         current_date = start_date - timedelta(days=days_back)
         date_str = current_date.strftime('%Y-%m-%d')
         
-        print(f"\n📅 Checking last activity on {date_str}...")
+        log.info(f"\n📅 Checking last activity on {date_str}...")
         email_dups, phone_dups = find_duplicates_for_specific_date_by_activity(current_date)
         
         if email_dups or phone_dups:
@@ -252,22 +306,36 @@ def find_duplicates_for_date_range_by_activity(start_date, days_range=7):
 # ========== Main Logic ==========
 
 
+def setup_logging():
+    """Route log records through a queue so console writes happen off the worker threads"""
+    log_queue = queue.Queue()
+    listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s",
+                        handlers=[QueueHandler(log_queue)])
+    listener.start()
+    return listener
+
+
 def main():
-    print("🚀 Starting Duplicate Contact Detection by LAST ACTIVITY DATE...")
-    print(f"📅 Target date: {TARGET_DATE.strftime('%Y-%m-%d %Z')} (searching contacts with last activity from 00:00 to 23:59 IST)")
-    
-    # Find duplicates for the specified date based on last activity
-    email_duplicates, phone_duplicates = find_duplicates_for_specific_date_by_activity(TARGET_DATE)
+    listener = setup_logging()
+    log.info("🚀 Starting Duplicate Contact Detection by LAST ACTIVITY DATE...")
+    log.info(f"📅 Target date: {TARGET_DATE.strftime('%Y-%m-%d %Z')} (searching contacts with last activity from 00:00 to 23:59 IST)")
     
-    # Optional: Uncomment below to check multiple dates
-    """
-    # Check duplicates for the past week starting from TARGET_DATE
-    range_results = find_duplicates_for_date_range_by_activity(TARGET_DATE, days_range=7)
-    if range_results:
-        print(f"\n📊 Found duplicates on {len(range_results)} different dates!")
-        for date_str, results in range_results.items():
-            print(f"  - {date_str}: {len(results['email_duplicates'])} email groups, {len(results['phone_duplicates'])} phone groups")
-    """
+    try:
+        # Find duplicates for the specified date based on last activity
+        email_duplicates, phone_duplicates = find_duplicates_for_specific_date_by_activity(TARGET_DATE)
+        
+        # Optional: Uncomment below to check multiple dates
+        """
+        # Check duplicates for the past week starting from TARGET_DATE
+        range_results = find_duplicates_for_date_range_by_activity(TARGET_DATE, days_range=7)
+        if range_results:
+            log.info(f"\n📊 Found duplicates on {len(range_results)} different dates!")
+            for date_str, results in range_results.items():
+                log.info(f"  - {date_str}: {len(results['email_duplicates'])} email groups, {len(results['phone_duplicates'])} phone groups")
+        """
+    finally:
+        listener.stop()
 
 
 if __name__ == "__main__":
@@ -1,11 +1,26 @@
 import os
+import re
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import time
 import csv
+import atexit
+import shelve
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timezone, timedelta
 from dateutil import parser
 from collections import defaultdict
 
+from hubspot_api import decode_json
+
+# Try to use tqdm for form analysis progress if available
+try:
+    from tqdm import tqdm
+except ImportError:
+    tqdm = None
+
 # ========== CONFIG ==========
 HUBSPOT_TOKEN = os.getenv('HUBSPOT_TOKEN', 'your-hubspot-token-here')
 HEADERS = {
@@ -13,23 +28,187 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Shared session so every HubSpot call reuses pooled keep-alive connections
+SESSION = requests.Session()
+SESSION.headers.update(HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=32,
+    pool_maxsize=64,
+    max_retries=Retry(total=5, backoff_factor=0.5, status_forcelist=[500, 502, 503, 504])
+))
+
+# Slow down once HubSpot reports this many calls or fewer left in the current window
+RATE_LIMIT_THRESHOLD = 5
+MAX_RATE_LIMIT_RETRIES = 5
+
 # Create IST timezone (UTC+5:30)
 IST = timezone(timedelta(hours=5, minutes=30))
 
 # ========== SET YOUR TARGET DATE HERE ==========
 TARGET_DATE = datetime(2025, 8, 12, tzinfo=IST)  # Now using IST timezone
 
+# Duplicate contacts whose form data is fetched concurrently
+FORM_DATA_WORKERS = 8
+# The search window is split into this many slices, paged concurrently
+SEARCH_WINDOW_SLICES = 12
+SEARCH_WORKERS = 4  # HubSpot's search endpoint allows only a few requests per second
+# Contacts per associations batch-read call (HubSpot's maximum)
+ASSOCIATION_BATCH_SIZE = 100
+
+# On-disk cache of per-contact form data so re-runs skip the form API
+FORM_CACHE_PATH = os.getenv('FORM_CACHE_PATH', 'form_cache.db')
+FORM_CACHE_EMPTY_TTL = 24 * 60 * 60  # Re-check contacts with no form data after a day
+_form_cache = None
+_form_memo = {}
+_form_cache_lock = threading.Lock()
+
+# Separators dropped from phone numbers before comparison
+PHONE_STRIP_TABLE = str.maketrans("", "", " -\t\r\n")
+
+# Contact properties scanned for form references
+FORM_URL_PROPERTIES = (
+    "hs_analytics_first_url", "hs_analytics_first_referrer", 
+    "hs_analytics_last_referrer", "hs_analytics_source_data_1",
+    "hs_analytics_source_data_2", "hs_analytics_source_data_3",
+    "hs_latest_source_data_1", "hs_latest_source_data_2"
+)
+CONVERSION_PROPERTIES = ("recent_conversion_event_name", "first_conversion_event_name")
+SOURCE_PROPERTIES = (
+    "hs_analytics_source", "hs_latest_source",
+    "hs_analytics_first_touch_converting_campaign",
+    "hs_analytics_last_touch_converting_campaign"
+)
+# Constant label prefixes for each scanned property, built once instead of per contact
+FORM_URL_LABELS = tuple(
+    (prop, f"URL Form ({prop}): ", f"Form URL ({prop}): ", f"Form Reference ({prop}): ")
+    for prop in FORM_URL_PROPERTIES
+)
+CONVERSION_LABELS = tuple((prop, f"Conversion Event ({prop}): ") for prop in CONVERSION_PROPERTIES)
+SOURCE_LABELS = tuple((prop, f"Source ({prop}): ") for prop in SOURCE_PROPERTIES)
+# Any mention of "form" (this also covers hsforms.com)
+FORM_RE = re.compile(r"form", re.IGNORECASE)
+# Form ID in a HubSpot form URL: the segment after the first "/1", up to the next "/" or "?"
+FORM_URL_ID_RE = re.compile(r"/1([^/?]*)")
+
+# CSV report header; rows are built positionally by _row in the same order
+CSV_HEADER = (
+    'Duplicate_Type', 'Duplicate_Value', 'Contact_ID', 'First_Name', 
+    'Last_Name', 'Email', 'Phone', 'Create_Date', 'Last_Modified_Date',  # Added Last_Modified_Date
+    'All_Form_Sources', 'First_URL', 'Source_Data_1', 'Source_Data_2', 
+    'Recent_Conversion', 'First_Conversion', 'Analytics_Source', 'Latest_Source'
+)
+# Contact attributes for Contact_ID..Last_Modified_Date
+CONTACT_ROW_KEYS = ('id', 'firstname', 'lastname', 'email', 'phone', 'createdate', 'lastmodifieddate')
+# Contact properties for First_URL..Latest_Source
+PROPERTY_ROW_KEYS = (
+    'hs_analytics_first_url', 'hs_analytics_source_data_1', 'hs_analytics_source_data_2',
+    'recent_conversion_event_name', 'first_conversion_event_name', 'hs_analytics_source', 'hs_latest_source'
+)
+
+# ========== Contact Record ==========
+
+class Contact:
+    """Fields of a fetched contact used for duplicate detection and the report"""
+    __slots__ = (
+        "id", "email", "phone", "firstname", "lastname",
+        "createdate", "lastmodifieddate", "properties", "form_sources"
+    )
+
+    def __init__(self, id, email, phone, firstname, lastname, createdate, lastmodifieddate, properties):
+        self.id = id
+        self.email = email
+        self.phone = phone
+        self.firstname = firstname
+        self.lastname = lastname
+        self.createdate = createdate
+        self.lastmodifieddate = lastmodifieddate  # Added this
+        self.properties = properties  # Store all properties for later analysis
+        self.form_sources = []
+
+# ========== Rate Limiting ==========
+
+class RateLimiter:
+    """Pace HubSpot calls from the X-HubSpot-RateLimit-* response headers, sleeping only when quota runs low"""
+
+    def __init__(self, threshold=RATE_LIMIT_THRESHOLD):
+        self.threshold = threshold
+        self.remaining = None  # Unknown until a response carries the headers
+        self.reset_at = 0.0
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        # Sleeping under the lock holds back every worker thread until the window resets
+        with self.lock:
+            delay = self.reset_at - time.monotonic()
+            if self.remaining is not None and self.remaining <= self.threshold and delay > 0:
+                time.sleep(delay)
+                self.remaining = None
+            elif self.remaining is not None:
+                self.remaining -= 1  # Count calls still in flight
+
+    def update(self, response):
+        remaining = response.headers.get("X-HubSpot-RateLimit-Remaining")
+        interval_ms = response.headers.get("X-HubSpot-RateLimit-Interval-Milliseconds")
+        if remaining is None or interval_ms is None:
+            return
+        with self.lock:
+            self.remaining = int(remaining)
+            # Headers don't say when the window started, so assume the worst case
+            self.reset_at = time.monotonic() + int(interval_ms) / 1000
+
+    def cooldown(self, seconds):
+        with self.lock:
+            self.remaining = 0
+            self.reset_at = max(self.reset_at, time.monotonic() + seconds)
+
+RATE_LIMITER = RateLimiter()
+
+def hubspot_request(method, url, **kwargs):
+    """Send a HubSpot request through the rate limiter, backing off on 429 (honours Retry-After)"""
+    for attempt in range(MAX_RATE_LIMIT_RETRIES + 1):
+        RATE_LIMITER.acquire()
+        response = SESSION.request(method, url, **kwargs)
+        RATE_LIMITER.update(response)
+        if response.status_code != 429 or attempt == MAX_RATE_LIMIT_RETRIES:
+            return response
+        retry_after = response.headers.get("Retry-After")
+        delay = float(retry_after) if retry_after and retry_after.isdigit() else 2 ** attempt
+        print(f"⏳ Rate limited by HubSpot, retrying in {delay}s...")
+        RATE_LIMITER.cooldown(delay)
+
 # ========== Helper Functions ==========
 
 def fetch_contacts_by_date(start_date, end_date, limit=15000):
-    """Fetch contacts with last activity between start_date and end_date with comprehensive form-related properties"""
+    """Fetch contacts with last activity between start_date and end_date with comprehensive form-related properties.
+    The window is split into SEARCH_WINDOW_SLICES slices that are paged concurrently, each with its own cursor."""
+    print(f"🔍 Fetching contacts with last activity between {start_date.strftime('%Y-%m-%d %H:%M:%S %Z')} and {end_date.strftime('%Y-%m-%d %H:%M:%S %Z')}...")
+
+    step = (end_date - start_date) / SEARCH_WINDOW_SLICES
+    windows = [
+        (start_date + step * i, end_date if i == SEARCH_WINDOW_SLICES - 1 else start_date + step * (i + 1))
+        for i in range(SEARCH_WINDOW_SLICES)
+    ]
+
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+        pages = executor.map(lambda window: fetch_contacts_in_window(window[0], window[1], limit), windows)
+
+        # A contact modified mid-run can show up in two slices; keep the first copy
+        all_contacts = {}
+        for window_contacts in pages:
+            for contact in window_contacts:
+                all_contacts.setdefault(contact["id"], contact)
+
+    print(f"🎯 Total contacts fetched: {len(all_contacts)}")
+    return list(all_contacts.values())[:limit]
+
+def fetch_contacts_in_window(start_date, end_date, limit):
+    """Page through the contacts search for one slice of the date window"""
     url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
     all_contacts = []
     after = None
     fetched = 0
     page_count = 0
-
-    print(f"🔍 Fetching contacts with last activity between {start_date.strftime('%Y-%m-%d %H:%M:%S %Z')} and {end_date.strftime('%Y-%m-%d %H:%M:%S %Z')}...")
+    label = start_date.strftime('%H:%M')
 
     while fetched < limit:
         page_count += 1
@@ -78,8 +257,8 @@ def fetch_contacts_by_date(start_date, end_date, limit=15000):
             payload["after"] = after
 
         try:
-            print(f"📄 Fetching page {page_count}... (Total so far: {fetched})")
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=30)
+            print(f"📄 [{label}] Fetching page {page_count}... (Total so far: {fetched})")
+            response = hubspot_request("POST", url, json=payload, timeout=30)
             response.raise_for_status()
         except requests.exceptions.ReadTimeout:
             print("⏱️ Read timeout while fetching contacts. Continuing with what we have...")
@@ -88,235 +267,219 @@ def fetch_contacts_by_date(start_date, end_date, limit=15000):
             print(f"❌ Network error while fetching contacts: {e}")
             break
 
-        data = response.json()
+        data = decode_json(response)
         results = data.get("results", [])
         
         if not results:
-            print("📭 No more results found.")
             break
             
         all_contacts.extend(results)
         fetched += len(results)
         
-        print(f"✅ Page {page_count}: Retrieved {len(results)} contacts")
+        print(f"✅ [{label}] Page {page_count}: Retrieved {len(results)} contacts")
 
         # Check if there are more pages
         if "paging" in data and "next" in data["paging"]:
             after = data["paging"]["next"]["after"]
-            time.sleep(0.1)  # Small delay to avoid rate limiting
         else:
-            print("📄 No more pages available.")
             break
 
-    print(f"🎯 Total contacts fetched: {len(all_contacts)}")
-    return all_contacts[:limit]
+    return all_contacts
+
+def _open_form_cache():
+    """Open the on-disk form cache on first use (caller holds _form_cache_lock)"""
+    global _form_cache
+    if _form_cache is None:
+        _form_cache = shelve.open(FORM_CACHE_PATH)
+        atexit.register(_form_cache.close)
+    return _form_cache
+
+def _has_form_data(form_data):
+    return bool(form_data['form_submissions'])
+
+def load_cached_form_data(contact_id):
+    """Return cached form data for a contact, or None when it needs a fresh lookup.
+    Empty results expire after FORM_CACHE_EMPTY_TTL."""
+    key = str(contact_id)
+    with _form_cache_lock:
+        if key in _form_memo:
+            return _form_memo[key]
+        entry = _open_form_cache().get(key)
+    if entry and (_has_form_data(entry['form_data']) or time.time() - entry['cached_at'] < FORM_CACHE_EMPTY_TTL):
+        with _form_cache_lock:
+            _form_memo[key] = entry['form_data']
+        return entry['form_data']
+    return None
 
-def get_comprehensive_form_data(contact_id):
-    """Get comprehensive form submission data for a contact"""
+def store_form_data(contact_id, form_data):
+    """Remember form data in memory and on disk"""
+    key = str(contact_id)
+    with _form_cache_lock:
+        _form_memo[key] = form_data
+        _open_form_cache()[key] = {'form_data': form_data, 'cached_at': time.time()}
+
+def fetch_form_associations(contact_ids):
+    """Batch-read form submission associations, ASSOCIATION_BATCH_SIZE contacts per call.
+    Returns {contact_id: [form_id, ...]}; contacts from failed batches are left out."""
+    url = "https://api.hubapi.com/crm/v3/associations/contact/form_submission/batch/read"
+    contact_ids = list(contact_ids)
+    associations = {}
+    
+    for i in range(0, len(contact_ids), ASSOCIATION_BATCH_SIZE):
+        batch = contact_ids[i:i + ASSOCIATION_BATCH_SIZE]
+        try:
+            response = hubspot_request("POST", url, json={"inputs": [{"id": contact_id} for contact_id in batch]}, timeout=30)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            print(f"⚠️ Could not fetch form submissions for {len(batch)} contacts: {e}")
+            continue
+        
+        # Contacts without associations come back under "errors", so default everyone to none
+        for contact_id in batch:
+            associations[str(contact_id)] = []
+        for result in decode_json(response).get("results", []):
+            contact_id = str(result.get("from", {}).get("id"))
+            associations[contact_id] = [to["id"] for to in result.get("to", []) if to.get("id")]
+    
+    return associations
+
+def get_comprehensive_form_data(contact_id, form_ids):
+    """Get comprehensive form submission data for a contact, cached in memory and on disk.
+    form_ids come from fetch_form_associations; None means that lookup failed."""
+    form_data = load_cached_form_data(contact_id)
+    if form_data is not None:
+        return form_data
+    
+    form_data = fetch_comprehensive_form_data(contact_id, form_ids)
+    if 'error' not in form_data:
+        store_form_data(contact_id, form_data)
+    return form_data
+
+def fetch_comprehensive_form_data(contact_id, form_ids):
+    """Get form submission details for a contact's associated form submissions"""
     form_data = {
         'form_submissions': [],
         'form_submission_details': []
     }
     
-    # Get form submissions via associations
-    try:
-        url = f"https://api.hubapi.com/crm/v3/objects/contacts/{contact_id}/associations/form_submission"
-        response = requests.get(url, headers=HEADERS, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        for result in data.get("results", []):
-            form_id = result.get("id")
-            if form_id:
-                form_data['form_submissions'].append(form_id)
-                
-                # Try to get form submission details
-                try:
-                    form_detail_url = f"https://api.hubapi.com/form-integrations/v1/submissions/forms/{form_id}"
-                    form_response = requests.get(form_detail_url, headers=HEADERS, timeout=10)
-                    if form_response.status_code == 200:
-                        form_details = form_response.json()
-                        form_data['form_submission_details'].append({
-                            'form_id': form_id,
-                            'details': form_details
-                        })
-                except:
-                    pass
-                    
-    except requests.exceptions.RequestException as e:
-        print(f"⚠️ Could not fetch form submissions for contact {contact_id}: {e}")
-    
-    # Alternative: Try to get form submissions from timeline/activities
-    try:
-        timeline_url = f"https://api.hubapi.com/crm/v3/objects/contacts/{contact_id}"
-        timeline_params = {
-            "properties": "hs_form_submissions,recent_conversion_event_name,first_conversion_event_name"
-        }
-        response = requests.get(timeline_url, headers=HEADERS, params=timeline_params, timeout=10)
-        response.raise_for_status()
-        
-        timeline_data = response.json()
-        props = timeline_data.get("properties", {})
+    if form_ids is None:
+        form_data['error'] = "form submission associations unavailable"  # Not cached, so the next run retries
+        return form_data
+    
+    for form_id in form_ids:
+        form_data['form_submissions'].append(form_id)
         
-        # Extract form submissions from properties
-        if props.get("hs_form_submissions"):
-            form_data['property_form_submissions'] = props["hs_form_submissions"]
-            
-    except:
-        pass
+        # Try to get form submission details
+        try:
+            form_detail_url = f"https://api.hubapi.com/form-integrations/v1/submissions/forms/{form_id}"
+            form_response = hubspot_request("GET", form_detail_url, timeout=10)
+            if form_response.status_code == 200:
+                form_details = decode_json(form_response)
+                form_data['form_submission_details'].append({
+                    'form_id': form_id,
+                    'details': form_details
+                })
+        except:
+            pass
     
     return form_data
 
-def extract_all_form_sources(contact_props, contact_id):
+def parse_form_submissions(contact_props):
+    """Form submission IDs HubSpot already returned in hs_form_submissions (semicolon-separated)"""
+    value = contact_props.get("hs_form_submissions")
+    if not value:
+        return []
+    return [form_id.strip() for form_id in str(value).split(";") if form_id.strip()]
+
+def extract_all_form_sources(contact_props, contact_id, form_ids=None):
     """Extract all possible form sources from contact properties and API calls"""
     form_sources = []
+    seen = set()
+    
+    # Append a source unless it was already found, preserving order
+    def add_source(source):
+        if source not in seen:
+            seen.add(source)
+            form_sources.append(source)
     
     # Helper function to safely get string values
     def safe_get_string(key):
         value = contact_props.get(key)
         return str(value) if value is not None else ""
     
-    # Get comprehensive form data via API
-    form_data = get_comprehensive_form_data(contact_id)
+    # Only go to the form API when the contact's own properties don't list its submissions
+    property_form_ids = parse_form_submissions(contact_props)
+    if property_form_ids:
+        form_data = {'form_submissions': property_form_ids, 'form_submission_details': []}
+    else:
+        form_data = get_comprehensive_form_data(contact_id, form_ids)
     
     # Extract form IDs from direct form submissions
     if form_data['form_submissions']:
         for form_id in form_data['form_submissions']:
-            form_sources.append(f"Form Submission: {form_id}")
+            add_source(f"Form Submission: {form_id}")
     
     # Extract from form submission details
     for detail in form_data.get('form_submission_details', []):
         form_id = detail['form_id']
-        form_sources.append(f"Form Detail: {form_id}")
+        add_source(f"Form Detail: {form_id}")
     
-    # Extract from property-based form submissions
-    if form_data.get('property_form_submissions'):
-        form_sources.append(f"Property Form: {form_data['property_form_submissions']}")
+    # Extract from property-based form submissions (already fetched with the contact)
+    if contact_props.get('hs_form_submissions'):
+        add_source(f"Property Form: {contact_props['hs_form_submissions']}")
     
     # Check all URL-based properties for form references
-    url_properties = [
-        "hs_analytics_first_url", "hs_analytics_first_referrer", 
-        "hs_analytics_last_referrer", "hs_analytics_source_data_1",
-        "hs_analytics_source_data_2", "hs_analytics_source_data_3",
-        "hs_latest_source_data_1", "hs_latest_source_data_2"
-    ]
-    
-    for prop in url_properties:
+    for prop, id_label, url_label, reference_label in FORM_URL_LABELS:
         value = safe_get_string(prop)
-        if value and ("hsforms.com" in value or "form" in value.lower()):
-            # Try to extract form ID from URL
-            if "hsforms.com" in value:
-                # Extract form ID from HubSpot form URL
-                if "/1" in value:
-                    try:
-                        parts = value.split("/1")[1].split("?")[0].split("/")[0]
-                        form_sources.append(f"URL Form ({prop}): {parts}")
-                    except:
-                        form_sources.append(f"URL Form ({prop}): {value}")
-                else:
-                    form_sources.append(f"Form URL ({prop}): {value}")
+        if not FORM_RE.search(value):
+            continue
+        if "hsforms.com" in value:
+            # Extract form ID from HubSpot form URL
+            match = FORM_URL_ID_RE.search(value)
+            if match:
+                add_source(id_label + match.group(1))
             else:
-                form_sources.append(f"Form Reference ({prop}): {value}")
+                add_source(url_label + value)
+        else:
+            add_source(reference_label + value)
     
     # Check conversion events
-    conversion_properties = ["recent_conversion_event_name", "first_conversion_event_name"]
-    for prop in conversion_properties:
+    for prop, label in CONVERSION_LABELS:
         value = safe_get_string(prop)
-        if value and "form" in value.lower():
-            form_sources.append(f"Conversion Event ({prop}): {value}")
+        if FORM_RE.search(value):
+            add_source(label + value)
     
     # Check source properties
-    source_properties = [
-        "hs_analytics_source", "hs_latest_source",
-        "hs_analytics_first_touch_converting_campaign",
-        "hs_analytics_last_touch_converting_campaign"
-    ]
-    
-    for prop in source_properties:
+    for prop, label in SOURCE_LABELS:
         value = safe_get_string(prop)
-        if value and ("form" in value.lower() or "hsforms" in value.lower()):
-            form_sources.append(f"Source ({prop}): {value}")
+        if FORM_RE.search(value):
+            add_source(label + value)
     
-    # Remove duplicates while preserving order
-    unique_sources = []
-    seen = set()
-    for source in form_sources:
-        if source not in seen:
-            unique_sources.append(source)
-            seen.add(source)
-    
-    return unique_sources if unique_sources else ["No form data found"]
+    return form_sources if form_sources else ["No form data found"]
 
 def normalize_phone(phone):
     """Normalize phone number by removing country codes and spaces"""
     if not phone:
         return None
-    phone_str = str(phone).replace("+91", "").replace(" ", "").replace("-", "").strip()
+    phone_str = str(phone).translate(PHONE_STRIP_TABLE)
+    if phone_str.startswith("+91"):
+        phone_str = phone_str[3:]
     return phone_str if phone_str.isdigit() and len(phone_str) >= 10 else None
 
-def export_duplicates_to_csv(email_duplicates, phone_duplicates, target_date):
-    """Export duplicate contacts to CSV with comprehensive form information"""
+def duplicates_csv_filename(target_date):
+    """Name of the CSV report for a target date"""
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"duplicate_contacts_lastactivity_{target_date.strftime('%Y%m%d')}_{timestamp}.csv"  # Updated filename
-    
-    with open(filename, 'w', newline='', encoding='utf-8') as csvfile:
-        fieldnames = [
-            'Duplicate_Type', 'Duplicate_Value', 'Contact_ID', 'First_Name', 
-            'Last_Name', 'Email', 'Phone', 'Create_Date', 'Last_Modified_Date',  # Added Last_Modified_Date
-            'All_Form_Sources', 'First_URL', 'Source_Data_1', 'Source_Data_2', 
-            'Recent_Conversion', 'First_Conversion', 'Analytics_Source', 'Latest_Source'
-        ]
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        writer.writeheader()
-        
-        # Write email duplicates
-        for email, contacts in email_duplicates.items():
-            for contact in contacts:
-                writer.writerow({
-                    'Duplicate_Type': 'Email',
-                    'Duplicate_Value': email,
-                    'Contact_ID': contact['id'],
-                    'First_Name': contact['firstname'],
-                    'Last_Name': contact['lastname'],
-                    'Email': contact['email'],
-                    'Phone': contact['phone'],
-                    'Create_Date': contact['createdate'],
-                    'Last_Modified_Date': contact['lastmodifieddate'],  # Added this
-                    'All_Form_Sources': "; ".join(contact['form_sources']),
-                    'First_URL': contact.get('first_url', ''),
-                    'Source_Data_1': contact.get('source_data_1', ''),
-                    'Source_Data_2': contact.get('source_data_2', ''),
-                    'Recent_Conversion': contact.get('recent_conversion', ''),
-                    'First_Conversion': contact.get('first_conversion', ''),
-                    'Analytics_Source': contact.get('analytics_source', ''),
-                    'Latest_Source': contact.get('latest_source', '')
-                })
-        
-        # Write phone duplicates
-        for phone, contacts in phone_duplicates.items():
-            for contact in contacts:
-                writer.writerow({
-                    'Duplicate_Type': 'Phone',
-                    'Duplicate_Value': phone,
-                    'Contact_ID': contact['id'],
-                    'First_Name': contact['firstname'],
-                    'Last_Name': contact['lastname'],
-                    'Email': contact['email'],
-                    'Phone': contact['phone'],
-                    'Create_Date': contact['createdate'],
-                    'Last_Modified_Date': contact['lastmodifieddate'],  # Added this
-                    'All_Form_Sources': "; ".join(contact['form_sources']),
-                    'First_URL': contact.get('first_url', ''),
-                    'Source_Data_1': contact.get('source_data_1', ''),
-                    'Source_Data_2': contact.get('source_data_2', ''),
-                    'Recent_Conversion': contact.get('recent_conversion', ''),
-                    'First_Conversion': contact.get('first_conversion', ''),
-                    'Analytics_Source': contact.get('analytics_source', ''),
-                    'Latest_Source': contact.get('latest_source', '')
-                })
-    
-    print(f"📄 Comprehensive duplicate analysis exported to: {filename}")
-    return filename
+    return f"duplicate_contacts_lastactivity_{target_date.strftime('%Y%m%d')}_{timestamp}.csv"  # Updated filename
+
+def _row(dup_type, dup_value, contact):
+    """Build one CSV row (in CSV_HEADER order) for a duplicate contact"""
+    props = contact.properties
+    return (
+        (dup_type, dup_value)
+        + tuple([getattr(contact, key) for key in CONTACT_ROW_KEYS])
+        + ("; ".join(contact.form_sources),)
+        + tuple([props.get(key, '') for key in PROPERTY_ROW_KEYS])
+    )
 
 def find_duplicates_for_specific_date(target_date):
     """Find all duplicate contacts with last activity on specified date and comprehensively analyze their form sources"""
@@ -346,23 +509,15 @@ def find_duplicates_for_specific_date(target_date):
     for contact in contacts:
         props = contact["properties"]
         contact_id = contact["id"]
-        email = props.get("email", "").lower().strip() if props.get("email") else None
+        raw_email = props.get("email")
+        email = raw_email.strip().lower() if raw_email else None
         phone = normalize_phone(props.get("phone"))
         firstname = props.get("firstname", "")
         lastname = props.get("lastname", "")
         created = props.get("createdate")
         lastmodified = props.get("lastmodifieddate")  # Added this
         
-        contact_info = {
-            "id": contact_id,
-            "email": email,
-            "phone": phone,
-            "firstname": firstname,
-            "lastname": lastname,
-            "createdate": created,
-            "lastmodifieddate": lastmodified,  # Added this
-            "properties": props  # Store all properties for later analysis
-        }
+        contact_info = Contact(contact_id, email, phone, firstname, lastname, created, lastmodified, props)
         
         # Group by email
         if email:
@@ -376,62 +531,68 @@ def find_duplicates_for_specific_date(target_date):
     email_duplicates = {email: contacts for email, contacts in email_groups.items() if len(contacts) > 1}
     phone_duplicates = {phone: contacts for phone, contacts in phone_groups.items() if len(contacts) > 1}
     
-    # Collect all duplicate contacts for form analysis
-    duplicate_contacts = []
-    duplicate_contact_ids = set()
-    
-    for contacts in email_duplicates.values():
-        for contact in contacts:
-            if contact['id'] not in duplicate_contact_ids:
-                duplicate_contacts.append(contact)
-                duplicate_contact_ids.add(contact['id'])
+    # Collect all duplicate contacts for form analysis (keyed by ID to dedupe), with the CSV rows each one belongs to
+    unique_duplicates = {}
+    memberships = defaultdict(list)
     
-    for contacts in phone_duplicates.values():
-        for contact in contacts:
-            if contact['id'] not in duplicate_contact_ids:
-                duplicate_contacts.append(contact)
-                duplicate_contact_ids.add(contact['id'])
+    for dup_type, duplicates in (('Email', email_duplicates), ('Phone', phone_duplicates)):
+        for dup_value, contacts in duplicates.items():
+            for contact in contacts:
+                unique_duplicates.setdefault(contact.id, contact)
+                memberships[contact.id].append((dup_type, dup_value))
     
-    print(f"✅ Found {len(duplicate_contact_ids)} unique duplicate contacts")
+    duplicate_contacts = list(unique_duplicates.values())
+    print(f"✅ Found {len(duplicate_contacts)} unique duplicate contacts")
     
     # Second pass: Comprehensive form analysis for duplicates only
     print("📋 Step 2: Comprehensive form analysis for duplicate contacts...")
     
-    for i, contact in enumerate(duplicate_contacts, 1):
-        print(f"   Analyzing contact {i}/{len(duplicate_contacts)}: {contact['id']}")
-        
-        # Extract all form sources
-        form_sources = extract_all_form_sources(contact['properties'], contact['id'])
-        contact['form_sources'] = form_sources
-        
-        # Store additional fields for CSV
-        contact['first_url'] = contact['properties'].get("hs_analytics_first_url", "")
-        contact['source_data_1'] = contact['properties'].get("hs_analytics_source_data_1", "")
-        contact['source_data_2'] = contact['properties'].get("hs_analytics_source_data_2", "")
-        contact['recent_conversion'] = contact['properties'].get("recent_conversion_event_name", "")
-        contact['first_conversion'] = contact['properties'].get("first_conversion_event_name", "")
-        contact['analytics_source'] = contact['properties'].get("hs_analytics_source", "")
-        contact['latest_source'] = contact['properties'].get("hs_latest_source", "")
+    # Look up form submission associations in batches for contacts without hs_form_submissions or a cache entry
+    uncached_ids = [
+        contact.id for contact in duplicate_contacts
+        if not parse_form_submissions(contact.properties) and load_cached_form_data(contact.id) is None
+    ]
+    form_associations = fetch_form_associations(uncached_ids)
+    
+    # Rows are written as each contact's analysis finishes, so nothing is buffered for the export
+    csv_filename = None
+    if duplicate_contacts:
+        csv_filename = duplicates_csv_filename(target_date)
+        with open(csv_filename, 'w', newline='', encoding='utf-8') as csvfile:
+            writer = csv.writer(csvfile)
+            writer.writerow(CSV_HEADER)
+            
+            # Form lookups are independent per contact, so overlap their network round trips
+            with ThreadPoolExecutor(max_workers=FORM_DATA_WORKERS) as executor:
+                futures = {
+                    executor.submit(
+                        extract_all_form_sources, contact.properties, contact.id, form_associations.get(str(contact.id))
+                    ): contact
+                    for contact in duplicate_contacts
+                }
+                
+                completed = as_completed(futures)
+                if tqdm is not None:
+                    completed = tqdm(completed, total=len(futures), desc="   Analyzing", unit="contact")
+                
+                for i, future in enumerate(completed, 1):
+                    contact = futures[future]
+                    
+                    # Extract all form sources
+                    try:
+                        contact.form_sources = future.result()
+                    except Exception as e:
+                        print(f"⚠️ Form analysis failed for contact {contact.id}: {e}")
+                        contact.form_sources = ["No form data found"]
+                    
+                    writer.writerows(_row(dup_type, dup_value, contact) for dup_type, dup_value in memberships[contact.id])
+                    
+                    if tqdm is None and i % 50 == 0:
+                        print(f"   Progress: {i}/{len(duplicate_contacts)} contacts analyzed...")
         
-        if i % 10 == 0:
-            print(f"   Progress: {i}/{len(duplicate_contacts)} contacts analyzed...")
-    
-    # Update the duplicate dictionaries with form information
-    for email, contacts in email_duplicates.items():
-        for contact in contacts:
-            # Find the corresponding contact with form data
-            for dup_contact in duplicate_contacts:
-                if dup_contact['id'] == contact['id']:
-                    contact.update(dup_contact)
-                    break
-    
-    for phone, contacts in phone_duplicates.items():
-        for contact in contacts:
-            # Find the corresponding contact with form data
-            for dup_contact in duplicate_contacts:
-                if dup_contact['id'] == contact['id']:
-                    contact.update(dup_contact)
-                    break
+        print(f"📄 Comprehensive duplicate analysis exported to: {csv_filename}")
+    
+    # email_duplicates/phone_duplicates hold the same contact dicts, so the form data is already there
     
     # Display results
     print("\n" + "="*80)
@@ -443,13 +604,13 @@ def find_duplicates_for_specific_date(target_date):
             print(f"\n🔄 Email: {email}")
             print("-" * 70)
             for i, contact in enumerate(duplicate_contacts_list, 1):
-                print(f"  {i}. ID: {contact['id']}")
-                print(f"     Name: {contact['firstname']} {contact['lastname']}")
-                print(f"     Phone: {contact['phone']}")
-                print(f"     Created: {contact['createdate']}")
-                print(f"     Last Modified: {contact['lastmodifieddate']}")  # Added this
+                print(f"  {i}. ID: {contact.id}")
+                print(f"     Name: {contact.firstname} {contact.lastname}")
+                print(f"     Phone: {contact.phone}")
+                print(f"     Created: {contact.createdate}")
+                print(f"     Last Modified: {contact.lastmodifieddate}")  # Added this
                 print(f"     📝 Form Sources:")
-                for source in contact.get('form_sources', ['No form data found']):
+                for source in contact.form_sources or ['No form data found']:
                     print(f"        • {source}")
     else:
         print("✅ No email duplicates found.")
@@ -463,29 +624,26 @@ def find_duplicates_for_specific_date(target_date):
             print(f"\n🔄 Phone: {phone}")
             print("-" * 70)
             for i, contact in enumerate(duplicate_contacts_list, 1):
-                print(f"  {i}. ID: {contact['id']}")
-                print(f"     Name: {contact['firstname']} {contact['lastname']}")
-                print(f"     Email: {contact['email']}")
-                print(f"     Created: {contact['createdate']}")
-                print(f"     Last Modified: {contact['lastmodifieddate']}")  # Added this
+                print(f"  {i}. ID: {contact.id}")
+                print(f"     Name: {contact.firstname} {contact.lastname}")
+                print(f"     Email: {contact.email}")
+                print(f"     Created: {contact.createdate}")
+                print(f"     Last Modified: {contact.lastmodifieddate}")  # Added this
                 print(f"     📝 Form Sources:")
-                for source in contact.get('form_sources', ['No form data found']):
+                for source in contact.form_sources or ['No form data found']:
                     print(f"        • {source}")
     else:
         print("✅ No phone duplicates found.")
     
-    # Export to CSV if duplicates found
+    # Form analysis summary if duplicates found
     if email_duplicates or phone_duplicates:
-        csv_filename = export_duplicates_to_csv(email_duplicates, phone_duplicates, target_date)
-        
-        # Form analysis summary
         print("\n" + "="*80)
         print("📊 FORM SOURCE SUMMARY:")
         print("="*80)
         
         all_form_sources = []
         for contact in duplicate_contacts:
-            all_form_sources.extend(contact.get('form_sources', []))
+            all_form_sources.extend(contact.form_sources)
         
         form_stats = defaultdict(int)
         for source in all_form_sources:
@@ -506,7 +664,7 @@ def find_duplicates_for_specific_date(target_date):
     print(f"📧 Total contacts with duplicate emails: {total_email_duplicates}")
     print(f"📱 Phone duplicate groups: {len(phone_duplicates)}")
     print(f"📱 Total contacts with duplicate phones: {total_phone_duplicates}")
-    print(f"🔍 Total unique duplicate contacts analyzed: {len(duplicate_contact_ids)}")
+    print(f"🔍 Total unique duplicate contacts analyzed: {len(duplicate_contacts)}")
     
     return email_duplicates, phone_duplicates
 
@@ -2,9 +2,12 @@ import os
 import requests
 import time
 from datetime import datetime, timezone, timedelta
-from dateutil import parser
-import re
-from collections import defaultdict
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
+
+from normalizers import normalize_phone, normalize_email
+from hubspot_api import make_session, make_merge_session, decode_json, TokenBucket
 
 
 # ========== CONFIG ==========
@@ -14,42 +17,58 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Shared session so every HubSpot call reuses keep-alive connections; searches and batch reads retry
+# transient errors and 429s (honouring Retry-After)
+SESSION = make_session(HEADERS, status_forcelist=[429, 502, 503, 504])
+
+# Merges get a session that never re-sends a request HubSpot may already have applied
+MERGE_SESSION = make_merge_session(HEADERS)
+
+# Merges are paced to HubSpot's 100 requests / 10 seconds across all group workers
+MERGE_RATE_LIMIT = 10  # requests per second
+# Duplicate groups processed at once; merges within a group run one after another,
+# since every one of them targets the same primary
+GROUP_WORKERS = 4
+
 # ========== DATE TARGET ==========
 TARGET_DATE = datetime(2025, 8, 2, tzinfo=timezone.utc)  # Change this date as needed
 NEXT_DATE = TARGET_DATE + timedelta(days=1)
 
+# The target day is fetched as hourly windows, paged concurrently
+SEARCH_WINDOWS = 24
+SEARCH_WORKERS = 4  # HubSpot's search endpoint allows only a few requests per second
+
+# Discovery only needs the grouping keys; everything else is batch-read for duplicates
+SEARCH_PROPERTIES = ["email", "phone"]
+CONTACT_PROPERTIES = [
+    "email", "phone", "createdate", 
+    "firstname", "lastname", "lifecyclestage", "city", "state",
+    "lastcontactdate", "notes_last_contacted", "hs_analytics_last_timestamp",
+    "hs_latest_meeting_activity", "hs_latest_sequence_ended_date",
+    "hubspot_owner_id"
+]
+
+# Maximum IDs per /contacts/batch/read call
+BATCH_READ_SIZE = 100
+
 # Define priority lifecycle stages
-PRIORITY_LIFECYCLE_STAGES = {"pre-mql", "mql", "sql", "opportunity", "customer", "lapsed customer", "marketingqualifiedlead"}
+PRIORITY_LIFECYCLE_STAGES = frozenset({"pre-mql", "mql", "sql", "opportunity", "customer", "lapsed customer", "marketingqualifiedlead"})
 
+# Stand-in for missing dates so they sort before any real one
+MIN_DATE = datetime.min.replace(tzinfo=timezone.utc)
 
-# ========== HELPER FUNCTIONS ==========
 
-def normalize_phone(phone):
-    """Enhanced phone number normalization"""
-    if not phone:
-        return None
-    
-    phone_str = str(phone).strip()
-    phone_str = re.sub(r'[^\d+]', '', phone_str)
-    
-    if phone_str.startswith('+91'):
-        phone_str = phone_str[3:]
-    elif phone_str.startswith('91') and len(phone_str) == 12:
-        phone_str = phone_str[2:]
-    elif phone_str.startswith('0') and len(phone_str) == 11:
-        phone_str = phone_str[1:]
-    
-    if len(phone_str) == 10 and phone_str.isdigit() and phone_str[0] in '6789':
-        return phone_str
-    
-    return None
+# ========== RATE LIMITING ==========
+
+MERGE_BUCKET = TokenBucket(MERGE_RATE_LIMIT, MERGE_RATE_LIMIT)
 
 
-def normalize_email(email):
-    """Normalize email by converting to lowercase and trimming"""
-    if not email:
-        return None
-    return email.lower().strip()
+# ========== HELPER FUNCTIONS ==========
+
+@lru_cache(maxsize=None)
+def parse_hubspot_date(date_str):
+    """Parse a HubSpot ISO-8601 timestamp (raises ValueError on anything else)"""
+    return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
 
 
 def get_last_contact_date(contact):
@@ -70,7 +89,7 @@ def get_last_contact_date(contact):
         date_value = props.get(field)
         if date_value:
             try:
-                parsed_date = parser.parse(date_value)
+                parsed_date = parse_hubspot_date(date_value)
                 if latest_date_parsed is None or parsed_date > latest_date_parsed:
                     latest_date_parsed = parsed_date
             except:
@@ -80,59 +99,67 @@ def get_last_contact_date(contact):
         latest_date = props.get("createdate")
         if latest_date:
             try:
-                latest_date_parsed = parser.parse(latest_date)
+                latest_date_parsed = parse_hubspot_date(latest_date)
             except:
                 latest_date_parsed = datetime.min.replace(tzinfo=timezone.utc)
     
     return latest_date_parsed
 
 
-def has_priority_lifecycle_stage(contact):
+class ContactView:
+    """Fields the merge rules compare, read and parsed once per contact"""
+    __slots__ = (
+        "id", "contact", "is_priority", "create_dt", "last_contact_dt",
+        "is_old", "contacted_recently", "owner", "quality", "tier"
+    )
+
+    def __init__(self, contact, one_month_ago):
+        props = contact["properties"]
+        self.id = contact["id"]
+        self.contact = contact
+        self.is_priority = (props.get("lifecyclestage") or "").lower() in PRIORITY_LIFECYCLE_STAGES
+        try:
+            self.create_dt = parse_hubspot_date(props["createdate"]) if props.get("createdate") else None
+        except:
+            self.create_dt = None
+        self.last_contact_dt = get_last_contact_date(contact)
+        try:
+            self.is_old = self.create_dt is not None and self.create_dt < one_month_ago
+        except TypeError:
+            self.is_old = False
+        try:
+            self.contacted_recently = bool(self.last_contact_dt) and self.last_contact_dt > one_month_ago
+        except TypeError:
+            self.contacted_recently = False
+        owner = props.get("hubspot_owner_id")
+        self.owner = bool(owner and owner.strip())
+        self.quality = get_contact_quality_score(contact)
+        self.tier = rule_tier(self)
+
+
+def has_priority_lifecycle_stage(view):
     """Check if contact has a priority lifecycle stage"""
-    lifecycle_stage = contact["properties"].get("lifecyclestage", "").lower()
-    return lifecycle_stage in PRIORITY_LIFECYCLE_STAGES
+    return view.is_priority
 
 
-def is_old_contact(contact):
+def is_old_contact(view):
     """Check if contact is older than 1 month"""
-    create_date_str = contact["properties"].get("createdate")
-    if not create_date_str:
-        return False
-    
-    try:
-        create_date = parser.parse(create_date_str)
-        one_month_ago = datetime.now(timezone.utc) - timedelta(days=30)
-        return create_date < one_month_ago
-    except:
-        return False
+    return view.is_old
 
 
-def has_owner(contact):
+def has_owner(view):
     """Check if contact has an owner assigned"""
-    owner = contact["properties"].get("hubspot_owner_id")
-    return bool(owner and owner.strip())
+    return view.owner
 
 
-def was_contacted_recently(contact):
+def was_contacted_recently(view):
     """Check if contact was contacted within 1 month"""
-    last_contact_parsed = get_last_contact_date(contact)
-    if not last_contact_parsed:
-        return False
-    
-    one_month_ago = datetime.now(timezone.utc) - timedelta(days=30)
-    return last_contact_parsed > one_month_ago
+    return view.contacted_recently
 
 
-def get_create_date(contact):
+def get_create_date(view):
     """Get parsed create date of contact"""
-    create_date_str = contact["properties"].get("createdate")
-    if not create_date_str:
-        return datetime.min.replace(tzinfo=timezone.utc)
-    
-    try:
-        return parser.parse(create_date_str)
-    except:
-        return datetime.min.replace(tzinfo=timezone.utc)
+    return view.create_dt or MIN_DATE
 
 
 def get_contact_quality_score(contact):
@@ -153,96 +180,80 @@ def get_contact_quality_score(contact):
     return score
 
 
-def determine_primary_contact(contacts):
+def rule_tier(view):
+    """Business rule a contact qualifies under; the highest tier present decides the primary"""
+    if has_priority_lifecycle_stage(view):
+        return 4  # Rule 1: priority lifecycle stage
+    old = is_old_contact(view)
+    if old and not was_contacted_recently(view):
+        return 3  # Rule 2: old and not contacted recently
+    if not old and has_owner(view):
+        return 2  # Rule 3: recent with owner
+    if not has_owner(view):
+        return 1  # Rule 4: no owner
+    return 0  # Rule 5: fallback
+
+
+def primary_sort_key(view):
+    """Rank a contact by its rule tier, then by that rule's tie-break"""
+    last_contact = view.last_contact_dt or MIN_DATE
+    if view.tier == 4:
+        return (4, view.quality, last_contact)  # Highest quality
+    if view.tier == 3:
+        return (3, -get_create_date(view).timestamp())  # Oldest
+    if view.tier == 1:
+        return (1, get_create_date(view))  # Newest
+    return (view.tier, last_contact, view.quality)  # Most recently contacted
+
+
+# (reason when only one contact is in the winning tier, reason when a tie-break picked it)
+RULE_REASONS = {
+    4: ("priority lifecycle", "highest quality"),
+    3: ("old uncontacted", "oldest uncontacted"),
+    2: ("recent with owner", "most recent contact"),
+    1: ("newest without owner", "newest without owner"),
+    0: ("most recent contact", "most recent contact"),
+}
+
+
+def determine_primary_contact(views):
     """Determine which contact should be primary based on business rules"""
     
-    print(f"🧠 Analyzing {len(contacts)} contacts to determine primary...")
-    
-    # Rule 1: Priority lifecycle stages
-    priority_contacts = [c for c in contacts if has_priority_lifecycle_stage(c)]
-    if priority_contacts:
-        if len(priority_contacts) == 1:
-            print(f"  ✅ Primary selected: {priority_contacts[0]['id']} (priority lifecycle)")
-            return priority_contacts[0]
-        else:
-            return get_highest_quality_contact(priority_contacts)
-    
-    # Rule 2: Old uncontacted contacts
-    old_uncontacted = [c for c in contacts if is_old_contact(c) and not was_contacted_recently(c)]
-    if old_uncontacted:
-        if len(old_uncontacted) == 1:
-            print(f"  ✅ Primary selected: {old_uncontacted[0]['id']} (old uncontacted)")
-            return old_uncontacted[0]
-        else:
-            oldest = min(old_uncontacted, key=get_create_date)
-            print(f"  ✅ Primary selected: {oldest['id']} (oldest uncontacted)")
-            return oldest
-    
-    # Rule 3: Recent contacts with owner
-    recent_with_owner = [c for c in contacts if not is_old_contact(c) and has_owner(c)]
-    if recent_with_owner:
-        if len(recent_with_owner) == 1:
-            print(f"  ✅ Primary selected: {recent_with_owner[0]['id']} (recent with owner)")
-            return recent_with_owner[0]
-        else:
-            return get_most_recent_contact(recent_with_owner)
-    
-    # Rule 4: Contacts with no owner - pick newest
-    no_owner_contacts = [c for c in contacts if not has_owner(c)]
-    if no_owner_contacts:
-        newest = max(no_owner_contacts, key=get_create_date)
-        print(f"  ✅ Primary selected: {newest['id']} (newest without owner)")
-        return newest
-    
-    # Rule 5: Fallback
-    return get_most_recent_contact(contacts)
-
-
-def get_highest_quality_contact(contacts):
-    """Get contact with highest quality score"""
-    contacts_with_quality = []
-    for contact in contacts:
-        quality_score = get_contact_quality_score(contact)
-        last_contact_parsed = get_last_contact_date(contact)
-        contacts_with_quality.append({
-            'contact': contact,
-            'quality_score': quality_score,
-            'last_contact_parsed': last_contact_parsed or datetime.min.replace(tzinfo=timezone.utc)
-        })
-    
-    contacts_with_quality.sort(key=lambda x: (x['quality_score'], x['last_contact_parsed']), reverse=True)
-    primary = contacts_with_quality[0]['contact']
-    print(f"  ✅ Primary selected: {primary['id']} (highest quality)")
+    print(f"🧠 Analyzing {len(views)} contacts to determine primary...")
+    
+    # One pass: the best tier wins, and its own tie-break orders contacts within it
+    primary = max(views, key=primary_sort_key)
+    only_reason, tie_break_reason = RULE_REASONS[primary.tier]
+    candidates = sum(1 for v in views if v.tier == primary.tier)
+    print(f"  ✅ Primary selected: {primary.id} ({only_reason if candidates == 1 else tie_break_reason}, quality: {primary.quality})")
     return primary
 
 
-def get_most_recent_contact(contacts):
-    """Get contact with most recent contact date"""
-    contacts_with_dates = []
-    for contact in contacts:
-        last_contact_parsed = get_last_contact_date(contact)
-        quality_score = get_contact_quality_score(contact)
-        contacts_with_dates.append({
-            'contact': contact,
-            'last_contact_parsed': last_contact_parsed or datetime.min.replace(tzinfo=timezone.utc),
-            'quality_score': quality_score
-        })
-    
-    contacts_with_dates.sort(key=lambda x: (x['last_contact_parsed'], x['quality_score']), reverse=True)
-    primary = contacts_with_dates[0]['contact']
-    print(f"  ✅ Primary selected: {primary['id']} (most recent contact with quality: {contacts_with_dates[0]['quality_score']})")
-    return primary
+def iter_contacts_for_date():
+    """Yield all contacts created on the target date, paging SEARCH_WINDOWS slices of the day concurrently.
+    Each window's contacts are yielded as soon as that window (and the ones before it) is done."""
+    print(f"🔍 Fetching contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}...")
+
+    step = (NEXT_DATE - TARGET_DATE) / SEARCH_WINDOWS
+    starts = [TARGET_DATE + step * i for i in range(SEARCH_WINDOWS)]
+    ends = starts[1:] + [NEXT_DATE]
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+        for window_contacts in executor.map(fetch_contacts_in_window, starts, ends):
+            total += len(window_contacts)
+            yield from window_contacts
 
+    print(f"✅ Total contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}: {total}")
 
-def fetch_contacts_for_date():
-    """Fetch all contacts created on the target date"""
+
+def fetch_contacts_in_window(window_start, window_end):
+    """Fetch all contacts created in [window_start, window_end)"""
     url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
     all_contacts = []
     after = None
     fetched = 0
 
-    print(f"🔍 Fetching contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}...")
-
     while True:
         payload = {
             "filterGroups": [{
@@ -250,23 +261,16 @@ def fetch_contacts_for_date():
                     {
                         "propertyName": "createdate",
                         "operator": "GTE",
-                        "value": TARGET_DATE.isoformat()
+                        "value": window_start.isoformat()
                     },
                     {
                         "propertyName": "createdate",
                         "operator": "LT", 
-                        "value": NEXT_DATE.isoformat()
+                        "value": window_end.isoformat()
                     }
                 ]
             }],
-            "properties": [
-                "email", "phone", "hs_additional_emails", "createdate", 
-                "firstname", "lastname", "company", "lifecyclestage", "jobtitle",
-                "website", "industry", "city", "state",
-                "lastcontactdate", "notes_last_contacted", "hs_analytics_last_timestamp",
-                "hs_latest_meeting_activity", "hs_latest_sequence_ended_date",
-                "hubspot_owner_id"
-            ],
+            "properties": SEARCH_PROPERTIES,
             "limit": 100,
             "sorts": ["createdate"]
         }
@@ -275,15 +279,15 @@ def fetch_contacts_for_date():
             payload["after"] = after
 
         try:
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=15)
+            response = SESSION.post(url, json=payload, timeout=15)
             response.raise_for_status()
-            data = response.json()
+            data = decode_json(response)
             results = data.get("results", [])
             all_contacts.extend(results)
             fetched += len(results)
 
             if fetched > 0 and fetched % 100 == 0:
-                print(f"📊 Fetched {fetched} contacts so far...")
+                print(f"📊 [{window_start.strftime('%H:%M')}] Fetched {fetched} contacts so far...")
 
             if "paging" in data and "next" in data["paging"]:
                 after = data["paging"]["next"]["after"]
@@ -296,62 +300,126 @@ def fetch_contacts_for_date():
             print(f"❌ Error fetching contacts: {e}")
             break
 
-    print(f"✅ Total contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}: {len(all_contacts)}")
     return all_contacts
 
 
+def batch_read_contacts(contact_ids):
+    """Read CONTACT_PROPERTIES for the given IDs via batch read, keyed by contact ID"""
+    url = "https://api.hubapi.com/crm/v3/objects/contacts/batch/read"
+    contact_ids = list(contact_ids)
+    contacts_by_id = {}
+
+    for start in range(0, len(contact_ids), BATCH_READ_SIZE):
+        chunk = contact_ids[start:start + BATCH_READ_SIZE]
+        payload = {
+            "properties": CONTACT_PROPERTIES,
+            "inputs": [{"id": str(contact_id)} for contact_id in chunk]
+        }
+        try:
+            response = SESSION.post(url, json=payload, timeout=15)
+            response.raise_for_status()
+            for contact in decode_json(response).get("results", []):
+                contacts_by_id[contact["id"]] = contact
+        except requests.exceptions.RequestException as e:
+            print(f"❌ Error reading contact details: {e}")
+
+    return contacts_by_id
+
+
+def hydrate_groups(groups, contacts_by_id):
+    """Swap the contact IDs in each group for full records, dropping contacts that no longer exist"""
+    hydrated = {}
+    for key, contact_ids in groups.items():
+        group = [contacts_by_id[contact_id] for contact_id in contact_ids if contact_id in contacts_by_id]
+        if len(group) > 1:
+            hydrated[key] = group
+    return hydrated
+
+
 def merge_contacts(primary_id, to_merge_id):
     """Merge two contacts - merge to_merge_id into primary_id"""
     url = "https://api.hubapi.com/crm/v3/objects/contacts/merge"
+    # Contact IDs come back from HubSpot as strings, so they go into the payload as-is
     payload = {
-        "primaryObjectId": str(primary_id),
-        "objectIdToMerge": str(to_merge_id)
+        "primaryObjectId": primary_id,
+        "objectIdToMerge": to_merge_id
     }
     
+    MERGE_BUCKET.acquire()
     try:
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=10)
+        response = MERGE_SESSION.post(url, json=payload, timeout=10)
         response.raise_for_status()
-        return response.json()
+        return decode_json(response)
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"❌ Merge failed: {e}")
 
 
-def process_duplicate_group(identifier, contacts, identifier_type="phone"):
+def process_duplicate_group(identifier, contacts, identifier_type="phone", one_month_ago=None):
     """Process a group of duplicate contacts using intelligent merge strategy"""
     print(f"\n🔄 Processing {identifier_type}: {identifier} ({len(contacts)} contacts)")
     print("=" * 60)
     
+    # Read and parse every field the merge rules need once per contact
+    if one_month_ago is None:
+        one_month_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    views = [ContactView(contact, one_month_ago) for contact in contacts]
+    
     # Display contact details
-    for i, contact in enumerate(contacts, 1):
+    for i, view in enumerate(views, 1):
+        contact = view.contact
         props = contact['properties']
         name = f"{props.get('firstname', '')} {props.get('lastname', '')}".strip() or "No Name"
         lifecycle = props.get('lifecyclestage', 'N/A')
         owner = "Yes" if props.get('hubspot_owner_id') else "No"
         created = props.get('createdate', 'N/A')[:10] if props.get('createdate') else 'N/A'
-        quality_score = get_contact_quality_score(contact)
         
-        print(f"  {i}. ID: {contact['id']} | {name} | Quality: {quality_score}")
+        print(f"  {i}. ID: {contact['id']} | {name} | Quality: {view.quality}")
         print(f"     Phone: {props.get('phone', 'N/A')} | Email: {props.get('email', 'N/A')}")
         print(f"     Lifecycle: {lifecycle} | Owner: {owner} | Created: {created}")
         print()
     
     # Determine primary and merge
-    primary_contact = determine_primary_contact(contacts)
+    primary_contact = determine_primary_contact(views).contact
     other_contacts = [c for c in contacts if c['id'] != primary_contact['id']]
     
     print(f"🎯 Primary Contact: {primary_contact['id']}")
     print(f"📝 Merging: {[c['id'] for c in other_contacts]} → {primary_contact['id']}")
     
-    # Execute merges
+    # Execute merges one at a time (HubSpot rejects concurrent merges into the same primary);
+    # MERGE_BUCKET keeps all group workers together under the rate limit
+    failed = []
     for merge_contact in other_contacts:
+        print(f"🚀 Merging {merge_contact['id']} into {primary_contact['id']}...")
         try:
-            print(f"🚀 Merging {merge_contact['id']} into {primary_contact['id']}...")
             merge_contacts(primary_contact['id'], merge_contact['id'])
-            print(f"✅ Success!")
-            time.sleep(2)  # Rate limiting
+            print(f"✅ Merged {merge_contact['id']}")
         except Exception as e:
-            print(f"❌ Failed: {e}")
-            return
+            print(f"❌ Failed {merge_contact['id']}: {e}")
+            failed.append(merge_contact['id'])
+    
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(other_contacts)} merges failed: {failed}")
+
+
+def process_group_phase(duplicates, identifier_type, results, one_month_ago):
+    """Process duplicate groups of one type concurrently (they never share a contact)"""
+    with ThreadPoolExecutor(max_workers=GROUP_WORKERS) as executor:
+        futures = {
+            executor.submit(
+                process_duplicate_group, identifier, duplicate_contacts, identifier_type, one_month_ago
+            ): duplicate_contacts
+            for identifier, duplicate_contacts in duplicates.items()
+        }
+        
+        for future in as_completed(futures):
+            duplicate_contacts = futures[future]
+            try:
+                future.result()
+                results[f"{identifier_type}_success"] += 1
+                results["total_merges"] += len(duplicate_contacts) - 1
+            except Exception as e:
+                print(f"❌ Group failed: {e}")
+                results[f"{identifier_type}_failed"] += 1
 
 
 def process_all_duplicates():
@@ -363,35 +431,50 @@ def process_all_duplicates():
     print("🔍 Priority: Lifecycle → Age/Contact → Owner → Quality → Fallback")
     print("=" * 80)
     
-    # Fetch contacts for the target date
-    contacts = fetch_contacts_for_date()
-    
-    if not contacts:
-        print(f"📭 No contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}.")
-        return
+    # One "now" for the whole run, so every group judges contact age against the same cutoff
+    one_month_ago = datetime.now(timezone.utc) - timedelta(days=30)
     
-    # Group contacts by phone and email
-    phone_groups = defaultdict(list)
-    email_groups = defaultdict(list)
+    # Normalize contacts as search windows arrive and count the keys, so singleton groups are never built.
+    # Only (id, phone, email) is kept per contact; duplicates are batch-read in full below.
+    normalized = []
+    phone_counts = Counter()
+    email_counts = Counter()
     
-    for contact in contacts:
+    for contact in iter_contacts_for_date():
         props = contact["properties"]
         email = normalize_email(props.get("email"))
         phone = normalize_phone(props.get("phone"))
+        normalized.append((contact["id"], phone, email))
         
         if phone:
-            phone_groups[phone].append(contact)
+            phone_counts[phone] += 1
         if email:
-            email_groups[email].append(contact)
+            email_counts[email] += 1
+    
+    if not normalized:
+        print(f"📭 No contacts created on {TARGET_DATE.strftime('%Y-%m-%d')}.")
+        return
     
     # Find duplicates
-    phone_duplicates = {phone: contacts for phone, contacts in phone_groups.items() if len(contacts) > 1}
-    email_duplicates = {email: contacts for email, contacts in email_groups.items() if len(contacts) > 1}
+    phone_duplicates = {}
+    email_duplicates = {}
+    
+    for contact_id, phone, email in normalized:
+        if phone and phone_counts[phone] > 1:
+            phone_duplicates.setdefault(phone, []).append(contact_id)
+        if email and email_counts[email] > 1:
+            email_duplicates.setdefault(email, []).append(contact_id)
     
     print(f"\n📊 DUPLICATE ANALYSIS FOR {TARGET_DATE.strftime('%Y-%m-%d')}:")
     print(f"📱 Phone duplicates found: {len(phone_duplicates)}")
     print(f"📧 Email duplicates found: {len(email_duplicates)}")
     
+    # Fetch the full property set only for contacts that are actually duplicated
+    duplicate_ids = {contact_id for group in (*phone_duplicates.values(), *email_duplicates.values()) for contact_id in group}
+    full_contacts = batch_read_contacts(duplicate_ids) if duplicate_ids else {}
+    phone_duplicates = hydrate_groups(phone_duplicates, full_contacts)
+    email_duplicates = hydrate_groups(email_duplicates, full_contacts)
+    
     # Process results tracking
     results = {
         "phone_success": 0,
@@ -405,39 +488,19 @@ def process_all_duplicates():
     if phone_duplicates:
         print(f"\n📱 PROCESSING PHONE DUPLICATES:")
         print("=" * 50)
-        
-        for phone, duplicate_contacts in phone_duplicates.items():
-            try:
-                process_duplicate_group(phone, duplicate_contacts, "phone")
-                results["phone_success"] += 1
-                results["total_merges"] += len(duplicate_contacts) - 1
-            except Exception as e:
-                print(f"❌ Group failed: {e}")
-                results["phone_failed"] += 1
-            
-            time.sleep(2)  # Rate limiting between groups
+        process_group_phase(phone_duplicates, "phone", results, one_month_ago)
     
-    # Process email duplicates
+    # Process email duplicates once every phone merge has finished, since the two can share contacts
     if email_duplicates:
         print(f"\n📧 PROCESSING EMAIL DUPLICATES:")
         print("=" * 50)
-        
-        for email, duplicate_contacts in email_duplicates.items():
-            try:
-                process_duplicate_group(email, duplicate_contacts, "email")
-                results["email_success"] += 1
-                results["total_merges"] += len(duplicate_contacts) - 1
-            except Exception as e:
-                print(f"❌ Group failed: {e}")
-                results["email_failed"] += 1
-            
-            time.sleep(2)  # Rate limiting between groups
+        process_group_phase(email_duplicates, "email", results, one_month_ago)
     
     # Final Summary
     print(f"\n📊 FINAL PROCESSING SUMMARY:")
     print("=" * 60)
     print(f"📅 Date Processed: {TARGET_DATE.strftime('%Y-%m-%d')}")
-    print(f"📧 Total Contacts: {len(contacts)}")
+    print(f"📧 Total Contacts: {len(normalized)}")
     print(f"🔄 Total Successful Merges: {results['total_merges']}")
     print(f"✅ Phone Groups Successful: {results['phone_success']}")
     print(f"✅ Email Groups Successful: {results['email_success']}")
@@ -0,0 +1,89 @@
+"""
+HubSpot HTTP plumbing shared by the rest_code scripts: pooled sessions, JSON encoding/decoding and rate limiting
+"""
+import json
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Try to use orjson for faster JSON encoding/decoding if available
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def make_session(headers, pool_connections=16, pool_maxsize=16, **retry_options):
+    """Session that reuses keep-alive connections. By default the adapter retries connection errors,
+    timeouts, 5xx and 429s (honouring Retry-After) on every method, since HubSpot searches are POSTs;
+    retry_options override the urllib3 Retry arguments."""
+    options = {
+        "total": 3,
+        "backoff_factor": 0.5,
+        "status_forcelist": [429, 500, 502, 503, 504],
+        "allowed_methods": None
+    }
+    options.update(retry_options)
+
+    session = requests.Session()
+    session.headers.update(headers)
+    session.mount("https://", HTTPAdapter(
+        pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize,
+        max_retries=Retry(**options)
+    ))
+    return session
+
+
+def make_merge_session(headers):
+    """Session for merge calls. Merges are not idempotent: after a read timeout or a 5xx HubSpot may
+    already have applied one, so only failed connections and 429s are retried"""
+    return make_session(headers, total=3, connect=3, read=0, status_forcelist=[429])
+
+
+def load_json(data):
+    """Parse JSON bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def encode_json(payload):
+    """Encode a request body to bytes, using orjson when installed"""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload).encode()
+
+
+def decode_json(response):
+    """Decode a HubSpot JSON response, using orjson when installed"""
+    if orjson is not None:
+        return orjson.loads(response.content)
+    return response.json()
+
+
+class TokenBucket:
+    """Thread-safe token bucket holding up to `capacity` tokens, refilled at `rate` tokens/sec"""
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a token is available, then take it"""
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
@@ -0,0 +1,37 @@
+"""
+Phone and email normalization shared by the rest_code scripts, so every script groups contacts on the same keys
+"""
+import re
+from functools import lru_cache
+
+# Everything except digits and "+" is dropped from phone numbers
+PHONE_CLEAN_RE = re.compile(r'[^\d+]')
+
+
+@lru_cache(maxsize=65536)
+def normalize_phone(phone):
+    """Enhanced phone number normalization (memoized on the raw value)"""
+    if not phone:
+        return None
+
+    phone_str = str(phone).strip()
+    phone_str = PHONE_CLEAN_RE.sub('', phone_str)
+
+    if phone_str.startswith('+91'):
+        phone_str = phone_str[3:]
+    elif phone_str.startswith('91') and len(phone_str) == 12:
+        phone_str = phone_str[2:]
+    elif phone_str.startswith('0') and len(phone_str) == 11:
+        phone_str = phone_str[1:]
+
+    if len(phone_str) == 10 and phone_str.isdigit() and phone_str[0] in '6789':
+        return phone_str
+
+    return None
+
+
+def normalize_email(email):
+    """Normalize email by converting to lowercase and trimming"""
+    if not email:
+        return None
+    return email.lower().strip()
@@ -2,8 +2,11 @@ import os
 import requests
 import time
 from datetime import datetime, timezone, timedelta
-from dateutil import parser
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+from normalizers import normalize_phone, normalize_email
+from hubspot_api import make_session, decode_json
 
 # ========== CONFIG ==========
 HUBSPOT_TOKEN = os.getenv('HUBSPOT_TOKEN', 'your-hubspot-token-here')
@@ -12,6 +15,10 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Shared session so every HubSpot call reuses keep-alive connections; the adapter retries
+# transient errors and 429s (honouring Retry-After)
+SESSION = make_session(HEADERS, status_forcelist=[429, 502, 503, 504])
+
 # Create IST timezone (UTC+5:30)
 IST = timezone(timedelta(hours=5, minutes=30))
 
@@ -19,16 +26,15 @@ IST = timezone(timedelta(hours=5, minutes=30))
 # Current date: August 7, 2025, so yesterday is August 6, 2025
 YESTERDAY = datetime(2025, 8, 6, tzinfo=IST)
 
+# The target day is fetched as hourly windows, paged concurrently
+SEARCH_WINDOWS = 24
+SEARCH_WORKERS = 4  # HubSpot's search endpoint allows only a few requests per second
+
 # ========== Helper Functions ==========
 
 def fetch_contacts_created_yesterday_with_neetprep_email(target_date, limit=15000):
-    """Fetch contacts created on target_date with @neetprep.com email addresses"""
-    url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-    all_contacts = []
-    after = None
-    fetched = 0
-    page_count = 0
-
+    """Fetch contacts created on target_date with @neetprep.com email addresses.
+    The day is split into SEARCH_WINDOWS slices that are paged concurrently."""
     # Set start time to beginning of the day (00:00:00)
     start_of_day = target_date.replace(hour=0, minute=0, second=0, microsecond=0)
     # Set end time to beginning of next day
@@ -38,6 +44,27 @@ def fetch_contacts_created_yesterday_with_neetprep_email(target_date, limit=1500
     print(f"   Start: {start_of_day.isoformat()}")
     print(f"   End:   {end_of_day.isoformat()}")
 
+    step = (end_of_day - start_of_day) / SEARCH_WINDOWS
+    starts = [start_of_day + step * i for i in range(SEARCH_WINDOWS)]
+    ends = starts[1:] + [end_of_day]
+
+    all_contacts = []
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+        for window_contacts in executor.map(lambda start, end: fetch_neetprep_contacts_in_window(start, end, limit), starts, ends):
+            all_contacts.extend(window_contacts)
+
+    print(f"🎯 Total contacts fetched: {len(all_contacts)}")
+    return all_contacts[:limit]
+
+def fetch_neetprep_contacts_in_window(window_start, window_end, limit):
+    """Fetch @neetprep.com contacts created in [window_start, window_end)"""
+    url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
+    all_contacts = []
+    after = None
+    fetched = 0
+    page_count = 0
+    label = window_start.strftime('%H:%M')
+
     while fetched < limit:
         page_count += 1
         payload = {
@@ -46,12 +73,12 @@ def fetch_contacts_created_yesterday_with_neetprep_email(target_date, limit=1500
                     {
                         "propertyName": "createdate",  # Back to createdate
                         "operator": "GTE",
-                        "value": start_of_day.isoformat()
+                        "value": window_start.isoformat()
                     },
                     {
                         "propertyName": "createdate",  # Back to createdate
                         "operator": "LT",
-                        "value": end_of_day.isoformat()
+                        "value": window_end.isoformat()
                     },
                     {
                         "propertyName": "email",  # Add email filter
@@ -60,7 +87,7 @@ def fetch_contacts_created_yesterday_with_neetprep_email(target_date, limit=1500
                     }
                 ]
             }],
-            "properties": ["email", "phone", "hs_additional_emails", "createdate", "firstname", "lastname"],
+            "properties": ["email", "phone", "createdate", "firstname", "lastname"],
             "limit": 100,
             "sorts": ["createdate"]  # Sort by create date
         }
@@ -68,8 +95,8 @@ def fetch_contacts_created_yesterday_with_neetprep_email(target_date, limit=1500
             payload["after"] = after
 
         try:
-            print(f"📄 Fetching page {page_count}... (Total so far: {fetched})")
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=30)
+            print(f"📄 [{label}] Fetching page {page_count}... (Total so far: {fetched})")
+            response = SESSION.post(url, json=payload, timeout=30)
             response.raise_for_status()
         except requests.exceptions.ReadTimeout:
             print("⏱️ Read timeout while fetching contacts. Continuing with what we have...")
@@ -78,28 +105,25 @@ def fetch_contacts_created_yesterday_with_neetprep_email(target_date, limit=1500
             print(f"❌ Network error while fetching contacts: {e}")
             break
 
-        data = response.json()
+        data = decode_json(response)
         results = data.get("results", [])
         
         if not results:
-            print("📭 No more results found.")
             break
             
         all_contacts.extend(results)
         fetched += len(results)
         
-        print(f"✅ Page {page_count}: Retrieved {len(results)} contacts")
+        print(f"✅ [{label}] Page {page_count}: Retrieved {len(results)} contacts")
 
         # Check if there are more pages
         if "paging" in data and "next" in data["paging"]:
             after = data["paging"]["next"]["after"]
             time.sleep(0.1)  # Small delay to avoid rate limiting
         else:
-            print("📄 No more pages available.")
             break
 
-    print(f"🎯 Total contacts fetched: {len(all_contacts)}")
-    return all_contacts[:limit]
+    return all_contacts
 
 def display_neetprep_contacts(target_date):
     """Display all contacts created on target_date with @neetprep.com emails"""
@@ -151,8 +175,8 @@ def find_duplicates_in_neetprep_contacts(contacts):
     for contact in contacts:
         props = contact["properties"]
         contact_id = contact["id"]
-        email = props.get("email", "").lower().strip() if props.get("email") else None
-        phone = props.get("phone", "").replace("+91", "").replace(" ", "").replace("-", "").strip() if props.get("phone") else None
+        email = normalize_email(props.get("email"))
+        phone = normalize_phone(props.get("phone"))
         firstname = props.get("firstname", "")
         lastname = props.get("lastname", "")
         created = props.get("createdate")
@@ -170,8 +194,8 @@ def find_duplicates_in_neetprep_contacts(contacts):
         if email:
             email_groups[email].append(contact_info)
         
-        # Group by phone (if phone has at least 10 digits)
-        if phone and phone.isdigit() and len(phone) >= 10:
+        # Group by phone (normalize_phone only returns valid 10-digit numbers)
+        if phone:
             phone_groups[phone].append(contact_info)
     
     # Find duplicates
@@ -1,8 +1,16 @@
 import os
+import sys
+import queue
+import logging
 import requests
 import time
 from datetime import datetime, timezone, timedelta
-from dateutil import parser
+from concurrent.futures import ThreadPoolExecutor
+from logging.handlers import QueueHandler, QueueListener
+
+from hubspot_api import make_session, decode_json
+
+log = logging.getLogger(__name__)
 
 # ========== CONFIG ==========
 HUBSPOT_TOKEN = os.getenv('HUBSPOT_TOKEN', 'your-hubspot-token-here')
@@ -11,96 +19,157 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Shared session so every HubSpot call reuses keep-alive connections; the adapter retries
+# timeouts, connection errors, 5xx and 429s (honouring Retry-After) with exponential backoff
+SESSION = make_session(HEADERS, total=5)  # 0.5s, 1s, 2s, 4s, 8s
+
 # Create IST timezone (UTC+5:30)
 IST = timezone(timedelta(hours=5, minutes=30))
 
 # ========== SET YOUR TARGET DATE HERE (OPTIONAL) ==========
 TARGET_DATE = datetime(2025, 8, 1, tzinfo=IST)  # Now using IST timezone
 
+# A date range is fetched as hourly windows, paged concurrently
+SEARCH_WINDOWS = 24
+SEARCH_WORKERS = 4  # HubSpot's search endpoint allows only a few requests per second
+
+# By default the counts come straight from HubSpot's search `total` (phone NOT_HAS_PROPERTY), two requests
+# in all. Set to True to also page through the contacts that have a phone and count malformed numbers as missing.
+CHECK_PHONE_FORMAT = False
+
+# Separators dropped from phone numbers before the digit check
+PHONE_STRIP_TABLE = str.maketrans("", "", " -")
+
+HAS_PHONE_FILTER = {"propertyName": "phone", "operator": "HAS_PROPERTY"}
+NO_PHONE_FILTER = {"propertyName": "phone", "operator": "NOT_HAS_PROPERTY"}
+
 # ========== Helper Functions ==========
 
 def normalize_phone(phone):
     """Check if phone number exists and is valid"""
     if not phone:
         return False
-    phone_str = str(phone).replace("+91", "").replace(" ", "").replace("-", "").strip()
+    phone_str = str(phone).replace("+91", "").translate(PHONE_STRIP_TABLE).strip()
     return phone_str.isdigit() and len(phone_str) >= 10
 
-def fetch_contacts_without_phone(start_date=None, end_date=None, limit=15000):
-    """Fetch contacts and count those without phone numbers"""
+def iter_contact_pages(start_date=None, end_date=None, limit=15000, extra_filters=()):
+    """Yield pages (lists) of contacts, at most `limit` contacts in total, so callers never hold them all"""
+    if start_date and end_date:
+        log.info(f"🔍 Fetching contacts created between {start_date.strftime('%Y-%m-%d %H:%M:%S %Z')} and {end_date.strftime('%Y-%m-%d %H:%M:%S %Z')}...")
+        pages = iter_sliced_pages(start_date, end_date, limit, extra_filters)
+    else:
+        log.info(f"🔍 Fetching all contacts...")
+        pages = iter_window_pages(None, None, limit, extra_filters)
+
+    total = 0
+    seen_ids = set()
+    for page in pages:
+        page = [c for c in page if c["id"] not in seen_ids]
+        seen_ids.update(c["id"] for c in page)
+        page = page[:limit - total]
+        total += len(page)
+        yield page
+        if total >= limit:
+            break
+
+    log.info(f"🎯 Total contacts fetched: {total}")
+
+def iter_sliced_pages(start_date, end_date, limit, extra_filters=()):
+    """Split [start_date, end_date) into SEARCH_WINDOWS slices paged concurrently, yielding each
+    slice's contacts as one page once it (and the ones before it) is done"""
+    step = (end_date - start_date) / SEARCH_WINDOWS
+    starts = [start_date + step * i for i in range(SEARCH_WINDOWS)]
+    ends = starts[1:] + [end_date]
+
+    def fetch_slice(start, end):
+        return [contact for page in iter_window_pages(start, end, limit, extra_filters) for contact in page]
+
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+        yield from executor.map(fetch_slice, starts, ends)
+
+def created_between_filters(start_date, end_date):
+    """Search filters for contacts created in [start_date, end_date), or none when no range is given"""
+    if not (start_date and end_date):
+        return []
+    return [
+        {
+            "propertyName": "createdate",
+            "operator": "GTE",
+            "value": start_date.isoformat()
+        },
+        {
+            "propertyName": "createdate",
+            "operator": "LT",
+            "value": end_date.isoformat()
+        }
+    ]
+
+def count_search_results(filters):
+    """Return HubSpot's total for a contact search without paging through the results (None on error)"""
+    url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
+    payload = {"properties": ["phone"], "limit": 1}
+    if filters:
+        payload["filterGroups"] = [{"filters": filters}]
+
+    try:
+        response = SESSION.post(url, json=payload, timeout=30)
+        response.raise_for_status()
+    except requests.exceptions.RequestException as e:
+        log.error(f"❌ Network error while counting contacts: {e}")
+        return None
+
+    return decode_json(response).get("total", 0)
+
+def iter_window_pages(start_date, end_date, limit, extra_filters=()):
+    """Yield result pages for contacts created in [start_date, end_date), or all contacts when no range is given,
+    that also match extra_filters"""
     url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-    all_contacts = []
     after = None
     fetched = 0
     page_count = 0
-
-    if start_date and end_date:
-        print(f"🔍 Fetching contacts created between {start_date.strftime('%Y-%m-%d %H:%M:%S %Z')} and {end_date.strftime('%Y-%m-%d %H:%M:%S %Z')}...")
-    else:
-        print(f"🔍 Fetching all contacts...")
+    label = start_date.strftime('%H:%M') if start_date else "all"
 
     while fetched < limit:
         page_count += 1
         payload = {
-            "properties": ["email", "phone", "createdate", "firstname", "lastname"],
-            "limit": 100,
-            "sorts": ["createdate"]
+            "properties": ["phone"],  # the only property the count reads
+            "limit": 100
         }
         
-        # Add date filters if provided
-        if start_date and end_date:
-            payload["filterGroups"] = [{
-                "filters": [
-                    {
-                        "propertyName": "createdate",
-                        "operator": "GTE",
-                        "value": start_date.isoformat()
-                    },
-                    {
-                        "propertyName": "createdate",
-                        "operator": "LT",
-                        "value": end_date.isoformat()
-                    }
-                ]
-            }]
+        # Add date (and any extra) filters if provided
+        filters = created_between_filters(start_date, end_date) + list(extra_filters)
+        if filters:
+            payload["filterGroups"] = [{"filters": filters}]
         
         if after:
             payload["after"] = after
 
         try:
-            print(f"📄 Fetching page {page_count}... (Total so far: {fetched})")
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=30)
+            log.debug(f"📄 [{label}] Fetching page {page_count}... (Total so far: {fetched})")
+            response = SESSION.post(url, json=payload, timeout=30)
             response.raise_for_status()
-        except requests.exceptions.ReadTimeout:
-            print("⏱️ Read timeout while fetching contacts. Continuing with what we have...")
-            break
         except requests.exceptions.RequestException as e:
-            print(f"❌ Network error while fetching contacts: {e}")
-            break
+            # The adapter has already retried this page; stopping here would silently undercount
+            raise RuntimeError(f"❌ Network error while fetching contacts (page {page_count} of {label}): {e}")
 
-        data = response.json()
+        data = decode_json(response)
         results = data.get("results", [])
         
         if not results:
-            print("📭 No more results found.")
             break
             
-        all_contacts.extend(results)
         fetched += len(results)
         
-        print(f"✅ Page {page_count}: Retrieved {len(results)} contacts")
+        log.debug(f"✅ [{label}] Page {page_count}: Retrieved {len(results)} contacts")
+        yield results
 
         # Check if there are more pages
         if "paging" in data and "next" in data["paging"]:
             after = data["paging"]["next"]["after"]
             time.sleep(0.1)  # Small delay to avoid rate limiting
         else:
-            print("📄 No more pages available.")
             break
 
-    print(f"🎯 Total contacts fetched: {len(all_contacts)}")
-    return all_contacts[:limit]
-
 def count_contacts_without_phone(target_date=None):
     """Count contacts without phone numbers for a specific date or all contacts"""
     
@@ -110,63 +179,76 @@ def count_contacts_without_phone(target_date=None):
         # Set end time to beginning of next day
         end_of_day = start_of_day + timedelta(days=1)
         
-        print(f"🔍 Checking contacts created on {target_date.strftime('%Y-%m-%d')} (from 00:00 to 23:59 IST)")
-        contacts = fetch_contacts_without_phone(start_of_day, end_of_day)
+        log.info(f"🔍 Checking contacts created on {target_date.strftime('%Y-%m-%d')} (from 00:00 to 23:59 IST)")
     else:
-        print(f"🔍 Checking all contacts")
-        contacts = fetch_contacts_without_phone()
+        start_of_day = end_of_day = None
+        log.info(f"🔍 Checking all contacts")
     
-    if not contacts:
-        print("📭 No contacts found.")
+    filters = created_between_filters(start_of_day, end_of_day)
+    total_contacts = count_search_results(filters)
+    contacts_without_phone = count_search_results(filters + [NO_PHONE_FILTER])
+    if total_contacts is None or contacts_without_phone is None:
         return
     
-    total_contacts = len(contacts)
-    contacts_without_phone = 0
-    contacts_with_phone = 0
+    if CHECK_PHONE_FORMAT:
+        # HubSpot already counted the empty phones; only contacts with a phone value need checking here.
+        # Each page is tallied as it arrives instead of keeping every contact around.
+        for page in iter_contact_pages(start_of_day, end_of_day, extra_filters=[HAS_PHONE_FILTER]):
+            contacts_without_phone += sum(1 for contact in page if not normalize_phone(contact["properties"].get("phone")))
     
-    print(f"\n📊 Analyzing {total_contacts} contacts...")
+    if not total_contacts:
+        log.info("📭 No contacts found.")
+        return
     
-    for contact in contacts:
-        props = contact["properties"]
-        phone = props.get("phone")
-        
-        if not normalize_phone(phone):
-            contacts_without_phone += 1
-        else:
-            contacts_with_phone += 1
+    contacts_with_phone = total_contacts - contacts_without_phone
+    
+    log.info(f"\n📊 Analyzed {total_contacts} contacts")
     
     # Display results
-    print("\n" + "="*60)
-    print("📈 PHONE NUMBER ANALYSIS RESULTS:")
-    print("="*60)
-    print(f"📊 Total contacts analyzed: {total_contacts}")
-    print(f"📱 Contacts WITH phone numbers: {contacts_with_phone}")
-    print(f"❌ Contacts WITHOUT phone numbers: {contacts_without_phone}")
+    log.info("\n" + "="*60)
+    log.info("📈 PHONE NUMBER ANALYSIS RESULTS:")
+    log.info("="*60)
+    log.info(f"📊 Total contacts analyzed: {total_contacts}")
+    log.info(f"📱 Contacts WITH phone numbers: {contacts_with_phone}")
+    log.info(f"❌ Contacts WITHOUT phone numbers: {contacts_without_phone}")
     
     if total_contacts > 0:
         percentage_without_phone = (contacts_without_phone / total_contacts) * 100
         percentage_with_phone = (contacts_with_phone / total_contacts) * 100
-        print(f"📊 Percentage WITHOUT phone: {percentage_without_phone:.2f}%")
-        print(f"📊 Percentage WITH phone: {percentage_with_phone:.2f}%")
+        log.info(f"📊 Percentage WITHOUT phone: {percentage_without_phone:.2f}%")
+        log.info(f"📊 Percentage WITH phone: {percentage_with_phone:.2f}%")
     
     return contacts_without_phone
 
 # ========== Main Logic ==========
 
+def setup_logging():
+    """Route log records through a queue so console writes happen off the fetch threads"""
+    log_queue = queue.Queue()
+    listener = QueueListener(log_queue, logging.StreamHandler(sys.stdout))
+    logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), format="%(message)s",
+                        handlers=[QueueHandler(log_queue)])
+    listener.start()
+    return listener
+
 def main():
-    print("🚀 Starting Phone Number Analysis...")
-    
-    # Option 1: Count for specific date
-    print(f"📅 Analyzing contacts for: {TARGET_DATE.strftime('%Y-%m-%d %Z')}")
-    count_without_phone_specific_date = count_contacts_without_phone(TARGET_DATE)
+    listener = setup_logging()
+    log.info("🚀 Starting Phone Number Analysis...")
     
-    # Option 2: Count for all contacts (uncomment if needed)
-    """
-    print(f"\n📅 Analyzing all contacts...")
-    count_without_phone_all = count_contacts_without_phone()
-    """
-    
-    print(f"\n🎯 FINAL RESULT: {count_without_phone_specific_date} contacts don't have phone numbers on {TARGET_DATE.strftime('%Y-%m-%d')}")
+    try:
+        # Option 1: Count for specific date
+        log.info(f"📅 Analyzing contacts for: {TARGET_DATE.strftime('%Y-%m-%d %Z')}")
+        count_without_phone_specific_date = count_contacts_without_phone(TARGET_DATE)
+        
+        # Option 2: Count for all contacts (uncomment if needed)
+        """
+        log.info(f"\n📅 Analyzing all contacts...")
+        count_without_phone_all = count_contacts_without_phone()
+        """
+        
+        log.info(f"\n🎯 FINAL RESULT: {count_without_phone_specific_date} contacts don't have phone numbers on {TARGET_DATE.strftime('%Y-%m-%d')}")
+    finally:
+        listener.stop()
 
 if __name__ == "__main__":
     main()
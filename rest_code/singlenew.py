@@ -2,9 +2,15 @@ import os
 import requests
 import time
 from datetime import datetime, timezone, timedelta
-from dateutil import parser
-import re
 
+from normalizers import normalize_phone
+from hubspot_api import make_session, make_merge_session, decode_json, TokenBucket
+
+# dateutil is only needed for timestamps that aren't strict ISO-8601
+try:
+    from dateutil import parser as date_parser
+except ImportError:
+    date_parser = None
 
 # ========== CONFIG ==========
 HUBSPOT_TOKEN = os.getenv('HUBSPOT_TOKEN', 'your-hubspot-token-here')
@@ -13,35 +19,25 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Shared session so every HubSpot call reuses keep-alive connections; the adapter retries
+# timeouts, connection errors, 5xx and 429s (honouring Retry-After) with exponential backoff
+SESSION = make_session(HEADERS, total=5)  # 0.5s, 1s, 2s, 4s, 8s
+
+# Merges get a session that never re-sends a request HubSpot may already have applied
+MERGE_SESSION = make_merge_session(HEADERS)
+
 # ========== TARGET PHONE NUMBER ==========
 TARGET_PHONE = "9609950075"  # Just change this number
 
 # Define priority lifecycle stages
 PRIORITY_LIFECYCLE_STAGES = {"pre-mql", "mql", "sql", "opportunity", "customer", "lapsed customer"}
 
-
-# ========== HELPER FUNCTIONS ==========
+# HubSpot allows 100 requests per 10 seconds for private apps
+MERGE_RATE_LIMIT = 10  # requests per second
+MERGE_BUCKET = TokenBucket(MERGE_RATE_LIMIT, MERGE_RATE_LIMIT)
 
 
-def normalize_phone(phone):
-    """Enhanced phone number normalization"""
-    if not phone:
-        return None
-    
-    phone_str = str(phone).strip()
-    phone_str = re.sub(r'[^\d+]', '', phone_str)
-    
-    if phone_str.startswith('+91'):
-        phone_str = phone_str[3:]
-    elif phone_str.startswith('91') and len(phone_str) == 12:
-        phone_str = phone_str[2:]
-    elif phone_str.startswith('0') and len(phone_str) == 11:
-        phone_str = phone_str[1:]
-    
-    if len(phone_str) == 10 and phone_str.isdigit() and phone_str[0] in '6789':
-        return phone_str
-    
-    return None
+# ========== HELPER FUNCTIONS ==========
 
 
 def generate_phone_variations(phone_number):
@@ -50,33 +46,32 @@ def generate_phone_variations(phone_number):
     if not normalized:
         return []
     
-    # Generate common variations
-    variations = [
-        normalized,                    # 9926232462
-        f"91{normalized}",            # 919926232462
-        f"+91{normalized}",           # +919926232462
-        f"+91 {normalized}",          # +91 9926232462
-        f"+91-{normalized}",          # +91-9926232462
-        f"91-{normalized}",           # 91-9926232462
-        f"91 {normalized}",           # 91 9926232462
-        f"0{normalized}",             # 09926232462
-    ]
+    # dict.fromkeys drops duplicates but keeps the order, so the same number always gives the same list
+    return list(dict.fromkeys(iter_phone_variations(normalized)))
+
+
+def iter_phone_variations(normalized):
+    """Yield each search format of a normalized 10-digit phone number"""
+    # Common variations
+    yield normalized                    # 9926232462
+    yield f"91{normalized}"             # 919926232462
+    yield f"+91{normalized}"            # +919926232462
+    yield f"+91 {normalized}"           # +91 9926232462
+    yield f"+91-{normalized}"           # +91-9926232462
+    yield f"91-{normalized}"            # 91-9926232462
+    yield f"91 {normalized}"            # 91 9926232462
+    yield f"0{normalized}"              # 09926232462
     
-    # Add formatted variations
+    # Formatted variations
     if len(normalized) == 10:
-        formatted_variations = [
-            f"{normalized[:5]}-{normalized[5:]}",        # 99262-32462
-            f"+91 {normalized[:5]}-{normalized[5:]}",    # +91 99262-32462
-            f"91-{normalized[:5]}-{normalized[5:]}",     # 91-99262-32462
-            f"+91-{normalized[:5]}-{normalized[5:]}",    # +91-99262-32462
-        ]
-        variations.extend(formatted_variations)
-    
-    return list(set(variations))  # Remove duplicates
+        yield f"{normalized[:5]}-{normalized[5:]}"        # 99262-32462
+        yield f"+91 {normalized[:5]}-{normalized[5:]}"    # +91 99262-32462
+        yield f"91-{normalized[:5]}-{normalized[5:]}"     # 91-99262-32462
+        yield f"+91-{normalized[:5]}-{normalized[5:]}"    # +91-99262-32462
 
 
-def search_contacts_by_single_variation(phone_variation):
-    """Search for contacts using a single phone variation"""
+def search_contacts_by_variations_bulk(phone_variations):
+    """Search for contacts matching any of the phone variations in one IN query"""
     url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
     all_contacts = []
     after = None
@@ -87,8 +82,8 @@ def search_contacts_by_single_variation(phone_variation):
                 "filters": [
                     {
                         "propertyName": "phone",
-                        "operator": "EQ",
-                        "value": phone_variation
+                        "operator": "IN",
+                        "values": phone_variations
                     }
                 ]
             }],
@@ -108,9 +103,9 @@ def search_contacts_by_single_variation(phone_variation):
             payload["after"] = after
 
         try:
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=15)
+            response = SESSION.post(url, json=payload, timeout=15)
             response.raise_for_status()
-            data = response.json()
+            data = decode_json(response)
             results = data.get("results", [])
             all_contacts.extend(results)
 
@@ -122,7 +117,7 @@ def search_contacts_by_single_variation(phone_variation):
             time.sleep(0.1)  # Rate limiting
             
         except requests.exceptions.RequestException as e:
-            print(f"❌ Error fetching contacts for {phone_variation}: {e}")
+            print(f"❌ Error fetching contacts for {len(phone_variations)} phone variations: {e}")
             break
 
     return all_contacts
@@ -144,32 +139,58 @@ def search_contacts_by_phone_variations(phone_number):
     all_found_contacts = []
     unique_contact_ids = set()
     
-    # Search each variation separately to avoid API limits
-    for i, variation in enumerate(variations, 1):
-        print(f"  {i}/{len(variations)} Searching: {variation}")
-        
-        contacts = search_contacts_by_single_variation(variation)
-        
-        # Filter to exact normalized matches and deduplicate
-        exact_matches = 0
-        for contact in contacts:
-            contact_phone = normalize_phone(contact["properties"].get("phone"))
-            if contact_phone == normalized_target and contact['id'] not in unique_contact_ids:
-                all_found_contacts.append(contact)
-                unique_contact_ids.add(contact['id'])
-                exact_matches += 1
-        
-        if exact_matches > 0:
-            print(f"    ✅ Found {exact_matches} exact matches")
-        
-        time.sleep(0.2)  # Rate limiting between searches
+    # One search covers every variation (HubSpot's IN operator takes the whole list)
+    contacts = search_contacts_by_variations_bulk(variations)
+    
+    # Deduplicate first, then filter to exact normalized matches, so each contact's phone is normalized once
+    for contact in contacts:
+        if contact['id'] in unique_contact_ids:
+            continue
+        if normalize_phone(contact["properties"].get("phone")) == normalized_target:
+            all_found_contacts.append(contact)
+            unique_contact_ids.add(contact['id'])
     
     print(f"✅ Total unique contacts found: {len(all_found_contacts)}")
     return all_found_contacts
 
 
+def parse_hubspot_date(date_str):
+    """Parse a HubSpot ISO-8601 timestamp, falling back to dateutil for other formats"""
+    try:
+        return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+    except ValueError:
+        if date_parser is None:
+            raise
+        return date_parser.parse(date_str)
+
+
+def get_contact_cache(contact):
+    """Parse a contact's dates and score it once, keeping the results on the contact under _cache"""
+    cache = contact.get("_cache")
+    if cache is None:
+        create_date_str = contact["properties"].get("createdate")
+        create_dt = None
+        if create_date_str:
+            try:
+                create_dt = parse_hubspot_date(create_date_str)
+            except:
+                pass
+        
+        cache = contact["_cache"] = {
+            "create_dt": create_dt,
+            "last_contact": parse_last_contact_date(contact),
+            "quality_score": score_contact_quality(contact)
+        }
+    return cache
+
+
 def get_last_contact_date(contact):
     """Get the most recent contact date"""
+    return get_contact_cache(contact)["last_contact"]
+
+
+def parse_last_contact_date(contact):
+    """Find the most recent contact date, as (raw value, parsed datetime)"""
     props = contact["properties"]
     
     date_fields = [
@@ -187,7 +208,7 @@ def get_last_contact_date(contact):
         date_value = props.get(field)
         if date_value:
             try:
-                parsed_date = parser.parse(date_value)
+                parsed_date = parse_hubspot_date(date_value)
                 if latest_date_parsed is None or parsed_date > latest_date_parsed:
                     latest_date = date_value
                     latest_date_parsed = parsed_date
@@ -198,7 +219,7 @@ def get_last_contact_date(contact):
         latest_date = props.get("createdate")
         if latest_date:
             try:
-                latest_date_parsed = parser.parse(latest_date)
+                latest_date_parsed = parse_hubspot_date(latest_date)
             except:
                 latest_date_parsed = datetime.min.replace(tzinfo=timezone.utc)
     
@@ -211,15 +232,13 @@ def has_priority_lifecycle_stage(contact):
     return lifecycle_stage in PRIORITY_LIFECYCLE_STAGES
 
 
-def is_old_contact(contact):
-    """Check if contact is older than 1 month"""
-    create_date_str = contact["properties"].get("createdate")
-    if not create_date_str:
+def is_old_contact(contact, one_month_ago):
+    """Check if contact was created before one_month_ago"""
+    create_date = get_contact_cache(contact)["create_dt"]
+    if create_date is None:
         return False
     
     try:
-        create_date = parser.parse(create_date_str)
-        one_month_ago = datetime.now(timezone.utc) - timedelta(days=30)
         return create_date < one_month_ago
     except:
         return False
@@ -231,29 +250,29 @@ def has_owner(contact):
     return bool(owner and owner.strip())
 
 
-def was_contacted_recently(contact):
-    """Check if contact was contacted within 1 month"""
+def was_contacted_recently(contact, one_month_ago):
+    """Check if contact was contacted after one_month_ago"""
     _, last_contact_parsed = get_last_contact_date(contact)
     if not last_contact_parsed:
         return False
     
-    one_month_ago = datetime.now(timezone.utc) - timedelta(days=30)
     return last_contact_parsed > one_month_ago
 
 
 def get_create_date(contact):
     """Get parsed create date of contact"""
-    create_date_str = contact["properties"].get("createdate")
-    if not create_date_str:
-        return datetime.min.replace(tzinfo=timezone.utc)
-    
-    try:
-        return parser.parse(create_date_str)
-    except:
+    create_date = get_contact_cache(contact)["create_dt"]
+    if create_date is None:
         return datetime.min.replace(tzinfo=timezone.utc)
+    return create_date
 
 
 def get_contact_quality_score(contact):
+    """Get the (cached) quality score for the contact"""
+    return get_contact_cache(contact)["quality_score"]
+
+
+def score_contact_quality(contact):
     """Calculate a quality score for the contact"""
     props = contact["properties"]
     score = 0
@@ -277,8 +296,20 @@ def determine_primary_contact(contacts):
     
     print(f"🧠 Analyzing {len(contacts)} contacts to determine primary...")
     
+    # One cutoff for the whole scan, so every contact is judged against the same instant
+    one_month_ago = datetime.now(timezone.utc) - timedelta(days=30)
+    
+    # Evaluate the rule predicates once per contact: (contact, priority, old, uncontacted, owner)
+    features = []
+    for c in contacts:
+        old = is_old_contact(c, one_month_ago)
+        features.append((
+            c, has_priority_lifecycle_stage(c), old,
+            old and not was_contacted_recently(c, one_month_ago), has_owner(c)
+        ))
+    
     # Rule 1: Priority lifecycle stages
-    priority_contacts = [c for c in contacts if has_priority_lifecycle_stage(c)]
+    priority_contacts = [c for c, priority, _, _, _ in features if priority]
     if priority_contacts:
         if len(priority_contacts) == 1:
             print(f"  ✅ Primary selected: {priority_contacts[0]['id']} (priority lifecycle)")
@@ -287,7 +318,7 @@ def determine_primary_contact(contacts):
             return get_highest_quality_contact(priority_contacts)
     
     # Rule 2: Old uncontacted contacts
-    old_uncontacted = [c for c in contacts if is_old_contact(c) and not was_contacted_recently(c)]
+    old_uncontacted = [c for c, _, _, uncontacted, _ in features if uncontacted]
     if old_uncontacted:
         if len(old_uncontacted) == 1:
             print(f"  ✅ Primary selected: {old_uncontacted[0]['id']} (old uncontacted)")
@@ -298,7 +329,7 @@ def determine_primary_contact(contacts):
             return oldest
     
     # Rule 3: Recent contacts with owner
-    recent_with_owner = [c for c in contacts if not is_old_contact(c) and has_owner(c)]
+    recent_with_owner = [c for c, _, old, _, owner in features if not old and owner]
     if recent_with_owner:
         if len(recent_with_owner) == 1:
             print(f"  ✅ Primary selected: {recent_with_owner[0]['id']} (recent with owner)")
@@ -307,7 +338,7 @@ def determine_primary_contact(contacts):
             return get_most_recent_contact(recent_with_owner)
     
     # Rule 4: Contacts with no owner - pick newest
-    no_owner_contacts = [c for c in contacts if not has_owner(c)]
+    no_owner_contacts = [c for c, _, _, _, owner in features if not owner]
     if no_owner_contacts:
         newest = max(no_owner_contacts, key=get_create_date)
         print(f"  ✅ Primary selected: {newest['id']} (newest without owner)")
@@ -361,10 +392,11 @@ def merge_contacts(primary_id, to_merge_id):
         "objectIdToMerge": str(to_merge_id)
     }
     
+    MERGE_BUCKET.acquire()
     try:
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=10)
+        response = MERGE_SESSION.post(url, json=payload, timeout=10)
         response.raise_for_status()
-        return response.json()
+        return decode_json(response)
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"❌ Merge failed: {e}")
 
@@ -399,7 +431,8 @@ def process_phone_duplicates(phone_number, contacts):
     print(f"🎯 Primary Contact: {primary_contact['id']}")
     print(f"📝 Merging: {[c['id'] for c in other_contacts]} → {primary_contact['id']}")
     
-    # Execute merges
+    # Execute merges one at a time (HubSpot can't merge two records into the same primary at once);
+    # MERGE_BUCKET paces them instead of a fixed sleep
     merged_count = 0
     for merge_contact in other_contacts:
         try:
@@ -407,7 +440,6 @@ def process_phone_duplicates(phone_number, contacts):
             merge_contacts(primary_contact['id'], merge_contact['id'])
             merged_count += 1
             print(f"✅ Success!")
-            time.sleep(2)  # Rate limiting
         except Exception as e:
             print(f"❌ Failed: {e}")
             return {"status": "failed", "error": str(e)}
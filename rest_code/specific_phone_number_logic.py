@@ -1,8 +1,15 @@
 import os
 import requests
-import time
 from datetime import datetime, timezone
-from dateutil import parser
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from hubspot_api import make_session, make_merge_session, encode_json
+
+# dateutil is only needed for timestamps that aren't strict ISO-8601
+try:
+    from dateutil import parser as date_parser
+except ImportError:
+    date_parser = None
 
 
 # ========== CONFIG ==========
@@ -12,81 +19,105 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Shared session so every HubSpot call reuses keep-alive connections; the adapter retries
+# transient errors and 429s (honouring Retry-After) with exponential backoff
+SESSION = make_session(HEADERS, pool_connections=10, pool_maxsize=20, total=5, backoff_factor=1.0)  # 1s, 2s, 4s, 8s, 16s
+
+# Merges get a session that never re-sends a request HubSpot may already have applied
+MERGE_SESSION = make_merge_session(HEADERS)
+
 # Target phone number for testing
 TEST_PHONE = "8809190913"
 
+# Phone numbers to merge in one run (e.g. the 3+ duplicate numbers listed by three.py)
+PHONE_NUMBERS = [TEST_PHONE]
+MERGE_WORKERS = 4  # numbers processed at once; each number's own merges still run in order
+
+# Properties checked (in order) for the last time a contact was reached
+LAST_CONTACT_DATE_FIELDS = ("lastcontactdate", "notes_last_contacted", "hs_analytics_last_timestamp")
+
+# Sort key for contacts without a usable date
+MIN_DATE = datetime.min.replace(tzinfo=timezone.utc)
+
 # ========== Helper Functions ==========
 
+def parse_hubspot_date(date_str):
+    """Parse a HubSpot timestamp: ISO-8601, or epoch milliseconds; falls back to dateutil for other formats"""
+    if date_str.isdigit():
+        return datetime.fromtimestamp(int(date_str) / 1000, tz=timezone.utc)
+    try:
+        return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+    except ValueError:
+        if date_parser is None:
+            raise
+        return date_parser.parse(date_str)
+
 def get_last_contact_date(contact):
     """Get the most recent contact date from various possible fields"""
     props = contact["properties"]
     
-    date_fields = [
-        "lastcontactdate",
-        "notes_last_contacted", 
-        "hs_analytics_last_timestamp"
-    ]
-    
     latest_date = None
     latest_date_parsed = None
     
-    for field in date_fields:
+    for field in LAST_CONTACT_DATE_FIELDS:
         date_value = props.get(field)
         if date_value:
             try:
-                parsed_date = parser.parse(date_value)
+                parsed_date = parse_hubspot_date(date_value)
                 if latest_date_parsed is None or parsed_date > latest_date_parsed:
                     latest_date = date_value
                     latest_date_parsed = parsed_date
-            except:
+            except (ValueError, TypeError, OverflowError):
                 continue
     
     if not latest_date:
         latest_date = props.get("createdate")
         if latest_date:
             try:
-                latest_date_parsed = parser.parse(latest_date)
-            except:
-                latest_date_parsed = datetime.min.replace(tzinfo=timezone.utc)
+                latest_date_parsed = parse_hubspot_date(latest_date)
+            except (ValueError, TypeError, OverflowError):
+                latest_date_parsed = MIN_DATE
     
     return latest_date, latest_date_parsed
 
-def search_contacts_by_phone(phone_number):
+def search_contacts_by_phone(phone_number, out=print):
     """Search for all contacts with a specific phone number"""
     url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
-    phone_variations = [phone_number, f"+91{phone_number}", f"+91 {phone_number}", f"91{phone_number}"]
+    # dict.fromkeys drops repeated variants while keeping their order
+    phone_variations = list(dict.fromkeys([phone_number, f"+91{phone_number}", f"+91 {phone_number}", f"91{phone_number}"]))
     all_contacts = []
+    seen_ids = set()
+    
+    # One search covers every variation (HubSpot's IN operator takes the whole list)
+    payload = {
+        "filterGroups": [{
+            "filters": [{
+                "propertyName": "phone",
+                "operator": "IN",
+                "values": phone_variations
+            }]
+        }],
+        "properties": [
+            "email", "phone", "hs_additional_emails", "createdate", 
+            "firstname", "lastname", "company", "lifecylestage",
+            "lastcontactdate", "notes_last_contacted", "hs_analytics_last_timestamp"
+        ],
+        "limit": 100
+    }
     
-    for phone_variation in phone_variations:
-        payload = {
-            "filterGroups": [{
-                "filters": [{
-                    "propertyName": "phone",
-                    "operator": "EQ",
-                    "value": phone_variation
-                }]
-            }],
-            "properties": [
-                "email", "phone", "hs_additional_emails", "createdate", 
-                "firstname", "lastname", "company", "lifecylestage",
-                "lastcontactdate", "notes_last_contacted", "hs_analytics_last_timestamp"
-            ],
-            "limit": 100
-        }
+    try:
+        response = SESSION.post(url, json=payload, timeout=15)
+        response.raise_for_status()
+        data = response.json()
+        contacts = data.get("results", [])
         
-        try:
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            contacts = data.get("results", [])
-            
-            for contact in contacts:
-                if not any(c["id"] == contact["id"] for c in all_contacts):
-                    all_contacts.append(contact)
-                    
-        except requests.exceptions.RequestException as e:
-            print(f"❌ Error searching for phone {phone_variation}: {e}")
-            continue
+        for contact in contacts:
+            if contact["id"] not in seen_ids:
+                seen_ids.add(contact["id"])
+                all_contacts.append(contact)
+                
+    except requests.exceptions.RequestException as e:
+        out(f"❌ Error searching for phone {phone_number}: {e}")
     
     return all_contacts
 
@@ -99,122 +130,114 @@ def merge_contacts(primary_id, to_merge_id):
     }
     
     try:
-        response = requests.post(url, headers=HEADERS, json=payload, timeout=10)
+        response = MERGE_SESSION.post(url, data=encode_json(payload), timeout=10)
         response.raise_for_status()
         return response.json()
     except requests.exceptions.RequestException as e:
         raise RuntimeError(f"❌ Merge failed: {e}")
 
-def merge_duplicate_contacts_pairwise(phone_number):
-    """Handle duplicates using pairwise merging strategy for HubSpot limitations"""
-    print(f"🔍 Searching for contacts with phone number: {phone_number}")
+def merge_duplicate_contacts_pairwise(phone_number, out=print):
+    """Handle duplicates using pairwise merging strategy for HubSpot limitations; progress lines go to out()"""
+    out(f"🔍 Searching for contacts with phone number: {phone_number}")
     
     # Search for contacts
-    contacts = search_contacts_by_phone(phone_number)
+    contacts = search_contacts_by_phone(phone_number, out)
     
     if not contacts:
-        print(f"📭 No contacts found with phone number {phone_number}")
+        out(f"📭 No contacts found with phone number {phone_number}")
         return
     
     if len(contacts) == 1:
-        print(f"✅ Only one contact found. No merging needed.")
+        out(f"✅ Only one contact found. No merging needed.")
         return
     
-    print(f"\n📊 Found {len(contacts)} duplicate contacts")
-    
-    # Sort contacts by last contact date (most recent first)
-    contacts_with_dates = []
-    for contact in contacts:
-        last_contact_str, last_contact_parsed = get_last_contact_date(contact)
-        contacts_with_dates.append({
-            'contact': contact,
-            'last_contact_str': last_contact_str,
-            'last_contact_parsed': last_contact_parsed or datetime.min.replace(tzinfo=timezone.utc)
-        })
+    out(f"\n📊 Found {len(contacts)} duplicate contacts")
     
-    contacts_with_dates.sort(key=lambda x: x['last_contact_parsed'], reverse=True)
+    # Sort contacts by last contact date (most recent first); sort() evaluates the key once per contact
+    contacts.sort(key=lambda contact: get_last_contact_date(contact)[1] or MIN_DATE, reverse=True)
     
-    print("\n🎯 HUBSPOT LIMITATION WORKAROUND:")
-    print("=" * 70)
-    print("⚠️ HubSpot only allows merging 2 contacts at a time due to 'canonical object' restrictions")
+    out("\n🎯 HUBSPOT LIMITATION WORKAROUND:")
+    out("=" * 70)
+    out("⚠️ HubSpot only allows merging 2 contacts at a time due to 'canonical object' restrictions")
     
     if len(contacts) == 2:
         # Simple case: just merge the two
-        primary_contact = contacts_with_dates[0]['contact']
-        merge_contact = contacts_with_dates[1]['contact']
+        primary_contact, merge_contact = contacts
         
-        print(f"\n✅ SIMPLE MERGE (2 contacts):")
-        print(f"🏆 Primary: {primary_contact['id']} (Most recent)")
-        print(f"🔄 Merge: {merge_contact['id']} → {primary_contact['id']}")
+        out(f"\n✅ SIMPLE MERGE (2 contacts):")
+        out(f"🏆 Primary: {primary_contact['id']} (Most recent)")
+        out(f"🔄 Merge: {merge_contact['id']} → {primary_contact['id']}")
         
         try:
-            print(f"\n🚀 Merging {merge_contact['id']} into {primary_contact['id']}...")
+            out(f"\n🚀 Merging {merge_contact['id']} into {primary_contact['id']}...")
             result = merge_contacts(primary_contact['id'], merge_contact['id'])
-            print(f"✅ Successfully merged! Final contact: {primary_contact['id']}")
+            out(f"✅ Successfully merged! Final contact: {primary_contact['id']}")
         except Exception as e:
-            print(f"❌ Merge failed: {e}")
+            out(f"❌ Merge failed: {e}")
             
-    elif len(contacts) == 3:
-        # For 3 contacts: merge 2nd and 3rd first, then merge result with 1st
-        print(f"\n🔄 STRATEGY FOR 3 CONTACTS:")
-        print("Step 1: Merge 2nd oldest into 3rd oldest")
-        print("Step 2: Merge result into most recent")
+    else:
+        # 3+ contacts: fold the in-between contacts into the oldest one pair by pair, then merge that into the most recent
+        most_recent = contacts[0]
+        oldest = contacts[-1]
+        in_between = list(reversed(contacts[1:-1]))  # 2nd oldest first
         
-        most_recent = contacts_with_dates[0]['contact']
-        second_recent = contacts_with_dates[1]['contact'] 
-        oldest = contacts_with_dates[2]['contact']
+        out(f"\n🔄 STRATEGY FOR {len(contacts)} CONTACTS:")
+        out(f"First: Merge the {len(in_between)} in-between contact(s) into the oldest, one at a time")
+        out("Then: Merge result into most recent")
         
-        print(f"\n📋 Execution Plan:")
-        print(f"🥇 Most Recent: {most_recent['id']} (Final target)")
-        print(f"🥈 2nd Recent: {second_recent['id']} → Merge into oldest first")
-        print(f"🥉 Oldest: {oldest['id']} ← First merge target")
+        out(f"\n📋 Execution Plan:")
+        out(f"🥇 Most Recent: {most_recent['id']} (Final target)")
+        for contact in in_between:
+            out(f"🥈 In between: {contact['id']} → Merge into oldest first")
+        out(f"🥉 Oldest: {oldest['id']} ← First merge target")
         
         try:
-            # Step 1: Merge 2nd recent into oldest
-            print(f"\n🔄 Step 1: Merging {second_recent['id']} into {oldest['id']}...")
-            result1 = merge_contacts(oldest['id'], second_recent['id'])
-            print(f"✅ Step 1 complete! Intermediate result: {oldest['id']}")
+            # HubSpot 429s are retried by the session adapter (honouring Retry-After), so no fixed wait between steps
+            for step, contact in enumerate(in_between, 1):
+                out(f"\n🔄 Step {step}: Merging {contact['id']} into {oldest['id']}...")
+                merge_contacts(oldest['id'], contact['id'])
+                out(f"✅ Step {step} complete! Intermediate result: {oldest['id']}")
             
-            time.sleep(3)  # Wait between merges
+            # Last step: Merge the result into most recent
+            step = len(in_between) + 1
+            out(f"\n🔄 Step {step}: Merging {oldest['id']} into {most_recent['id']}...")
+            merge_contacts(most_recent['id'], oldest['id'])
+            out(f"✅ Step {step} complete! Final contact: {most_recent['id']}")
             
-            # Step 2: Merge the result into most recent
-            print(f"\n🔄 Step 2: Merging {oldest['id']} into {most_recent['id']}...")
-            result2 = merge_contacts(most_recent['id'], oldest['id'])
-            print(f"✅ Step 2 complete! Final contact: {most_recent['id']}")
-            
-            print(f"\n🎉 ALL 3 CONTACTS SUCCESSFULLY MERGED!")
-            print(f"🏆 Final consolidated contact: {most_recent['id']}")
+            out(f"\n🎉 ALL {len(contacts)} CONTACTS SUCCESSFULLY MERGED!")
+            out(f"🏆 Final consolidated contact: {most_recent['id']}")
             
         except Exception as e:
-            print(f"❌ Multi-step merge failed: {e}")
-            print("💡 You may need to merge these manually in HubSpot UI")
-            
-    else:
-        # For 4+ contacts, this gets complex
-        print(f"\n⚠️ COMPLEX CASE ({len(contacts)} contacts):")
-        print("HubSpot's merge limitations make this challenging.")
-        print("💡 Recommendations:")
-        print("1. Use HubSpot's native duplicate management tools")
-        print("2. Merge contacts manually in pairs through the UI")
-        print("3. Consider using HubSpot's bulk merge features")
-        
-        print(f"\n📋 Contacts found:")
-        for i, item in enumerate(contacts_with_dates, 1):
-            contact = item['contact']
-            props = contact['properties']
-            print(f"{i}. ID: {contact['id']} | Email: {props.get('email', 'N/A')} | Name: {props.get('firstname', '')} {props.get('lastname', '')}")
+            out(f"❌ Multi-step merge failed: {e}")
+            out("💡 You may need to merge these manually in HubSpot UI")
+
+def merge_phone_numbers(phone_numbers):
+    """Run the pairwise merge for several phone numbers, up to MERGE_WORKERS at a time.
+    Different numbers touch different contacts, so their merge chains can overlap safely.
+    Each number's lines are collected and printed together once it finishes, so they don't interleave."""
+    outputs = {phone: [] for phone in phone_numbers}
+    with ThreadPoolExecutor(max_workers=MERGE_WORKERS) as executor:
+        futures = {executor.submit(merge_duplicate_contacts_pairwise, phone, outputs[phone].append): phone
+                   for phone in outputs}
+        for future in as_completed(futures):
+            phone = futures[future]
+            print("\n".join(outputs[phone]))
+            try:
+                future.result()
+            except Exception as e:
+                print(f"❌ An error occurred for {phone}: {e}")
 
 # ========== Main Logic ==========
 
 def main():
     print("🚀 HUBSPOT-COMPLIANT MERGE - Respects API Limitations")
-    print(f"📱 Target Phone Number: {TEST_PHONE}")
+    print(f"📱 Target Phone Number(s): {', '.join(PHONE_NUMBERS)}")
     print("⚠️ Works around HubSpot's 'canonical object' merge restrictions")
-    print("🎯 Optimized for 2-3 contacts, guidance for 4+")
+    print("🎯 Merges any number of contacts two at a time")
     print("=" * 80)
     
     try:
-        merge_duplicate_contacts_pairwise(TEST_PHONE)
+        merge_phone_numbers(PHONE_NUMBERS)
     except Exception as e:
         print(f"❌ An error occurred: {e}")
 
@@ -1,9 +1,20 @@
 import os
+import sys
+import tempfile
 import requests
 import time
 from datetime import datetime, timezone, timedelta
-from dateutil import parser
 from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from hubspot_api import make_session, decode_json, load_json, encode_json, TokenBucket
+
+# dateutil is only needed for timestamps that aren't strict ISO-8601
+try:
+    from dateutil import parser as date_parser
+except ImportError:
+    date_parser = None
 
 # ========== CONFIG ==========
 HUBSPOT_TOKEN = os.getenv('HUBSPOT_TOKEN', 'your-hubspot-token-here')
@@ -12,28 +23,166 @@ HEADERS = {
     "Content-Type": "application/json"
 }
 
+# Shared session so every HubSpot call reuses keep-alive connections; the adapter retries
+# transient errors and 429s (honouring Retry-After) with exponential backoff
+SESSION = make_session(HEADERS, pool_connections=10, pool_maxsize=20, total=5, backoff_factor=1.0)  # 1s, 2s, 4s, 8s, 16s
+
 # Date range - TODAY ONLY
 TODAY = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
 TOMORROW = TODAY + timedelta(days=1)
 
+# The day is fetched as hourly windows, paged concurrently
+SEARCH_WINDOWS = 24
+SEARCH_WORKERS = 4  # HubSpot's search endpoint allows only a few requests per second
+SEARCH_RATE_LIMIT = 4  # search requests per second, shared by all workers
+SEARCH_BUCKET = TokenBucket(SEARCH_RATE_LIMIT, SEARCH_RATE_LIMIT)
+
+# A re-run within TODAY_CACHE_TTL seconds reuses the last fetch instead of paging the day again (0 disables)
+TODAY_CACHE_PATH = Path(tempfile.gettempdir()) / f"hubspot_today_{TODAY.date()}.json"
+TODAY_CACHE_TTL = int(os.getenv('TODAY_CACHE_TTL', '300'))
+
+# Separators dropped from phone numbers before the digit check
+PHONE_STRIP_TABLE = str.maketrans("", "", " -")
+
 # ========== Helper Functions ==========
 
+def parse_hubspot_date(date_str):
+    """Parse a HubSpot timestamp: ISO-8601, or epoch milliseconds; falls back to dateutil for other formats"""
+    if date_str.isdigit():
+        return datetime.fromtimestamp(int(date_str) / 1000, tz=timezone.utc)
+    try:
+        return datetime.fromisoformat(date_str.replace("Z", "+00:00"))
+    except ValueError:
+        if date_parser is None:
+            raise
+        return date_parser.parse(date_str)
+
 def normalize_phone(phone):
     """Normalize phone number by removing country codes and spaces"""
     if not phone:
         return None
-    phone_str = str(phone).replace("+91", "").replace(" ", "").replace("-", "").strip()
+    phone_str = str(phone).replace("+91", "").translate(PHONE_STRIP_TABLE).strip()
     return phone_str if phone_str.isdigit() and len(phone_str) >= 10 else None
 
-def fetch_todays_contacts(limit=10000):
-    """Fetch only contacts created today"""
+class ContactInfo:
+    """Only the fields the duplicate reports use; slotted so a full day of contacts stays small"""
+    __slots__ = ("id", "email", "phone", "firstname", "lastname", "createdate", "company")
+
+    def __init__(self, contact):
+        props = contact["properties"]
+        self.id = contact["id"]
+        self.email = props.get("email", "").lower().strip() if props.get("email") else None
+        self.phone = normalize_phone(props.get("phone"))
+        self.firstname = props.get("firstname", "")
+        self.lastname = props.get("lastname", "")
+        self.createdate = props.get("createdate", "")
+        self.company = props.get("company", "")
+
+    @classmethod
+    def from_row(cls, row):
+        """Rebuild a ContactInfo from a row saved by save_todays_cache"""
+        contact_info = cls.__new__(cls)
+        for field, value in zip(cls.__slots__, row):
+            setattr(contact_info, field, value)
+        return contact_info
+
+    def to_row(self):
+        """Field values in __slots__ order, for the JSON cache"""
+        return [getattr(self, field) for field in self.__slots__]
+
+def iter_todays_contacts(limit=10000, failed_windows=None):
+    """Yield a ContactInfo for each contact created today.
+    The day is split into SEARCH_WINDOWS slices that are paged concurrently; the start of any
+    slice that could not be fetched completely is appended to failed_windows."""
+    print(f"🔍 Fetching contacts created TODAY ({TODAY.strftime('%Y-%m-%d')})...")
+
+    step = (TOMORROW - TODAY) / SEARCH_WINDOWS
+    starts = [TODAY + step * i for i in range(SEARCH_WINDOWS)]
+    ends = starts[1:] + [TOMORROW]
+
+    total = 0
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as executor:
+        results = executor.map(lambda start, end: fetch_contacts_in_window(start, end, limit), starts, ends)
+        for start, (window_contacts, ok) in zip(starts, results):
+            if not ok and failed_windows is not None:
+                failed_windows.append(start)
+            window_contacts = window_contacts[:limit - total]
+            total += len(window_contacts)
+            print(f"📊 Fetched {total} contacts created today so far...")
+            yield from window_contacts
+            if total >= limit:
+                break
+
+    print(f"✅ Total contacts created today: {total}")
+
+def load_todays_cache():
+    """Return the cached ContactInfo list for today if it is fresh enough and was saved for TODAY, else None"""
+    if TODAY_CACHE_TTL <= 0:
+        return None
+    try:
+        if TODAY_CACHE_PATH.stat().st_mtime < time.time() - TODAY_CACHE_TTL:
+            return None
+        data = TODAY_CACHE_PATH.read_bytes()
+        cache = load_json(data)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(cache, dict) or cache.get("date") != str(TODAY.date()):
+        return None
+    rows = cache["rows"]
+    print(f"📂 Using {len(rows)} contacts cached in {TODAY_CACHE_PATH}")
+    return [ContactInfo.from_row(row) for row in rows]
+
+def save_todays_cache(contacts):
+    """Write today's contacts to TODAY_CACHE_PATH (via a temp file, so readers never see half a file)"""
+    if TODAY_CACHE_TTL <= 0:
+        return
+    rows = [contact_info.to_row() for contact_info in contacts]
+    data = encode_json({"date": str(TODAY.date()), "rows": rows})
+    tmp_path = TODAY_CACHE_PATH.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, TODAY_CACHE_PATH)
+    except OSError as e:
+        print(f"⚠️ Could not write contacts cache: {e}")
+
+def group_todays_contacts():
+    """Group today's contacts by phone and by email as they are fetched (or loaded from the cache)"""
+    phone_groups = defaultdict(list)
+    email_groups = defaultdict(list)
+    total = 0
+    
+    cached = load_todays_cache()
+    fetched = []
+    failed_windows = []
+    for contact_info in cached if cached is not None else iter_todays_contacts(failed_windows=failed_windows):
+        total += 1
+        if cached is None:
+            fetched.append(contact_info)
+        
+        # Group by phone
+        if contact_info.phone:
+            phone_groups[contact_info.phone].append(contact_info)
+        
+        # Group by email
+        if contact_info.email:
+            email_groups[contact_info.email].append(contact_info)
+    
+    if failed_windows:
+        # Caching a partial day would hide the missing contacts from re-runs until the TTL expires
+        print(f"⚠️ {len(failed_windows)} time window(s) failed to load; results are incomplete and were not cached")
+    elif cached is None:
+        save_todays_cache(fetched)
+    
+    return total, phone_groups, email_groups
+
+def fetch_contacts_in_window(window_start, window_end, limit):
+    """Fetch contacts created in [window_start, window_end) as ContactInfo objects.
+    Returns (contacts, ok); ok is False when a request failed and the window is incomplete."""
     url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
     all_contacts = []
     after = None
     fetched = 0
 
-    print(f"🔍 Fetching contacts created TODAY ({TODAY.strftime('%Y-%m-%d')})...")
-
     while fetched < limit:
         payload = {
             "filterGroups": [{
@@ -41,12 +190,12 @@ def fetch_todays_contacts(limit=10000):
                     {
                         "propertyName": "createdate",
                         "operator": "GTE",
-                        "value": TODAY.isoformat()
+                        "value": window_start.isoformat()
                     },
                     {
                         "propertyName": "createdate",
                         "operator": "LT", 
-                        "value": TOMORROW.isoformat()
+                        "value": window_end.isoformat()
                     }
                 ]
             }],
@@ -62,77 +211,37 @@ def fetch_todays_contacts(limit=10000):
             payload["after"] = after
 
         try:
-            response = requests.post(url, headers=HEADERS, json=payload, timeout=15)
+            SEARCH_BUCKET.acquire()  # keep the concurrent windows under the search rate limit
+            response = SESSION.post(url, json=payload, timeout=15)
             response.raise_for_status()
         except requests.exceptions.ReadTimeout:
             print("⏱️ Read timeout while fetching contacts. Try again later.")
-            break
+            return all_contacts, False
         except requests.exceptions.RequestException as e:
             print(f"❌ Network error while fetching contacts: {e}")
-            break
+            return all_contacts, False
 
-        data = response.json()
+        data = decode_json(response)
         results = data.get("results", [])
-        all_contacts.extend(results)
+        # Reduce each page to ContactInfo right away so full payloads aren't kept
+        all_contacts.extend(ContactInfo(contact) for contact in results)
         fetched += len(results)
 
-        if fetched > 0:
-            print(f"📊 Fetched {fetched} contacts created today so far...")
-
         if "paging" in data and "next" in data["paging"]:
             after = data["paging"]["next"]["after"]
         else:
             break
 
-        # Small delay to avoid rate limiting
-        time.sleep(0.1)
-
-    print(f"✅ Total contacts created today: {len(all_contacts)}")
-    return all_contacts[:limit]
+    return all_contacts, True
 
-def find_todays_contacts_with_multiple_duplicates():
+def find_todays_contacts_with_multiple_duplicates(total_contacts, phone_groups, email_groups):
     """Find all phone numbers and emails from TODAY that have more than 2 contacts"""
     
     print("🚀 FINDING TODAY'S CONTACTS WITH MORE THAN 2 DUPLICATES")
     print(f"📅 Date: {TODAY.strftime('%Y-%m-%d')}")
     print("=" * 80)
     
-    # Fetch today's contacts only
-    contacts = fetch_todays_contacts()
-    
-    if not contacts:
-        print("📭 No contacts created today.")
-        return
-    
-    # Group contacts by phone and email
-    phone_groups = defaultdict(list)
-    email_groups = defaultdict(list)
-    
-    print(f"\n📊 Analyzing {len(contacts)} contacts created today for duplicates...")
-    
-    for contact in contacts:
-        props = contact["properties"]
-        contact_id = contact["id"]
-        email = props.get("email", "").lower().strip() if props.get("email") else None
-        phone = normalize_phone(props.get("phone"))
-        
-        contact_info = {
-            "id": contact_id,
-            "email": email,
-            "phone": phone,
-            "firstname": props.get("firstname", ""),
-            "lastname": props.get("lastname", ""),
-            "createdate": props.get("createdate", ""),
-            "company": props.get("company", "")
-        }
-        
-        # Group by phone
-        if phone:
-            phone_groups[phone].append(contact_info)
-        
-        # Group by email
-        if email:
-            email_groups[email].append(contact_info)
+    print(f"\n📊 Analyzed {total_contacts} contacts created today for duplicates")
     
     # Find groups with more than 2 contacts
     phone_complex_cases = {phone: contacts for phone, contacts in phone_groups.items() if len(contacts) > 2}
@@ -144,18 +253,21 @@ def find_todays_contacts_with_multiple_duplicates():
     print("="*80)
     
     if phone_complex_cases:
+        # Build the whole listing first and write it in one go rather than one print per line
+        lines = []
         for phone, duplicate_contacts in phone_complex_cases.items():
-            print(f"\n🔄 Phone: {phone} ({len(duplicate_contacts)} contacts created today)")
-            print("-" * 60)
+            lines.append(f"\n🔄 Phone: {phone} ({len(duplicate_contacts)} contacts created today)")
+            lines.append("-" * 60)
             for i, contact in enumerate(duplicate_contacts, 1):
-                name = f"{contact['firstname']} {contact['lastname']}".strip() or "No Name"
-                created_time = parser.parse(contact['createdate']).strftime('%H:%M:%S') if contact['createdate'] else 'Unknown'
-                print(f"  {i}. ID: {contact['id']}")
-                print(f"     👤 Name: {name}")
-                print(f"     📧 Email: {contact['email'] or 'No Email'}")
-                print(f"     ⏰ Created Today at: {created_time}")
-                print(f"     🏢 Company: {contact['company'] or 'No Company'}")
-                print()
+                name = f"{contact.firstname} {contact.lastname}".strip() or "No Name"
+                created_time = parse_hubspot_date(contact.createdate).strftime('%H:%M:%S') if contact.createdate else 'Unknown'
+                lines.append(f"  {i}. ID: {contact.id}")
+                lines.append(f"     👤 Name: {name}")
+                lines.append(f"     📧 Email: {contact.email or 'No Email'}")
+                lines.append(f"     ⏰ Created Today at: {created_time}")
+                lines.append(f"     🏢 Company: {contact.company or 'No Company'}")
+                lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
         
         print(f"📊 Phone numbers created today with 3+ contacts: {len(phone_complex_cases)}")
     else:
@@ -166,19 +278,21 @@ def find_todays_contacts_with_multiple_duplicates():
     print("="*80)
     
     if email_complex_cases:
+        lines = []
         for email, duplicate_contacts in email_complex_cases.items():
-            print(f"\n🔄 Email: {email} ({len(duplicate_contacts)} contacts created today)")
-            print("-" * 60)
+            lines.append(f"\n🔄 Email: {email} ({len(duplicate_contacts)} contacts created today)")
+            lines.append("-" * 60)
             for i, contact in enumerate(duplicate_contacts, 1):
-                name = f"{contact['firstname']} {contact['lastname']}".strip() or "No Name"
-                phone_display = contact['phone'] or 'No Phone'
-                created_time = parser.parse(contact['createdate']).strftime('%H:%M:%S') if contact['createdate'] else 'Unknown'
-                print(f"  {i}. ID: {contact['id']}")
-                print(f"     👤 Name: {name}")
-                print(f"     📱 Phone: {phone_display}")
-                print(f"     ⏰ Created Today at: {created_time}")
-                print(f"     🏢 Company: {contact['company'] or 'No Company'}")
-                print()
+                name = f"{contact.firstname} {contact.lastname}".strip() or "No Name"
+                phone_display = contact.phone or 'No Phone'
+                created_time = parse_hubspot_date(contact.createdate).strftime('%H:%M:%S') if contact.createdate else 'Unknown'
+                lines.append(f"  {i}. ID: {contact.id}")
+                lines.append(f"     👤 Name: {name}")
+                lines.append(f"     📱 Phone: {phone_display}")
+                lines.append(f"     ⏰ Created Today at: {created_time}")
+                lines.append(f"     🏢 Company: {contact.company or 'No Company'}")
+                lines.append("")
+        sys.stdout.write("\n".join(lines) + "\n")
         
         print(f"📊 Email addresses created today with 3+ contacts: {len(email_complex_cases)}")
     else:
@@ -204,13 +318,11 @@ def find_todays_contacts_with_multiple_duplicates():
         # Show specific phone numbers for easy copy-paste
         if phone_complex_cases:
             print(f"\n📋 Today's phone numbers to process with pairwise merge:")
-            for phone in phone_complex_cases.keys():
-                print(f"   - {phone}")
+            print("\n".join(f"   - {phone}" for phone in phone_complex_cases))
         
         if email_complex_cases:
             print(f"\n📋 Today's email addresses to process with pairwise merge:")
-            for email in email_complex_cases.keys():
-                print(f"   - {email}")
+            print("\n".join(f"   - {email}" for email in email_complex_cases))
     else:
         print(f"\n✅ EXCELLENT NEWS FOR TODAY!")
         print(f"No contacts created today have more than 2 duplicates.")
@@ -218,41 +330,12 @@ def find_todays_contacts_with_multiple_duplicates():
     
     return phone_complex_cases, email_complex_cases
 
-def get_todays_duplicate_summary():
+def get_todays_duplicate_summary(phone_groups, email_groups):
     """Provide complete summary of today's duplicates"""
     
     print(f"🔍 TODAY'S COMPLETE DUPLICATE ANALYSIS ({TODAY.strftime('%Y-%m-%d')})")
     print("=" * 80)
     
-    contacts = fetch_todays_contacts()
-    
-    if not contacts:
-        print("📭 No contacts created today.")
-        return
-    
-    phone_groups = defaultdict(list)
-    email_groups = defaultdict(list)
-    
-    for contact in contacts:
-        props = contact["properties"]
-        contact_id = contact["id"]
-        email = props.get("email", "").lower().strip() if props.get("email") else None
-        phone = normalize_phone(props.get("phone"))
-        
-        contact_info = {
-            "id": contact_id,
-            "email": email,
-            "phone": phone,
-            "firstname": props.get("firstname", ""),
-            "lastname": props.get("lastname", ""),
-            "createdate": props.get("createdate", "")
-        }
-        
-        if phone:
-            phone_groups[phone].append(contact_info)
-        if email:
-            email_groups[email].append(contact_info)
-    
     # Categorize today's duplicates
     phone_pairs = {phone: contacts for phone, contacts in phone_groups.items() if len(contacts) == 2}
     phone_complex = {phone: contacts for phone, contacts in phone_groups.items() if len(contacts) > 2}
@@ -289,12 +372,19 @@ def main():
     print("=" * 80)
     
     try:
+        # Fetch today's contacts once; both reports work from the same groups
+        total_contacts, phone_groups, email_groups = group_todays_contacts()
+        
+        if not total_contacts:
+            print("📭 No contacts created today.")
+            return
+        
         # Find today's complex cases (3+ duplicates)
-        phone_complex, email_complex = find_todays_contacts_with_multiple_duplicates()
+        phone_complex, email_complex = find_todays_contacts_with_multiple_duplicates(total_contacts, phone_groups, email_groups)
         
         # Also show complete summary
         print(f"\n" + "="*80)
-        get_todays_duplicate_summary()
+        get_todays_duplicate_summary(phone_groups, email_groups)
         
         print(f"\n" + "="*80)
         print("💡 NEXT STEPS FOR TODAY'S DUPLICATES:")
@@ -25,10 +25,14 @@ source venv/bin/activate
 echo "📦 Upgrading pip..."
 python -m pip install --upgrade pip
 
-# Install requirements
-if [ -f "requirements.txt" ]; then
+# Install requirements (pinned requirements.lock if one has been generated), preferring wheels
+if [ -f "requirements.lock" ]; then
+    echo "📦 Installing pinned dependencies..."
+    pip install --prefer-binary -r requirements.lock
+    echo "✅ Dependencies installed!"
+elif [ -f "requirements.txt" ]; then
     echo "📦 Installing dependencies..."
-    pip install -r requirements.txt
+    pip install --prefer-binary -r requirements.txt
     echo "✅ Dependencies installed!"
 else
     echo "⚠️  requirements.txt not found. Installing basic dependencies..."
@@ -16,10 +16,13 @@ def check_python_version():
     return True
 
 def install_dependencies():
-    """Install required Python packages"""
+    """Install required Python packages (from requirements.lock when one has been generated)"""
+    # Pinned versions skip the resolver; create with: pip-compile requirements.txt -o requirements.lock
+    requirements_file = "requirements.lock" if Path("requirements.lock").exists() else "requirements.txt"
     try:
-        print("📦 Installing required packages...")
-        subprocess.check_call([sys.executable, "-m", "pip", "install", "-r", "requirements.txt"])
+        print(f"📦 Installing required packages from {requirements_file}...")
+        # Prefer wheels so a fresh environment doesn't build packages from source
+        subprocess.check_call([sys.executable, "-m", "pip", "install", "--prefer-binary", "-r", requirements_file])
         print("✅ Dependencies installed successfully!")
         return True
     except subprocess.CalledProcessError as e:
@@ -33,7 +36,13 @@ def setup_env_file():
     
     if env_path.exists():
         print("⚠️  .env file already exists")
-        response = input("Do you want to overwrite it? (y/n): ").lower()
+        # FORCE_OVERWRITE=1 answers yes without prompting; with no terminal to ask, keep the existing file
+        if os.environ.get("FORCE_OVERWRITE") == "1":
+            response = 'y'
+        elif sys.stdin.isatty():
+            response = input("Do you want to overwrite it? (y/n): ").lower()
+        else:
+            response = 'n'
         if response != 'y':
             print("Skipping .env file setup")
             return True
@@ -57,7 +66,7 @@ def setup_env_file():
     return True
 
 def setup_hubspot_token():
-    """Interactive setup for HubSpot token"""
+    """Interactive setup for HubSpot token (or HUBSPOT_TOKEN_SETUP for non-interactive runs)"""
     env_path = Path(".env")
     
     print("\n🔑 HubSpot Token Setup")
@@ -69,7 +78,10 @@ def setup_hubspot_token():
     print("4. Copy the generated token")
     print()
     
-    token = input("Enter your HubSpot Private App Token (or press Enter to skip): ").strip()
+    token = os.environ.get("HUBSPOT_TOKEN_SETUP")
+    if not token:
+        # Without a terminal (CI, Docker builds) skip the prompt instead of blocking on input()
+        token = input("Enter your HubSpot Private App Token (or press Enter to skip): ").strip() if sys.stdin.isatty() else ""
     
     if token and token != "your-hubspot-private-app-token-here":
         try:
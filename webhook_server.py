@@ -0,0 +1,208 @@
+"""
+Webhook receiver that catches duplicates as contacts arrive instead of scanning search every run.
+
+Subscribe the HubSpot app to contact.creation and contact.propertyChange (phone, email)
+and point it at http://<host>:<WEBHOOK_PORT>/webhook. For every contact in a delivery the
+server searches HubSpot for other contacts with the same phone or email, so a new contact
+that duplicates an existing CRM record is merged straight away. Set HUBSPOT_CLIENT_SECRET to
+the app's client secret: deliveries trigger irreversible merges, so unsigned requests are
+refused and the server won't start without it.
+
+Events HubSpot gives up retrying while this server is down are not replayed. contactmerge.py
+only compares contacts created on the same day, so it does not cover those.
+"""
+import os
+import sys
+import json
+import hmac
+import time
+import base64
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from contactmerge import (
+    RATE_LIMIT, CONTACT_PROPERTIES, normalize_phone, batch_read_contacts, process_duplicate_group,
+    hubspot_request, decode_json, setup_logging
+)
+
+log = logging.getLogger(__name__)
+
+# ========== CONFIG ==========
+WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', '8080'))
+# App client secret used to verify X-HubSpot-Signature-v3; the server refuses to start without it
+CLIENT_SECRET = os.getenv('HUBSPOT_CLIENT_SECRET')
+# Set WEBHOOK_ALLOW_UNSIGNED=1 to run without a secret (local testing); anyone who can reach the port can trigger merges
+ALLOW_UNSIGNED = os.getenv('WEBHOOK_ALLOW_UNSIGNED') == '1'
+# Interface to listen on; unsigned servers stay on localhost unless WEBHOOK_HOST says otherwise
+WEBHOOK_HOST = os.getenv('WEBHOOK_HOST', '' if CLIENT_SECRET else '127.0.0.1')
+# Public URL HubSpot posts to; part of the signed string
+WEBHOOK_PUBLIC_URL = os.getenv('WEBHOOK_PUBLIC_URL', f"http://localhost:{WEBHOOK_PORT}/webhook")
+# Reject signed requests whose timestamp is more than this many seconds away from now
+MAX_SIGNATURE_AGE = 300
+
+SUBSCRIPTIONS = {"contact.creation", "contact.propertyChange"}
+WATCHED_PROPERTIES = {"phone", "email"}
+
+# ========== Duplicate Lookup ==========
+# Group processing is serialized per identifier: a creation and a propertyChange event for the
+# same contact can land on different workers and must not merge the same group twice.
+# Identifiers hash onto a fixed set of locks so the table never grows.
+KEY_LOCKS = [threading.Lock() for _ in range(64)]
+
+EXECUTOR = ThreadPoolExecutor(max_workers=RATE_LIMIT)
+
+def contact_keys(contact):
+    """(identifier_type, identifier) pairs for a contact's normalized phone and email"""
+    props = contact["properties"]
+    keys = set()
+    phone = normalize_phone(props.get("phone"))
+    if phone:
+        keys.add(("phone", phone))
+    raw_email = props.get("email")
+    if raw_email:
+        keys.add(("email", raw_email.strip().lower()))
+    return keys
+
+def locks_for(keys):
+    """The locks guarding a set of identifiers, in a fixed order so two workers can't deadlock"""
+    indexes = sorted({hash(key) % len(KEY_LOCKS) for key in keys})
+    return [KEY_LOCKS[i] for i in indexes]
+
+def search_contacts_by_key(identifier_type, identifier):
+    """Search HubSpot for every contact sharing a normalized phone or email"""
+    url = "https://api.hubapi.com/crm/v3/objects/contacts/search"
+    if identifier_type == "phone":
+        # Phones are stored as typed, so search the usual raw forms of the number
+        values = [identifier, f"+91{identifier}", f"+91 {identifier}", f"91{identifier}"]
+        search_filter = {"propertyName": "phone", "operator": "IN", "values": values}
+    else:
+        search_filter = {"propertyName": "email", "operator": "EQ", "value": identifier}
+
+    payload = {
+        "filterGroups": [{"filters": [search_filter]}],
+        "properties": CONTACT_PROPERTIES,
+        "limit": 100
+    }
+    contacts = {}
+
+    while True:
+        try:
+            response = hubspot_request("POST", url, json=payload, timeout=15)
+            response.raise_for_status()
+        except requests.exceptions.RequestException as e:
+            raise RuntimeError(f"❌ Error searching contacts by {identifier_type} {identifier}: {e}")
+        data = decode_json(response)
+        for contact in data.get("results", []):
+            if (identifier_type, identifier) in contact_keys(contact):
+                contacts[contact["id"]] = contact
+        if "paging" in data and "next" in data["paging"]:
+            payload["after"] = data["paging"]["next"]["after"]
+        else:
+            break
+
+    return list(contacts.values())
+
+def handle_events(events):
+    """Batch-read the contacts named in a webhook delivery and merge any duplicates they have in HubSpot"""
+    contact_ids = {
+        str(event["objectId"]) for event in events
+        if isinstance(event, dict) and "objectId" in event
+        and event.get("subscriptionType") in SUBSCRIPTIONS
+        and (event.get("subscriptionType") == "contact.creation" or event.get("propertyName") in WATCHED_PROPERTIES)
+    }
+    if not contact_ids:
+        return
+
+    try:
+        done = set()  # groups already handled in this delivery
+        for contact in batch_read_contacts(contact_ids).values():
+            keys = contact_keys(contact)
+            locks = locks_for(keys)
+            for lock in locks:
+                lock.acquire()
+            try:
+                for identifier_type, identifier in sorted(keys):
+                    group_ids = {c["id"] for c in search_contacts_by_key(identifier_type, identifier)}
+                    if len(group_ids) < 2 or frozenset(group_ids) in done:
+                        continue
+                    # Search results lag behind merges; a fresh read drops contacts merged away or deleted since
+                    group = list(batch_read_contacts(group_ids).values())
+                    if len(group) < 2:
+                        continue
+                    done.add(frozenset(group_ids))
+                    process_duplicate_group(identifier, group, identifier_type)
+            finally:
+                for lock in reversed(locks):
+                    lock.release()
+    except Exception as e:
+        log.error(f"❌ Error handling webhook events: {e}")
+
+def verify_signature(handler, body):
+    """Check HubSpot's v3 request signature (only skipped when unsigned requests were explicitly allowed)"""
+    if not CLIENT_SECRET:
+        return ALLOW_UNSIGNED
+    signature = handler.headers.get("X-HubSpot-Signature-v3", "")
+    timestamp = handler.headers.get("X-HubSpot-Request-Timestamp", "")
+    if not timestamp.isdigit() or abs(time.time() - int(timestamp) / 1000) > MAX_SIGNATURE_AGE:
+        return False
+    source = f"POST{WEBHOOK_PUBLIC_URL}{body.decode('utf-8')}{timestamp}"
+    expected = base64.b64encode(hmac.new(CLIENT_SECRET.encode(), source.encode(), hashlib.sha256).digest()).decode()
+    return hmac.compare_digest(expected, signature)
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """Accept HubSpot webhook deliveries and process them off the request thread"""
+
+    def do_POST(self):
+        if self.path != "/webhook":
+            self.send_error(404)
+            return
+
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not verify_signature(self, body):
+            log.warning("⚠️ Rejected webhook with invalid signature")
+            self.send_error(401)
+            return
+
+        try:
+            events = json.loads(body)
+        except ValueError:
+            self.send_error(400)
+            return
+
+        # Acknowledge right away; HubSpot retries slow deliveries
+        EXECUTOR.submit(handle_events, events if isinstance(events, list) else [events])
+        self.send_response(204)
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        log.debug(format % args)
+
+# ========== Main Logic ==========
+
+def main():
+    if not CLIENT_SECRET and not ALLOW_UNSIGNED:
+        print("❌ Set HUBSPOT_CLIENT_SECRET so webhook signatures can be verified "
+              "(or WEBHOOK_ALLOW_UNSIGNED=1 for local testing)")
+        sys.exit(1)
+
+    listener = setup_logging()
+    server = ThreadingHTTPServer((WEBHOOK_HOST, WEBHOOK_PORT), WebhookHandler)
+    if not CLIENT_SECRET:
+        log.warning("⚠️ HUBSPOT_CLIENT_SECRET is not set; accepting unsigned webhooks")
+    log.info(f"🚀 Listening for HubSpot contact webhooks on {WEBHOOK_HOST or '0.0.0.0'}:{WEBHOOK_PORT}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        log.info("👋 Shutting down")
+    finally:
+        server.server_close()
+        EXECUTOR.shutdown(wait=True)
+        listener.stop()
+
+if __name__ == "__main__":
+    main()